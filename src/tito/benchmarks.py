@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmarks of the indicator, fit and sweep code at several data sizes.
+#
+#     python -m tito.benchmarks run --output benchmarks/baseline.json
+#     python -m tito.benchmarks run --output benchmarks/new.json --sizes 2mo 6mo
+#     python -m tito.benchmarks compare benchmarks/baseline.json benchmarks/new.json --threshold 0.2
+#
+# The 2mo and 6mo sizes are the hourly BTC-USD bars of the local store and 2y its
+# daily bars. 100k and 10M are that many hourly SyntheticBars of the default gbm model,
+# seed 0. The *_polars benchmarks are the per-window polars rolling statistics that
+# the prefix-sum sweeps replace, scored the same way, as their baseline.
+# compare exits with status 1 when any benchmark's best time got slower than the
+# threshold allows, so it can gate performance work on the strategy modules.
+# Timings only compare on the same machine, so benchmarks/ is gitignored and every
+# machine keeps its own baseline.
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from os import PathLike
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+import polars as pl
+
+from tito.data.store import load_bars
+from tito.data.synthetic import SyntheticBars
+from tito.data.timeframe import prune_time
+from tito.indicators.expr import macd_bb_strategy
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_positions, threshold_positions
+from tito.strategies.ema.ema_grid_search import MACDStrategy
+from tito.strategies.bollinger_bands.bb_batch import batch_bollinger_scores
+from tito.strategies.ema.macd_batch import batch_macd_scores, macd_pairs
+from tito.strategies.rolling_avg.sma_batch import batch_sma_crossover_scores
+
+
+class DataSize(NamedTuple):
+    interval: str
+    lookback: Optional[str]  # stored bars within this duration of the last one
+    synthetic_bars: Optional[int]  # or this many generated bars instead
+
+
+SIZES: dict[str, DataSize] = {
+    "2mo": DataSize("1h", "2mo", None),
+    "6mo": DataSize("1h", "6mo", None),
+    "2y": DataSize("1d", "2y", None),
+    "100k": DataSize("1h", None, 100_000),
+    "10M": DataSize("1h", None, 10_000_000),
+}
+
+# Kept small so the sweep still fits in memory at 10M bars
+SWEEP_GRID: dict[str, list[int]] = {
+    "short_span": [6, 12],
+    "long_span": [26, 40],
+    "signal_span": [9, 19],
+}
+# Grids the size of a real parameter search. Their signal matrices don't fit in memory
+# at 10M bars, so they only run up to MAX_ROWS
+SMA_SWEEP_GRID: dict[str, list[int]] = {
+    "short_window": list(range(5, 105, 5)),
+    "long_window": list(range(20, 510, 10)),
+}
+BOLLINGER_SWEEP_GRID: dict[str, list] = {
+    "window_size": list(range(5, 505)),
+    "num_std": [1.0, 1.5, 2.0, 2.5, 3.0],
+}
+# benchmark -> most rows it runs on, the others run on every size
+MAX_ROWS: dict[str, int] = {
+    "sma_sweep": 100_000,
+    "sma_sweep_polars": 100_000,
+    "bollinger_sweep": 100_000,
+    "bollinger_sweep_polars": 100_000,
+}
+
+
+def load_size(name: str) -> pl.DataFrame:
+    size = SIZES[name]
+    if size.synthetic_bars is not None:
+        return SyntheticBars(interval=size.interval, seed=0).generate(size.synthetic_bars).select("Datetime", "Close")
+    return load_bars("BTC-USD", size.interval, columns=["Close"], lookback=size.lookback)
+
+
+def _ewm(data, interval):
+    data.select(pl.col("Close").ewm_mean(span=12))
+
+
+def _macd(data, interval):
+    macd_line = pl.col("Close").ewm_mean(span=12) - pl.col("Close").ewm_mean(span=26)
+    data.select((macd_line - macd_line.ewm_mean(span=9)).alias("histogram"))
+
+
+def _bollinger(data, interval):
+    sma = pl.col("Close").rolling_mean(20)
+    smstd = pl.col("Close").rolling_std(20)
+    data.select((sma + 2 * smstd).alias("upper"), (sma - 2 * smstd).alias("lower"))
+
+
+def _macd_bb_eager(data, interval):
+    # the column by column chain macd_bb.py used before the indicator expressions
+    data = data.with_columns(pl.col("Close").ewm_mean(span=6).alias("ewm_short"))
+    data = data.with_columns(pl.col("Close").ewm_mean(span=41).alias("ewm_long"))
+    data = data.with_columns((pl.col("ewm_short") - pl.col("ewm_long")).alias("MACD_line"))
+    data = data.with_columns(pl.col("MACD_line").ewm_mean(span=19).alias("signal_line"))
+    sma = data.select(pl.col("Close").rolling_mean(10)).to_series()
+    smstd = data.select(pl.col("Close").rolling_std(10)).to_series()
+    data = data.with_columns([sma.alias("SMA"), (sma + 2 * smstd).alias("Upper_Band"), (sma - 2 * smstd).alias("Lower_Band")])
+    data = data.with_columns((pl.col("MACD_line") - pl.col("signal_line")).alias("histogram"))
+    data = data.with_columns(
+        pl.when((pl.col("MACD_line") > pl.col("signal_line")) & (pl.col("Lower_Band") <= pl.col("Close"))).then(1).otherwise(0).alias("positions")
+    )
+    data.with_columns((pl.col("positions") - pl.col("positions").shift(1).fill_null(0)).alias("position_change"))
+
+
+def _macd_bb_plan(data, interval):
+    macd_bb_strategy().evaluate(data)
+
+
+def _macd_bb_lazy(data, interval):
+    macd_bb_strategy().compile(data).collect()
+
+
+def _fit(data, interval):
+    MACDStrategy().fit(data)
+
+
+def _prune_time(data, interval):
+    timestep = "daily" if interval.endswith("d") else "hourly"
+    prune_time(6, timestep, df=data)
+
+
+def _sweep(data, interval):
+    batch_macd_scores(data, SWEEP_GRID["short_span"], SWEEP_GRID["long_span"], SWEEP_GRID["signal_span"])
+
+
+def _sma_sweep(data, interval):
+    batch_sma_crossover_scores(data, SMA_SWEEP_GRID["short_window"], SMA_SWEEP_GRID["long_window"])
+
+
+def _bollinger_sweep(data, interval):
+    batch_bollinger_scores(data, BOLLINGER_SWEEP_GRID["window_size"], BOLLINGER_SWEEP_GRID["num_std"])
+
+
+def _sma_sweep_polars(data, interval):
+    # what batch_sma_crossover_scores replaces: one polars rolling_mean per window
+    windows, pairs, short_idx, long_idx = macd_pairs(SMA_SWEEP_GRID["short_window"], SMA_SWEEP_GRID["long_window"])
+    # scored like batch_sma_crossover_scores, so only the rolling means differ
+    smas = data.select([pl.col("Close").rolling_mean(window).alias(str(window)) for window in windows]).to_numpy(order="fortran")
+    returns = net_long_returns(excess_returns(data["Close"].to_numpy()))
+    positions = np.empty((len(data), min(512, len(pairs))), order="F")
+    for start in range(0, len(pairs), 512):
+        stop = min(start + 512, len(pairs))
+        for column, (short, long) in enumerate(zip(short_idx[start:stop], long_idx[start:stop])):
+            np.greater(smas[:, short], smas[:, long], out=positions[:, column])
+        score_binary_positions(positions[:, :stop - start], returns)
+
+
+def _bollinger_sweep_polars(data, interval):
+    # what batch_bollinger_scores replaces: polars rolling_mean and rolling_std per
+    # window, scored the same way
+    prices = data["Close"].to_numpy()
+    returns = net_long_returns(excess_returns(prices))
+    num_stds = np.asarray(BOLLINGER_SWEEP_GRID["num_std"])
+    for window in BOLLINGER_SWEEP_GRID["window_size"]:
+        sma = data["Close"].rolling_mean(window).to_numpy()
+        smstd = data["Close"].rolling_std(window).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zscore = (prices - sma) / smstd
+        score_binary_positions(threshold_positions(zscore, -num_stds, num_stds), returns)
+
+
+BENCHMARKS: dict[str, Callable[[pl.DataFrame, str], None]] = {
+    "ewm": _ewm,
+    "macd": _macd,
+    "bollinger": _bollinger,
+    "macd_bb_eager": _macd_bb_eager,
+    "macd_bb_plan": _macd_bb_plan,
+    "macd_bb_lazy": _macd_bb_lazy,
+    "fit": _fit,
+    "prune_time": _prune_time,
+    "sweep": _sweep,
+    "sma_sweep": _sma_sweep,
+    "sma_sweep_polars": _sma_sweep_polars,
+    "bollinger_sweep": _bollinger_sweep,
+    "bollinger_sweep_polars": _bollinger_sweep_polars,
+}
+
+
+def time_call(func: Callable[[], None], repeats: int = 5, min_time: float = 0.05) -> list[float]:
+    """
+    Seconds per call of func over repeats samples. Like timeit's autorange, a sample loops
+    over func enough times to last at least min_time, so sub-millisecond benchmarks
+    aren't dominated by timer and scheduler noise. The first call also sets the loop count.
+    """
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    loops = max(1, int(np.ceil(min_time / first))) if first > 0 else 1
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return times
+
+
+def run_benchmarks(sizes: Optional[list[str]] = None, benchmarks: Optional[list[str]] = None,
+                   repeats: int = 5) -> dict:
+    """
+    Times every benchmark on every data size.
+
+    parameters:
+        sizes (Optional[list[str]], default = None): Keys of SIZES, all of them by default.
+            Sizes whose stored bars are missing are skipped with a message.
+        benchmarks (Optional[list[str]], default = None): Keys of BENCHMARKS, all by default.
+        repeats (int, default = 5): Timed samples per benchmark and size, see time_call.
+
+    returns:
+        {"meta": {...}, "results": {"<benchmark>/<size>": {"min_s", "median_s", "max_s", "rows", ...}}}
+    """
+    results = {}
+    for size in sizes or list(SIZES):
+        try:
+            data = load_size(size)
+        except FileNotFoundError as error:
+            print(f"Skipping {size}: {error}")
+            continue
+        interval = SIZES[size].interval
+        for name in benchmarks or list(BENCHMARKS):
+            if len(data) > MAX_ROWS.get(name, len(data)):
+                continue
+            times = time_call(lambda: BENCHMARKS[name](data, interval), repeats)
+            results[f"{name}/{size}"] = {
+                "min_s": min(times),
+                "median_s": float(np.median(times)),
+                "max_s": max(times),
+                "repeats": repeats,
+                "rows": len(data),
+                "rows_per_s": len(data) / min(times) if min(times) > 0 else 0.0,
+            }
+            print(f"{name + '/' + size:<24} {min(times) * 1000:>12.3f} ms  ({len(data)} rows)")
+        del data
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.2) -> list[str]:
+    """
+    Prints the best time of every benchmark present in both result sets and returns
+    the names of those whose current time is more than (1 + threshold) times the baseline.
+    """
+    regressions = []
+    print(f"{'benchmark':<24} {'baseline ms':>12} {'current ms':>12} {'ratio':>8}")
+    print("-" * 60)
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            continue
+        now = current["results"][name]
+        ratio = now["min_s"] / base["min_s"] if base["min_s"] > 0 else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<24} {base['min_s'] * 1000:>12.3f} {now['min_s'] * 1000:>12.3f} {ratio:>8.2f}{flag}")
+    return regressions
+
+
+def write_results(results: dict, path: str | PathLike):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+def read_results(path: str | PathLike) -> dict:
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark tito's indicators, fits and sweeps")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time the benchmarks and write the results as json")
+    run.add_argument("--output", default="benchmarks/baseline.json")
+    run.add_argument("--sizes", nargs="+", choices=list(SIZES), default=None)
+    run.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=None)
+    run.add_argument("--repeats", type=int, default=5)
+
+    compare = commands.add_parser("compare", help="flag benchmarks that got slower than a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.2,
+                         help="allowed slowdown, 0.2 flags anything over 1.2 times the baseline")
+
+    args = parser.parse_args(argv)
+    match args.command:
+        case "run":
+            results = run_benchmarks(args.sizes, args.benchmarks, args.repeats)
+            write_results(results, args.output)
+            print(f"Wrote {len(results['results'])} results to {args.output}")
+        case "compare":
+            regressions = compare_results(read_results(args.baseline), read_results(args.current), args.threshold)
+            if regressions:
+                print(f"{len(regressions)} benchmarks slower than {1 + args.threshold:.2f}x the baseline: "
+                      f"{', '.join(regressions)}")
+                sys.exit(1)
+            print("No slowdowns beyond the threshold")
+
+
+if __name__ == "__main__":
+    main()
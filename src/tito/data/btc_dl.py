@@ -1,14 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import yfinance as yf
+# Brings the local store up to date, only downloading bars that aren't stored yet.
+# Pass --offline to refresh from the btc_data csv files instead of yfinance.
+
+import sys
+from pathlib import Path
+
+from tito.data.downloader import IncrementalDownloader, LocalSource, YFinanceSource
+from tito.data.store import MarketDataStore
 
 ticker = "BTC-USD"
+interval = "1d"
 
-data = yf.download(
-    tickers=ticker,
-    period="2y",
-    interval="1d"
-)
+if "--offline" in sys.argv:
+    source = LocalSource.from_csv({(ticker, interval): Path("src/tito/data/btc_data/daily_2y.csv")})
+else:
+    source = YFinanceSource()
 
-data.to_csv("btc_data/daily_2y.csv")
\ No newline at end of file
+downloader = IncrementalDownloader(MarketDataStore(), source, default_history="2y")
+received = downloader.refresh(ticker, interval)
+print(f"Fetched {received} bars for {ticker} {interval}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Incremental downloader that only fetches the bars missing from the local store.
+#
+# A refresh looks at what MarketDataStore already holds for a symbol and interval,
+# works out the missing time ranges (before the first bar, holes in the middle,
+# after the last bar), fetches just those from a source and merges them in.
+# Every fetch is recorded in <store>/<symbol>/<interval>/fetch_log.jsonl, which
+# also lets a refresh skip holes the source already said it has no data for
+# (exchange closures and such).
+
+import json
+import polars as pl
+from datetime import datetime, timezone
+from os import PathLike
+from pathlib import Path
+from typing import Optional, Protocol
+
+from tito.data.store import MarketDataStore, TIME_COLUMN, as_utc, normalize_bars
+from tito.data.timeframe import interval_length
+
+FETCH_LOG_NAME: str = "fetch_log.jsonl"
+
+
+class BarSource(Protocol):
+    """
+    Anything that can return OHLCV bars with a Datetime column for [start, end).
+    """
+
+    name: str
+
+    def fetch(self, symbol: str, interval: str, start: datetime, end: datetime) -> pl.DataFrame:
+        ...
+
+
+class YFinanceSource:
+    """
+    Downloads bars with yfinance, what btc_dl.py used to do for the whole history.
+    """
+
+    name = "yfinance"
+
+    def fetch(self, symbol: str, interval: str, start: datetime, end: datetime) -> pl.DataFrame:
+        import yfinance as yf
+
+        frame = yf.download(tickers=symbol, start=start, end=end, interval=interval, progress=False)
+        if frame is None or frame.empty:
+            return pl.DataFrame()
+        # newer yfinance returns (Price, Ticker) column levels even for one ticker
+        if frame.columns.nlevels > 1:
+            frame.columns = frame.columns.get_level_values(0)
+        frame = frame.reset_index()
+        frame = frame.rename(columns={frame.columns[0]: TIME_COLUMN})
+        return pl.from_pandas(frame)
+
+
+class LocalSource:
+    """
+    Offline stand-in for a real source, serves bars from frames held in memory.
+    Used for tests and for refreshing the store without a network.
+
+    parameters:
+        frames (Optional[dict[tuple[str, str], pl.DataFrame]], default = None):
+            Bars keyed by (symbol, interval).
+    """
+
+    name = "local"
+
+    def __init__(self, frames: Optional[dict[tuple[str, str], pl.DataFrame]] = None):
+        self.frames = {key: normalize_bars(frame) for key, frame in (frames or {}).items()}
+        self.requests: list[tuple[str, str, datetime, datetime]] = []
+
+    @classmethod
+    def from_csv(cls, csv_paths: dict[tuple[str, str], str | PathLike]) -> "LocalSource":
+        return cls({key: pl.read_csv(path, try_parse_dates=True) for key, path in csv_paths.items()})
+
+    def fetch(self, symbol: str, interval: str, start: datetime, end: datetime) -> pl.DataFrame:
+        self.requests.append((symbol, interval, start, end))
+        frame = self.frames.get((symbol, interval))
+        if frame is None:
+            return pl.DataFrame()
+        return frame.filter((pl.col(TIME_COLUMN) >= start) & (pl.col(TIME_COLUMN) < end))
+
+
+class IncrementalDownloader:
+    """
+    Keeps a MarketDataStore up to date from a BarSource by fetching only missing ranges.
+
+    parameters:
+        store (MarketDataStore): Where bars are kept.
+        source (BarSource): Where missing bars come from, YFinanceSource or LocalSource.
+        default_history (str, default = "2y"): How far back to go (polars duration)
+            when nothing is stored yet and no start is given.
+    """
+
+    def __init__(self, store: MarketDataStore, source: BarSource, default_history: str = "2y"):
+        self.store = store
+        self.source = source
+        self.default_history = default_history
+
+    def fetch_log_path(self, symbol: str, interval: str) -> Path:
+        return self.store.partition_dir(symbol, interval) / FETCH_LOG_NAME
+
+    def fetch_log(self, symbol: str, interval: str) -> list[dict]:
+        path = self.fetch_log_path(symbol, interval)
+        if not path.exists():
+            return []
+        with open(path) as log_file:
+            return [json.loads(line) for line in log_file if line.strip()]
+
+    def _record(self, symbol: str, interval: str, start: datetime, end: datetime, rows: int):
+        path = self.fetch_log_path(symbol, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "symbol": symbol,
+            "interval": interval,
+            "source": self.source.name,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "rows": rows,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(path, "a") as log_file:
+            log_file.write(json.dumps(entry) + "\n")
+
+    def missing_ranges(self, symbol: str, interval: str, start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+        """
+        Time ranges in [start, end) the store has no bars for.
+
+        The newest stored bar is always refetched, since it may have been stored while
+        still forming. Holes between stored bars that a previous fetch already
+        covered without returning data are not fetched again.
+        """
+        step = interval_length(interval)
+        try:
+            stored = self.store.scan(symbol, interval, columns=[]).select(TIME_COLUMN).collect()[TIME_COLUMN]
+        except FileNotFoundError:
+            return [(start, end)]
+        if stored.is_empty():
+            return [(start, end)]
+
+        ranges = []
+        first, last = stored.min(), stored.max()
+        if start < first:
+            ranges.append((start, first))
+        # holes: consecutive bars further apart than one interval
+        gaps = pl.DataFrame({"before": stored[:-1], "after": stored[1:]}).filter(
+            pl.col("after") - pl.col("before") > step
+        )
+        for before, after in gaps.iter_rows():
+            gap = (before + step, after)
+            if gap[0] < end and gap[1] > start:
+                ranges.append((max(gap[0], start), min(gap[1], end)))
+        if last < end:
+            ranges.append((max(last, start), end))
+
+        # skip holes the source already came back empty for
+        empty_fetches = [
+            (datetime.fromisoformat(entry["start"]), datetime.fromisoformat(entry["end"]))
+            for entry in self.fetch_log(symbol, interval) if entry["rows"] == 0
+        ]
+        return [
+            (range_start, range_end) for range_start, range_end in ranges
+            if range_start == max(last, start)
+            or not any(fetched_start <= range_start and range_end <= fetched_end
+                       for fetched_start, fetched_end in empty_fetches)
+        ]
+
+    def refresh_range(self, symbol: str, interval: str, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> tuple[datetime, datetime]:
+        """
+        The [start, end) a refresh covers, filling in the defaults described in refresh.
+        """
+        end = as_utc(end) or datetime.now(timezone.utc)
+        start = as_utc(start)
+        if start is None:
+            try:
+                start = self.store.scan(symbol, interval, columns=[]).select(pl.col(TIME_COLUMN).min()).collect().item()
+            except FileNotFoundError:
+                start = None
+            if start is None:
+                start = pl.select(pl.lit(end).dt.offset_by(f"-{self.default_history}")).item()
+        return start, end
+
+    def refresh(self, symbol: str, interval: str, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> int:
+        """
+        Fetches and stores the bars missing from [start, end). Returns the number of
+        bars received from the source.
+
+        parameters:
+            symbol (str): For example "BTC-USD".
+            interval (str): For example "1h", "1d".
+            start (Optional[datetime], default = None): Defaults to the first stored bar,
+                or default_history before end when nothing is stored.
+            end (Optional[datetime], default = None): Defaults to now.
+        """
+        start, end = self.refresh_range(symbol, interval, start, end)
+        received = 0
+        for range_start, range_end in self.missing_ranges(symbol, interval, start, end):
+            bars = self.source.fetch(symbol, interval, range_start, range_end)
+            rows = len(bars)
+            if rows:
+                self.store.append(bars, symbol, interval)
+            self._record(symbol, interval, range_start, range_end, rows)
+            received += rows
+        return received
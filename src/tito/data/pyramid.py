@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Multi-timeframe bar pyramid: 1h -> 6h -> 12h -> 1d, each level aggregated from the one below.
+#
+# The levels are kept in memory and shared, so running a strategy on 6h, 12h and
+# daily bars reuses the same aggregated frames instead of reading a differently
+# pruned csv for each experiment. When new base bars arrive, only the windows
+# they fall in are re-aggregated on every level.
+
+import polars as pl
+from os import PathLike
+from typing import Optional
+
+from tito.data.store import DEFAULT_ROOT, MarketDataStore, normalize_bars
+from tito.data.timeframe import annualization_factor, interval_length, resample_bars
+
+DEFAULT_LEVELS: tuple[str, ...] = ("1h", "6h", "12h", "1d")
+
+
+class BarPyramid:
+    """
+    Cached OHLCV bars at several intervals derived from one base interval.
+
+    parameters:
+        base (pl.DataFrame): Bars at the first (finest) interval of levels.
+        levels (tuple[str, ...], default = DEFAULT_LEVELS): Intervals from finest to coarsest.
+            Every interval has to be a whole multiple of the one before it.
+        time_col (str, default = "Datetime"): The bar timestamp column.
+    """
+
+    def __init__(self, base: pl.DataFrame, levels: tuple[str, ...] = DEFAULT_LEVELS, time_col: str = "Datetime"):
+        for finer, coarser in zip(levels, levels[1:]):
+            if interval_length(coarser) % interval_length(finer):
+                raise ValueError(f"{coarser} bars can't be built from {finer} bars")
+        self.levels = tuple(levels)
+        self.time_col = time_col
+        self._bars: dict[str, pl.DataFrame] = {levels[0]: normalize_bars(base)}
+        for finer, coarser in zip(levels, levels[1:]):
+            self._bars[coarser] = resample_bars(self._bars[finer], coarser, time_col=time_col)[coarser]
+
+    def level(self, interval: str) -> pl.DataFrame:
+        """
+        The cached bars for one interval of the pyramid.
+        """
+        if interval not in self._bars:
+            raise KeyError(f"{interval} is not a level of this pyramid, levels are {self.levels}")
+        return self._bars[interval]
+
+    def annualization(self, interval: str) -> float:
+        """
+        Bars per year for a level, the trading_days a strategy on that level should use.
+        """
+        self.level(interval)
+        return annualization_factor(interval)
+
+    def last_timestamp(self):
+        return self._bars[self.levels[0]][self.time_col].max()
+
+    def append(self, bars: pl.DataFrame) -> int:
+        """
+        Adds new base bars and re-aggregates only the windows they fall in.
+        Returns the number of new or replaced base bars.
+        """
+        bars = normalize_bars(bars)
+        if bars.is_empty():
+            return 0
+        time_col = self.time_col
+        base = self._bars[self.levels[0]]
+        self._bars[self.levels[0]] = normalize_bars(pl.concat([base, bars], how="diagonal_relaxed"))
+        changed_from = bars[time_col].min()
+
+        for finer, coarser in zip(self.levels, self.levels[1:]):
+            # first coarser window touched by the change, everything before it is still valid
+            window_start = pl.select(pl.lit(changed_from).dt.truncate(coarser)).item()
+            source = self._bars[finer].filter(pl.col(time_col) >= window_start)
+            refreshed = resample_bars(source, coarser, time_col=time_col)[coarser]
+            kept = self._bars[coarser].filter(pl.col(time_col) < window_start)
+            self._bars[coarser] = pl.concat([kept, refreshed], how="diagonal_relaxed")
+            changed_from = window_start
+        return len(bars)
+
+
+# Pyramids shared by every strategy in the process, keyed by (store root, symbol, levels)
+_pyramids: dict[tuple, BarPyramid] = {}
+
+
+def load_pyramid(symbol: str = "BTC-USD", levels: tuple[str, ...] = DEFAULT_LEVELS,
+                 root: str | PathLike = DEFAULT_ROOT, store: Optional[MarketDataStore] = None) -> BarPyramid:
+    """
+    Returns the shared pyramid for a symbol, building it from the store's base bars on first use.
+    Like load_bars, base bars the store doesn't have yet are imported from their bundled
+    csv file first.
+
+    Later calls only read the base bars stored after the pyramid's newest bar
+    (if any) and fold them in with BarPyramid.append, so the pyramid is only
+    invalidated by new base bars.
+    """
+    store = store or MarketDataStore(root)
+    key = (str(store.root), symbol, tuple(levels))
+    pyramid = _pyramids.get(key)
+    if pyramid is None:
+        store.ensure_imported(symbol, levels[0])
+        pyramid = BarPyramid(store.load(symbol, levels[0]), levels)
+        _pyramids[key] = pyramid
+        return pyramid
+
+    stored_last = store.last_timestamp(symbol, levels[0])
+    if stored_last is not None and stored_last > pyramid.last_timestamp():
+        # the newest cached bar is reloaded too, it may have been stored while still forming
+        pyramid.append(store.load(symbol, levels[0], start=pyramid.last_timestamp()))
+    return pyramid
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Local columnar market data store, replaces reading the btc_data csv files directly.
+#
+# Bars are kept as uncompressed Arrow IPC files partitioned by symbol, interval and month:
+#     <root>/BTC-USD/1h/2024-11.arrow
+# Uncompressed IPC is memory mapped by polars, so reads are zero copy. Only the
+# partitions overlapping the requested range are scanned, and column selection and
+# the date filter are pushed down into the scan. Appending bars only rewrites the
+# months the new bars fall in.
+#
+# The store directory isn't checked in. load_bars imports the bundled btc_data csv file
+# of a series the first time it is asked for and the store doesn't have it, or run
+#     python src/tito/data/store.py
+# to import all of them at once. The 6h and 12h bars aren't stored, load_bars aggregates
+# them from the 1h bars through the shared bar pyramid (tito.data.pyramid).
+
+import polars as pl
+from datetime import date, datetime, timezone
+from os import PathLike
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_ROOT: Path = Path("src/tito/data/store")
+BAR_COLUMNS: list[str] = ["Datetime", "Open", "High", "Low", "Close", "Volume"]
+TIME_COLUMN: str = "Datetime"
+
+BUNDLED_CSV_DIR: Path = Path("src/tito/data/btc_data")
+# One file per series. The 2mo files cover the last two months of the 6mo ones, but
+# were downloaded separately and their last, still open bar has a different close
+# (97159 vs 97018), so importing both would mix two downloads into one series.
+# hourly_6_6mo.csv and hourly_12_6mo.csv aren't imported: they hold every 6th/12th
+# hourly bar, not 6h/12h bars, which load_bars builds from hourly_6mo.csv instead.
+BUNDLED_CSVS: dict[tuple[str, str], str] = {
+    ("BTC-USD", "1d"): "daily_2y.csv",
+    ("BTC-USD", "1h"): "hourly_6mo.csv",
+}
+
+
+def normalize_bars(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Casts a frame of bars to the store schema: UTC microsecond Datetime plus float OHLCV,
+    sorted by time with duplicate timestamps removed (the last one wins).
+    """
+    time_dtype = df.schema[TIME_COLUMN]
+    if time_dtype == pl.String:
+        df = df.with_columns(pl.col(TIME_COLUMN).str.to_datetime(time_zone="UTC"))
+    elif time_dtype == pl.Date:
+        df = df.with_columns(pl.col(TIME_COLUMN).cast(pl.Datetime("us")).dt.replace_time_zone("UTC"))
+    elif getattr(df.schema[TIME_COLUMN], "time_zone", None) is None:
+        df = df.with_columns(pl.col(TIME_COLUMN).dt.replace_time_zone("UTC"))
+    return (
+        df.select(
+            pl.col(TIME_COLUMN).dt.convert_time_zone("UTC").dt.cast_time_unit("us"),
+            *[pl.col(name).cast(pl.Float64) for name in BAR_COLUMNS[1:] if name in df.columns]
+        )
+        .unique(subset=TIME_COLUMN, keep="last", maintain_order=True)
+        .sort(TIME_COLUMN)
+    )
+
+
+def as_utc(value) -> Optional[datetime]:
+    """
+    Converts a datetime, date or ISO string to an aware UTC datetime, naive values are taken as UTC.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class MarketDataStore:
+    """
+    Month partitioned Arrow IPC store of OHLCV bars, keyed by symbol and interval.
+
+    parameters:
+        root (str | PathLike, default = DEFAULT_ROOT): Directory holding the partitions.
+    """
+
+    def __init__(self, root: str | PathLike = DEFAULT_ROOT):
+        self.root = Path(root)
+
+    def partition_dir(self, symbol: str, interval: str) -> Path:
+        return self.root / symbol / interval
+
+    def partitions(self, symbol: str, interval: str) -> list[Path]:
+        """
+        All month files for a symbol and interval, oldest first.
+        """
+        directory = self.partition_dir(symbol, interval)
+        if not directory.is_dir():
+            return []
+        return sorted(directory.glob("*.arrow"))
+
+    def symbols(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir())
+
+    def intervals(self, symbol: str) -> list[str]:
+        directory = self.root / symbol
+        if not directory.is_dir():
+            return []
+        return sorted(path.name for path in directory.iterdir() if path.is_dir())
+
+    def append(self, df: pl.DataFrame, symbol: str, interval: str) -> int:
+        """
+        Adds bars to the store. Bars are merged into their month partitions, a bar with
+        a timestamp that is already stored replaces the old one. Months that get no new
+        bars are left untouched.
+
+        Returns the number of partitions written.
+        """
+        bars = normalize_bars(df)
+        if bars.is_empty():
+            return 0
+        directory = self.partition_dir(symbol, interval)
+        directory.mkdir(parents=True, exist_ok=True)
+        bars = bars.with_columns(pl.col(TIME_COLUMN).dt.strftime("%Y-%m").alias("_month"))
+        written = 0
+        for (month,), month_bars in bars.group_by("_month", maintain_order=True):
+            path = directory / f"{month}.arrow"
+            month_bars = month_bars.drop("_month")
+            if path.exists():
+                existing = pl.read_ipc(path)
+                month_bars = normalize_bars(pl.concat([existing, month_bars], how="diagonal_relaxed"))
+            # write then rename, so readers that mapped the old file keep a valid view
+            tmp_path = path.with_suffix(".arrow.tmp")
+            month_bars.write_ipc(tmp_path, compression="uncompressed")
+            tmp_path.replace(path)
+            written += 1
+        return written
+
+    def scan(self, symbol: str, interval: str, start=None, end=None,
+             columns: Optional[list[str]] = None) -> pl.LazyFrame:
+        """
+        Lazily scans stored bars in [start, end). Month partitions outside the range
+        are never opened, and the column projection and date filter are pushed
+        down into the IPC scan.
+
+        parameters:
+            symbol (str): For example "BTC-USD".
+            interval (str): For example "1h", "6h", "1d".
+            start, end (Optional[datetime | date | str], default = None): Range bounds,
+                naive values are taken as UTC.
+            columns (Optional[list[str]], default = None): Columns to load besides Datetime.
+        """
+        start = as_utc(start)
+        end = as_utc(end)
+        paths = [
+            path for path in self.partitions(symbol, interval)
+            if (start is None or path.stem >= start.strftime("%Y-%m"))
+            and (end is None or path.stem <= end.strftime("%Y-%m"))
+        ]
+        if not paths:
+            raise FileNotFoundError(
+                f"No stored bars for {symbol} {interval} in {self.root}, "
+                "and no bundled csv file for it, download it with src/tito/data/btc_dl.py"
+            )
+        lazy = pl.scan_ipc(paths)
+        if columns is not None:
+            lazy = lazy.select([TIME_COLUMN, *[name for name in columns if name != TIME_COLUMN]])
+        if start is not None:
+            lazy = lazy.filter(pl.col(TIME_COLUMN) >= start)
+        if end is not None:
+            lazy = lazy.filter(pl.col(TIME_COLUMN) < end)
+        return lazy
+
+    def load(self, symbol: str, interval: str, start=None, end=None,
+             columns: Optional[list[str]] = None, lookback: Optional[str] = None) -> pl.DataFrame:
+        """
+        Loads stored bars into a DataFrame, see scan for the parameters.
+
+        lookback (Optional[str], default = None): A polars duration like "6mo" or "2y".
+            Keeps only the bars within that duration of the last stored bar (or of end).
+        """
+        if lookback is not None and start is None:
+            last = self.last_timestamp(symbol, interval) if end is None else as_utc(end)
+            if last is not None:
+                start = pl.select(pl.lit(last).dt.offset_by(f"-{lookback}")).item()
+        return self.scan(symbol, interval, start, end, columns).collect()
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[datetime]:
+        """
+        Timestamp of the newest stored bar, only reading the newest partition.
+        """
+        paths = self.partitions(symbol, interval)
+        if not paths:
+            return None
+        return pl.scan_ipc(paths[-1]).select(pl.col(TIME_COLUMN).max()).collect().item()
+
+    def import_csv(self, csv_path: str | PathLike, symbol: str, interval: str) -> int:
+        """
+        Imports one of the old btc_data csv files. Returns the number of partitions written.
+        """
+        return self.append(pl.read_csv(csv_path, try_parse_dates=True), symbol, interval)
+
+    def import_bundled(self, symbol: str, interval: str, csv_dir: str | PathLike = BUNDLED_CSV_DIR) -> int:
+        """
+        Imports the bundled csv file of a series, see BUNDLED_CSVS. Returns the number of
+        partitions written, 0 when there is no bundled file for it.
+        """
+        file_name = BUNDLED_CSVS.get((symbol, interval))
+        if file_name is None or not (Path(csv_dir) / file_name).exists():
+            return 0
+        return self.import_csv(Path(csv_dir) / file_name, symbol, interval)
+
+    def has_series(self, symbol: str, interval: str) -> bool:
+        """
+        Whether the series is stored or can be imported from its bundled csv file.
+        """
+        return bool(self.partitions(symbol, interval)) or (symbol, interval) in BUNDLED_CSVS
+
+    def ensure_imported(self, symbol: str, interval: str):
+        """
+        Imports the bundled csv file of a series the store doesn't have yet.
+        """
+        if not self.partitions(symbol, interval):
+            self.import_bundled(symbol, interval)
+
+
+def select_bars(bars: pl.DataFrame, start=None, end=None, columns: Optional[list[str]] = None,
+                lookback: Optional[str] = None) -> pl.DataFrame:
+    """
+    Applies MarketDataStore.load's range, column and lookback selection to bars in memory.
+    """
+    start = as_utc(start)
+    end = as_utc(end)
+    if lookback is not None and start is None and not bars.is_empty():
+        last = bars[TIME_COLUMN].max() if end is None else end
+        start = pl.select(pl.lit(last).dt.offset_by(f"-{lookback}")).item()
+    if start is not None:
+        bars = bars.filter(pl.col(TIME_COLUMN) >= start)
+    if end is not None:
+        bars = bars.filter(pl.col(TIME_COLUMN) < end)
+    if columns is not None:
+        bars = bars.select([TIME_COLUMN, *[name for name in columns if name != TIME_COLUMN]])
+    return bars
+
+
+def load_bars(symbol: str = "BTC-USD", interval: str = "6h", start=None, end=None,
+              columns: Optional[list[str]] = None, lookback: Optional[str] = None,
+              root: str | PathLike = DEFAULT_ROOT) -> pl.DataFrame:
+    """
+    Shortcut used by the strategy modules: MarketDataStore(root).load(...). A series the
+    store doesn't have yet is imported from its bundled csv file first, so the scripts
+    run on a fresh checkout.
+
+    Levels of the bar pyramid above its base (6h, 12h, and 1d when there is no bundled
+    daily file) are aggregated from the base bars by load_pyramid instead, whenever the
+    base series is available, so they are real OHLCV bars of the same download.
+    """
+    # the pyramid module imports this one
+    from tito.data.pyramid import DEFAULT_LEVELS, load_pyramid
+
+    store = MarketDataStore(root)
+    base = DEFAULT_LEVELS[0]
+    if (interval in DEFAULT_LEVELS[1:] and (symbol, interval) not in BUNDLED_CSVS
+            and store.has_series(symbol, base)):
+        return select_bars(load_pyramid(symbol, store=store).level(interval), start, end, columns, lookback)
+    store.ensure_imported(symbol, interval)
+    return store.load(symbol, interval, start, end, columns, lookback)
+
+
+if __name__ == "__main__":
+    # Import the existing csv files into the store
+    store = MarketDataStore()
+    for (symbol, interval), file_name in BUNDLED_CSVS.items():
+        written = store.import_bundled(symbol, interval)
+        print(f"{file_name} -> {symbol}/{interval} ({written} partitions)")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Seeded synthetic OHLCV bars for testing and benchmarking without downloaded data.
+#
+# Models of the (log) close:
+#     gbm:          geometric Brownian motion with an annual drift and volatility.
+#     trend:        returns follow an AR(1) with positive persistence, so moves keep going.
+#     mean_revert:  Ornstein-Uhlenbeck around start_price (moved by drift), so moves fade.
+#     regime:       GBM whose (drift, volatility) switches between regimes at random bars.
+# noise adds non-persistent observation noise to the closes, which is what the
+# efficiency ratio is meant to pick up. Open is the previous close, High/Low extend
+# past the body by an intrabar range and Volume is lognormal, larger on big moves.
+#
+# Bars are produced in chunks of any length. Every random component draws from its
+# own stream of the seed, so the series depends only on the seed and the settings
+# (the chunk size only changes the floating point rounding of the running log price),
+# and 100M bar series can be written with bounded memory.
+
+import numpy as np
+import polars as pl
+from datetime import datetime, timedelta, timezone
+from os import PathLike
+from scipy.signal import lfilter
+from typing import Iterator, Optional
+
+from tito.data.store import BAR_COLUMNS, MarketDataStore
+from tito.data.timeframe import annualization_factor, interval_length
+
+MODELS: tuple[str, ...] = ("gbm", "trend", "mean_revert", "regime")
+
+
+class SyntheticBars:
+    """
+    Reproducible generator of OHLCV bars in the store schema.
+
+    parameters:
+        model (str, default = "gbm"): One of MODELS.
+        interval (str, default = "1h"): Bar length, also sets how the annual drift and volatility scale per bar.
+        seed (int, default = 0): Same seed and settings, same bars.
+        start (datetime, default = 2020-01-01 UTC): Time of the first bar.
+        start_price (float, default = 100.0): Close before the first bar.
+        drift (float, default = 0.0): Annual log drift (gbm, trend, mean_revert).
+        volatility (float, default = 0.6): Annual volatility of the latent log price.
+        noise (float, default = 0.0): Standard deviation of the observation noise on log closes.
+        persistence (float, default = 0.3): AR(1) coefficient of the trend model's returns,
+            in [0, 1). The shocks are scaled so the per-bar volatility stays the same.
+        reversion (float, default = 0.01): Fraction of the deviation from the mean the
+            mean_revert model gives back per bar, in (0, 1].
+        regimes (tuple of (drift, volatility), default = bull then bear): The regime model's states.
+        switch_probability (float, default = 0.002): Chance per bar that the regime model
+            draws a new regime, uniformly from regimes (possibly the current one).
+        volume (float, default = 1000.0): Median volume per bar.
+    """
+
+    def __init__(self, model: str = "gbm", interval: str = "1h", seed: int = 0,
+                 start: datetime = datetime(2020, 1, 1, tzinfo=timezone.utc), start_price: float = 100.0,
+                 drift: float = 0.0, volatility: float = 0.6, noise: float = 0.0,
+                 persistence: float = 0.3, reversion: float = 0.01,
+                 regimes: tuple[tuple[float, float], ...] = ((0.8, 0.4), (-0.8, 0.9)),
+                 switch_probability: float = 0.002, volume: float = 1000.0):
+        if model not in MODELS:
+            raise ValueError(f"Unknown model {model}, expected one of {MODELS}")
+        if not 0 <= persistence < 1:
+            raise ValueError("persistence must be in [0, 1)")
+        if not 0 < reversion <= 1:
+            raise ValueError("reversion must be in (0, 1]")
+        self.model = model
+        self.interval = interval
+        self.seed = seed
+        self.start = start if start.tzinfo is not None else start.replace(tzinfo=timezone.utc)
+        self.start_price = start_price
+        self.drift = drift
+        self.volatility = volatility
+        self.noise = noise
+        self.persistence = persistence
+        self.reversion = reversion
+        self.regimes = tuple(regimes)
+        self.switch_probability = switch_probability
+        self.volume = volume
+
+    def chunks(self, n_bars: int, chunk_size: int = 1_000_000) -> Iterator[pl.DataFrame]:
+        """
+        Yields the first n_bars bars as DataFrames of at most chunk_size rows with the
+        store's BAR_COLUMNS. Only one chunk is held in memory at a time.
+        """
+        shocks, switches, choices, noise, ranges, volumes = (
+            np.random.default_rng(stream) for stream in np.random.SeedSequence(self.seed).spawn(6)
+        )
+        dt = 1 / annualization_factor(self.interval)
+        step_us = interval_length(self.interval) // timedelta(microseconds=1)
+        start_us = int(self.start.timestamp() * 1_000_000)
+        mean_level = np.log(self.start_price)
+
+        # state carried from one chunk to the next
+        log_price = mean_level
+        last_return = 0.0
+        regime = 0
+        prev_close = self.start_price
+
+        for offset in range(0, n_bars, chunk_size):
+            n = min(chunk_size, n_bars - offset)
+            z = shocks.standard_normal(n)
+            drift = np.full(n, self.drift)
+            bar_vol = np.full(n, self.volatility * np.sqrt(dt))
+
+            match self.model:
+                case "gbm":
+                    log_close = log_price + np.cumsum((drift - 0.5 * self.volatility ** 2) * dt + bar_vol * z)
+                case "trend":
+                    phi = self.persistence
+                    returns, _ = lfilter([1.0], [1.0, -phi], bar_vol * np.sqrt(1 - phi ** 2) * z, zi=[phi * last_return])
+                    last_return = returns[-1]
+                    log_close = log_price + np.cumsum(drift * dt + returns)
+                case "mean_revert":
+                    keep = 1 - self.reversion
+                    steps = offset + 1 + np.arange(n)
+                    mean = mean_level + self.drift * dt * steps
+                    previous_mean = mean_level + self.drift * dt * offset
+                    deviation, _ = lfilter([1.0], [1.0, -keep], bar_vol * z, zi=[keep * (log_price - previous_mean)])
+                    log_close = mean + deviation
+                case "regime":
+                    switched = switches.random(n) < self.switch_probability
+                    picks = (choices.random(n) * len(self.regimes)).astype(np.int64)
+                    # regime of each bar is the pick of the latest switch at or before it
+                    latest = np.maximum.accumulate(np.where(switched, np.arange(n), -1))
+                    states = np.where(latest >= 0, picks[np.maximum(latest, 0)], regime)
+                    regime = int(states[-1])
+                    regime_drift, regime_vol = np.array(self.regimes, dtype=np.float64).T
+                    drift, vol = regime_drift[states], regime_vol[states]
+                    bar_vol = vol * np.sqrt(dt)
+                    log_close = log_price + np.cumsum((drift - 0.5 * vol ** 2) * dt + bar_vol * z)
+            log_price = log_close[-1]
+
+            close = np.exp(log_close + self.noise * noise.standard_normal(n))
+            open_ = np.concatenate([[prev_close], close[:-1]])
+            prev_close = close[-1]
+            wicks = np.abs(ranges.standard_normal((n, 2))) * 0.5 * bar_vol[:, None]
+            high = np.maximum(open_, close) * np.exp(wicks[:, 0])
+            low = np.minimum(open_, close) * np.exp(-wicks[:, 1])
+            size = np.abs(np.diff(np.log(np.concatenate([[open_[0]], close])))) / bar_vol
+            volume = self.volume * np.exp(0.5 * volumes.standard_normal(n)) * (1 + size)
+
+            times = start_us + (offset + np.arange(n, dtype=np.int64)) * step_us
+            yield pl.DataFrame({
+                "Datetime": pl.Series(times).cast(pl.Datetime("us")).dt.replace_time_zone("UTC"),
+                "Open": open_,
+                "High": high,
+                "Low": low,
+                "Close": close,
+                "Volume": volume,
+            }).select(BAR_COLUMNS)
+
+    def generate(self, n_bars: int) -> pl.DataFrame:
+        """
+        All n_bars bars as one DataFrame.
+        """
+        return pl.concat(self.chunks(n_bars))
+
+    def to_store(self, n_bars: int, symbol: str, store: Optional[MarketDataStore] = None,
+                 chunk_size: int = 1_000_000) -> int:
+        """
+        Appends n_bars bars to the store under symbol and this generator's interval,
+        chunk by chunk. Returns the number of partition writes.
+        """
+        store = store if store is not None else MarketDataStore()
+        return sum(store.append(chunk, symbol, self.interval) for chunk in self.chunks(n_bars, chunk_size))
+
+    def to_csv(self, path: str | PathLike, n_bars: int, chunk_size: int = 1_000_000):
+        """
+        Writes n_bars bars to a csv file in the btc_data layout, chunk by chunk.
+        """
+        with open(path, "w") as csv_file:
+            for i, chunk in enumerate(self.chunks(n_bars, chunk_size)):
+                chunk.write_csv(csv_file, include_header=i == 0)
+
+
+if __name__ == "__main__":
+    # Store a year of hourly bars per model, e.g. load_bars("SYN-TREND", "1h")
+    for model in MODELS:
+        symbol = f"SYN-{model.upper().replace('_', '-')}"
+        SyntheticBars(model, seed=42).to_store(8766, symbol)
+        print(f"Stored {symbol} 1h")
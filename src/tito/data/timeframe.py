@@ -6,11 +6,110 @@ Created on Wed May  7 12:48:54 2025
 @author: rowan
 """
 
+import re
 import polars as pl
+from datetime import timedelta
 from typing import Optional
 from os import PathLike
+from pathlib import Path
 
-def prune_time(timeframe: int, timestep: str = "hourly", df: Optional[pl.DataFrame] = None, csv_path: Optional[str | PathLike] = None) -> pl.DataFrame:
+# How each OHLCV column is combined when several bars become one
+OHLCV_AGGREGATIONS: dict[str, pl.Expr] = {
+    "Open": pl.col("Open").first(),
+    "High": pl.col("High").max(),
+    "Low": pl.col("Low").min(),
+    "Close": pl.col("Close").last(),
+    "Volume": pl.col("Volume").sum(),
+}
+
+
+def interval_length(interval: str) -> timedelta:
+    """
+    Length of one bar for intervals like "15m", "1h", "6h", "1d", "1w" (or yfinance's "1wk").
+    """
+    match = re.fullmatch(r"(\d+)(m|h|d|w|wk)", interval)
+    if match is None:
+        raise ValueError(f"Unsupported interval {interval}")
+    count, unit = int(match.group(1)), match.group(2)
+    match unit:
+        case "m":
+            return timedelta(minutes=count)
+        case "h":
+            return timedelta(hours=count)
+        case "d":
+            return timedelta(days=count)
+        case "w" | "wk":
+            return timedelta(weeks=count)
+
+
+def annualization_factor(interval: str, days_per_year: float = 365.25) -> float:
+    """
+    Number of bars of the given interval in a year of round the clock trading,
+    e.g. 1461 for "6h" and 730.5 for "12h", the trading_days the strategies use.
+    """
+    return days_per_year * timedelta(days=1) / interval_length(interval)
+
+
+def scan_bars(source: pl.LazyFrame | pl.DataFrame | str | PathLike) -> pl.LazyFrame:
+    """
+    Lazily opens bars from a LazyFrame, DataFrame, csv file or Arrow IPC/Parquet file.
+    """
+    if isinstance(source, pl.LazyFrame):
+        return source
+    if isinstance(source, pl.DataFrame):
+        return source.lazy()
+    match Path(source).suffix:
+        case ".csv":
+            return pl.scan_csv(source, try_parse_dates=True)
+        case ".arrow" | ".ipc" | ".feather":
+            return pl.scan_ipc(source)
+        case ".parquet":
+            return pl.scan_parquet(source)
+        case suffix:
+            raise ValueError(f"Can't scan bars from a {suffix} file")
+
+
+def resample_bars(source: pl.LazyFrame | pl.DataFrame | str | PathLike, intervals: str | list[str],
+                  start=None, end=None, time_col: str = "Datetime") -> dict[str, pl.DataFrame]:
+    """
+    Aggregates bars into real OHLCV bars of longer intervals: first Open, max High,
+    min Low, last Close and summed Volume of the bars in each window.
+    
+    Everything stays lazy until the end, so the [start, end) filter and the column
+    selection are pushed down into the scan, and all requested intervals are built
+    by one pl.collect_all over a shared plan, which reads the source data once.
+    
+    parameters:
+        source (pl.LazyFrame | pl.DataFrame | str | PathLike): Bars or a csv/ipc/parquet file of bars.
+        intervals (str | list[str]): Polars durations to resample to, e.g. "6h", "12h", "1d", "1w".
+        start, end (optional datetime, default = None): Only use source bars in [start, end).
+            Must match the time zone of the time column.
+        time_col (str, default = "Datetime"): The bar timestamp column.
+    
+    returns:
+        dict mapping each interval to its resampled DataFrame.
+    """
+    if isinstance(intervals, str):
+        intervals = [intervals]
+    lazy = scan_bars(source)
+    columns = lazy.collect_schema().names()
+    aggregations = [expr for name, expr in OHLCV_AGGREGATIONS.items() if name in columns]
+    lazy = lazy.select(time_col, *[name for name in OHLCV_AGGREGATIONS if name in columns])
+    if start is not None:
+        lazy = lazy.filter(pl.col(time_col) >= start)
+    if end is not None:
+        lazy = lazy.filter(pl.col(time_col) < end)
+    lazy = lazy.sort(time_col)
+    
+    plans = [
+        lazy.group_by_dynamic(time_col, every=interval, closed="left", label="left").agg(aggregations)
+        for interval in intervals
+    ]
+    return dict(zip(intervals, pl.collect_all(plans)))
+
+
+def prune_time(timeframe: int, timestep: str = "hourly", df: Optional[pl.DataFrame] = None, csv_path: Optional[str | PathLike] = None,
+               how: str = "prune") -> pl.DataFrame:
     """
     Takes in a dataframe or a path to a csv file to read in as a dataframe and splits
     removes data that doesn't fit into the specified timeframe for a given timestep.
@@ -19,6 +118,10 @@ def prune_time(timeframe: int, timestep: str = "hourly", df: Optional[pl.DataFra
         prune_time(6, timestep="hourly", df=arbitrary_df) would return a new dataframe
         where the passed dataframe had all its hours not divisible by 6 removed.
         If hourly were say "daily", it would be every six days instead.
+    
+    With how="resample" the bars are aggregated instead of dropped, so
+    prune_time(6, "hourly", ..., how="resample") returns proper 6 hour OHLCV bars
+    (see resample_bars). The csv file is then scanned lazily instead of read up front.
         
     parameters:
         timeframe (int): The time frame to keep in the data.
@@ -36,6 +139,20 @@ def prune_time(timeframe: int, timestep: str = "hourly", df: Optional[pl.DataFra
     if df is not None and csv_path is not None:
         print("Passed values to both df and csv_path! Can't do that!")
         exit(1)
+    if how == "resample":
+        match timestep:
+            case "hourly":
+                interval = f"{timeframe}h"
+            case "daily":
+                interval = f"{timeframe}d"
+            case _:
+                print(f"Error: timestep for {timestep} not implemented!")
+                exit(1)
+        return resample_bars(df if df is not None else csv_path, interval)[interval]
+    if how != "prune":
+        print(f"Error: how={how} not implemented!")
+        exit(1)
+        
     final_df = df
     if csv_path is not None:
         final_df = pl.read_csv(csv_path, try_parse_dates=True)
@@ -54,5 +171,6 @@ def prune_time(timeframe: int, timestep: str = "hourly", df: Optional[pl.DataFra
 if __name__ == "__main__":
     timestep = 6
     timespan: str = "2mo"
-    df = prune_time(timestep, "hourly", csv_path=f"btc_data/hourly_{timespan}.csv")
-    df.write_csv(f"btc_data/hourly_{timestep}_{timespan}.csv")
\ No newline at end of file
+    df = prune_time(timestep, "hourly", csv_path=f"btc_data/hourly_{timespan}.csv", how="resample")
+    # hourly_6_2mo.csv holds the old pruned bars, the resampled ones go next to it
+    df.write_csv(f"btc_data/hourly_{timestep}_{timespan}_resampled.csv")
\ No newline at end of file
@@ -5,23 +5,27 @@
 
 # Implementation from chapter 1 of Trading Systems and Methods 6th Edition by Perry J. Kaufman
 
+import numpy as np
 import polars as pl
-from pathlib import Path
+from tito.data.store import load_bars
+from tito.data.synthetic import SyntheticBars
+from tito.indicators.efficiency import efficiency_ratio, kama
 
 # %%
 
 # Load data
 timespan: str = "2mo"
-df_path: Path = Path(f"src/tito/data/btc_data/hourly_6_{timespan}.csv")
-#df_path: Path = Path(f"../../data/btc_data/daily_{timespan}.csv")
-data = pl.read_csv(df_path)
+symbol: str = "BTC-USD"
+interval: str = "6h"
+#interval: str = "1d"
+data = load_bars(symbol, interval, lookback=timespan)
 col_name: str = "Close"
 
 # %%
 
 def calculate_ER(price_series: pl.Series) -> float:
     abs_net_price_change = abs(price_series.first() - price_series.last())
-    ind_change_positive = data.select(pl.col(col_name) - pl.col(col_name).shift(1)).to_series().abs()
+    ind_change_positive = price_series.diff().abs()
     sum_ind_abs_price_change = ind_change_positive.sum()
     efficiency_ratio = abs_net_price_change / sum_ind_abs_price_change
 
@@ -59,4 +63,33 @@ print(orig_efficiency_ratio)
 # Can I test this with fake data. How do I test this?
 
 #col_name_mod = pl.Series([data[col_name][0]])
-col_name_mod = pl.concat([pl.Series([data[col_name][0]]), data[col_name][1:] + 233])
\ No newline at end of file
+col_name_mod = pl.concat([pl.Series([data[col_name][0]]), data[col_name][1:] + 233])
+print(calculate_ER(col_name_mod))
+
+# %%
+
+# Rolling ER for several windows at once, the last value of the full length window
+# is the same number as calculate_ER on the whole series
+
+er_windows = [5, 10, 20, len(data) - 1]
+rolling_er = efficiency_ratio(data[col_name], er_windows)
+print(rolling_er[-1], orig_efficiency_ratio)
+
+# KAMA with the classic 10 bar ER window and 2/30 smoothing
+data = data.with_columns(pl.Series("KAMA_10", kama(data[col_name], 10)[:, 0], nan_to_null=True))
+
+# %%
+
+# Fake data: the same random shocks as a persistent trend, with observation noise added,
+# and as a mean reverting series. The ER should be highest for the clean trend. Noise
+# adds close to close movement without taking the price anywhere, so the ER drops,
+# and the mean reverting series has about the trend's volatility but a much lower ER.
+
+for label, generator in [
+    ("trend", SyntheticBars("trend", seed=7, persistence=0.5)),
+    ("trend + noise", SyntheticBars("trend", seed=7, persistence=0.5, noise=0.01)),
+    ("mean revert", SyntheticBars("mean_revert", seed=7, reversion=0.05)),
+]:
+    fake = generator.generate(5000)[col_name]
+    volatility = fake.pct_change().std()
+    print(f"{label:<14} ER(24) mean {np.nanmean(efficiency_ratio(fake, 24)):.3f}, volatility {volatility:.4f}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Kaufman's efficiency ratio and adaptive moving average for many windows at once.
+#
+#     ER_t(w) = |p_t - p_(t-w)| / sum(|p_i - p_(i-1)| for i in (t-w, t])
+#
+# The denominator is a difference of one cumulative sum of absolute changes, so every
+# window is O(n) however long it is, and all windows share the same cumulative sum.
+# KAMA_t = KAMA_(t-1) + sc_t * (p_t - KAMA_(t-1)), sc_t = (ER_t * (fast_sc - slow_sc) + slow_sc) ** 2
+# is a linear recurrence with a per-bar coefficient, solved in blocks of bars with
+# cumulative products so only n / block_size Python steps are needed for any number
+# of parameter sets.
+
+# From chapter 1 of Trading Systems and Methods 6th Edition by Perry J. Kaufman
+
+import numpy as np
+
+
+def efficiency_ratio(prices, windows) -> np.ndarray:
+    """
+    Rolling efficiency ratio of the prices for every window length.
+
+    parameters:
+        prices (array like): (n_bars,) price series, no nulls.
+        windows (int | iterable of int): Window lengths in bars, each >= 1.
+
+    returns:
+        (n_bars, len(windows)) float64 matrix in [0, 1]. NaN for the first window bars
+        of each column, 0 where the price didn't move at all inside the window.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    if (windows < 1).any():
+        raise ValueError("Efficiency ratio windows must be at least 1 bar")
+    n_bars = len(prices)
+    path = np.zeros(n_bars)
+    np.cumsum(np.abs(np.diff(prices)), out=path[1:])
+
+    ratio = np.full((n_bars, len(windows)), np.nan)
+    for j, window in enumerate(windows):
+        if window >= n_bars:
+            continue
+        net = np.abs(prices[window:] - prices[:-window])
+        travelled = path[window:] - path[:-window]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio[window:, j] = np.where(travelled > 0, net / travelled, 0.0)
+    # cancellation in the cumulative sum can push a straight line slightly past 1
+    return np.minimum(ratio, 1.0)
+
+
+def kama(prices, windows, fast=2, slow=30, block_size=256) -> np.ndarray:
+    """
+    Kaufman adaptive moving average for several parameter sets at once.
+
+    windows, fast and slow are broadcast against each other, so kama(prices, [10, 20])
+    gives the default fast/slow for two ER windows and kama(prices, 10, [2, 3], [20, 30])
+    two (fast, slow) pairs. Column j starts at the price of bar windows[j] - 1, like
+    taking the price as the first KAMA value, and is NaN before that.
+
+    parameters:
+        prices (array like): (n_bars,) price series, no nulls.
+        windows (int | iterable of int): Efficiency ratio windows.
+        fast, slow (float | iterable of float, default = 2, 30): EMA spans the
+            smoothing constant moves between, fast > 1.
+        block_size (int, default = 256): Bars solved per vectorized block, upper bound.
+
+    returns:
+        (n_bars, n_parameter_sets) float64 matrix.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    windows, fast, slow = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(windows, dtype=np.int64)),
+        np.atleast_1d(np.asarray(fast, dtype=np.float64)),
+        np.atleast_1d(np.asarray(slow, dtype=np.float64)),
+    )
+    if (fast <= 1).any() or (slow <= 1).any():
+        raise ValueError("KAMA fast and slow spans must be greater than 1")
+    n_bars, n_sets = len(prices), len(windows)
+
+    fast_sc = 2 / (fast + 1)
+    slow_sc = 2 / (slow + 1)
+    distinct, column = np.unique(windows, return_inverse=True)
+    ratio = efficiency_ratio(prices, distinct)[:, column]
+    smoothing = np.nan_to_num((ratio * (fast_sc - slow_sc) + slow_sc) ** 2, nan=0.0)
+    keep = 1 - smoothing
+
+    # Largest block whose running product of keep can't underflow
+    smallest_keep = max(float(np.min(1 - np.maximum(fast_sc, slow_sc) ** 2)), 1e-300)
+    block_size = int(np.clip(250 / max(-np.log10(smallest_keep), 1e-12), 1, block_size))
+
+    # Before its first ER value a column just holds the price of bar window - 1
+    state = prices[np.minimum(windows, n_bars) - 1] if n_bars else np.empty(n_sets)
+    out = np.empty((n_bars, n_sets))
+    for start in range(0, n_bars, block_size):
+        stop = min(start + block_size, n_bars)
+        # k_t = A_t * (k_(start-1) + sum_(j<=t) sc_j * p_j / A_j), A_t = prod_(start<=i<=t) keep_i
+        decay = np.cumprod(keep[start:stop], axis=0)
+        drive = smoothing[start:stop] * prices[start:stop, None]
+        out[start:stop] = decay * (state + np.cumsum(drive / decay, axis=0))
+        state = out[stop - 1]
+
+    out[np.arange(n_bars)[:, None] < windows - 1] = np.nan
+    return out
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Declarative indicator expressions that compile a whole strategy into one lazy polars query.
+#
+# Indicators are small immutable nodes (Indicator) combined with the usual operators:
+#
+#     close = price()
+#     lines = macd(close, 6, 41, 19)
+#     bands = bollinger(close, 10, 2)
+#     strategy = Strategy(
+#         position(all_of(lines.line > lines.signal, bands.lower <= close)),
+#         MACD_line=lines.line, signal_line=lines.signal, Lower_Band=bands.lower,
+#     )
+#     data = strategy.evaluate(bars)
+#
+# Planning walks the graph of all the strategy's columns, merges structurally equal
+# nodes, and turns every stateful node (EMA, rolling window, hold) and every node used
+# more than once into an intermediate column. The intermediates are grouped into layers
+# by dependency depth, one with_columns per layer, so each EMA or rolling window is
+# computed once and the independent ones of a layer run in parallel. Elementwise
+# arithmetic and comparisons are inlined into the columns that use them. polars' own
+# common subexpression elimination isn't relied on as it skips window functions. Plans
+# are cached by the graph, so rebuilding a strategy with the same parameters doesn't
+# plan it again.
+#
+# evaluate() applies the layers to a DataFrame eagerly, which is what the strategy
+# scripts' few thousand bars want: there a lazy query's fixed planning cost is larger
+# than the indicators. From EAGER_MAX_ROWS bars on, and for LazyFrames, it collects
+# compile(), the same layers as one LazyFrame, which is also there for scans of the
+# store and for adding more lazy steps.
+
+import operator
+import polars as pl
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from tito.strategies.backtest import backtest, excess_returns
+
+
+def _hold(enter: pl.Expr, exit: pl.Expr) -> pl.Expr:
+    return pl.when(enter).then(1).when(exit).then(0).forward_fill().fill_null(0)
+
+
+# op name -> builder of the polars expression from the arguments' expressions and the node's params
+OPS: dict[str, Callable[..., pl.Expr]] = {
+    "col": lambda name: pl.col(name),
+    "lit": lambda value: pl.lit(value),
+    "ewm": lambda source, span: source.ewm_mean(span=span),
+    "sma": lambda source, window: source.rolling_mean(window),
+    "std": lambda source, window: source.rolling_std(window),
+    "shift": lambda source, n: source.shift(n),
+    "fill_null": lambda source, value: source.fill_null(value),
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "truediv": operator.truediv,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "and": operator.and_,
+    "or": operator.or_,
+    "neg": operator.neg,
+    "not": operator.invert,
+    "all": lambda *conditions: pl.all_horizontal(conditions),
+    "any": lambda *conditions: pl.any_horizontal(conditions),
+    "position": lambda condition: pl.when(condition).then(1).otherwise(0),
+    "hold": _hold,
+}
+# ops that look at earlier bars and are worth computing only once
+STATEFUL: set[str] = {"ewm", "sma", "std", "hold"}
+# frames from this many rows on are evaluated as one lazy query, below it eagerly
+EAGER_MAX_ROWS: int = 1_000_000
+
+
+class Indicator:
+    """
+    One node of an indicator expression: an op from OPS, its argument nodes and its
+    parameters. Nodes with the same op, params and arguments are the same indicator
+    and compile to a single column.
+    """
+
+    __slots__ = ("op", "args", "params", "key")
+
+    def __init__(self, op: str, args=(), params=()):
+        self.op = op
+        self.args = tuple(args)
+        self.params = tuple(params)
+        self.key = (op, self.params, tuple(arg.key for arg in self.args))
+
+    def __repr__(self):
+        inner = ", ".join([repr(arg) for arg in self.args] + [repr(param) for param in self.params])
+        return f"{self.op}({inner})"
+
+    def expr(self) -> pl.Expr:
+        """
+        The node as a single polars expression, e.g. for .over() in portfolio backtests.
+        Shared subexpressions are repeated, compile a Strategy to compute them once.
+        """
+        return OPS[self.op](*[arg.expr() for arg in self.args], *self.params)
+
+    def _binary(self, op, other, reverse=False) -> "Indicator":
+        other = _node(other)
+        return Indicator(op, (other, self) if reverse else (self, other))
+
+    def __add__(self, other): return self._binary("add", other)
+    def __radd__(self, other): return self._binary("add", other, reverse=True)
+    def __sub__(self, other): return self._binary("sub", other)
+    def __rsub__(self, other): return self._binary("sub", other, reverse=True)
+    def __mul__(self, other): return self._binary("mul", other)
+    def __rmul__(self, other): return self._binary("mul", other, reverse=True)
+    def __truediv__(self, other): return self._binary("truediv", other)
+    def __rtruediv__(self, other): return self._binary("truediv", other, reverse=True)
+    def __gt__(self, other): return self._binary("gt", other)
+    def __ge__(self, other): return self._binary("ge", other)
+    def __lt__(self, other): return self._binary("lt", other)
+    def __le__(self, other): return self._binary("le", other)
+    def __and__(self, other): return self._binary("and", other)
+    def __or__(self, other): return self._binary("or", other)
+    def __neg__(self): return Indicator("neg", (self,))
+    def __invert__(self): return Indicator("not", (self,))
+
+    def shift(self, n=1) -> "Indicator":
+        return Indicator("shift", (self,), (n,))
+
+    def fill_null(self, value) -> "Indicator":
+        return Indicator("fill_null", (self,), (value,))
+
+
+Source = Indicator | str | int | float
+
+
+def _node(value: Source) -> Indicator:
+    if isinstance(value, Indicator):
+        return value
+    if isinstance(value, str):
+        return Indicator("col", params=(value,))
+    return Indicator("lit", params=(value,))
+
+
+class MACDLines(NamedTuple):
+    line: Indicator
+    signal: Indicator
+    histogram: Indicator
+
+
+class Bands(NamedTuple):
+    sma: Indicator
+    std: Indicator
+    upper: Indicator
+    lower: Indicator
+
+
+class StrategyResult(NamedTuple):
+    data: pl.DataFrame  # input bars plus the strategy's columns and positions
+    pnl_t: pl.Series
+    total_pnl: float
+    sharpe_ratio: float
+
+
+def price(col_name: str = "Close") -> Indicator:
+    return _node(col_name)
+
+
+def ema(source: Source, span) -> Indicator:
+    return Indicator("ewm", (_node(source),), (span,))
+
+
+def sma(source: Source, window) -> Indicator:
+    return Indicator("sma", (_node(source),), (window,))
+
+
+def rolling_std(source: Source, window) -> Indicator:
+    return Indicator("std", (_node(source),), (window,))
+
+
+def macd(source: Source = "Close", short_span=12, long_span=26, signal_span=9) -> MACDLines:
+    """
+    MACD line (short EMA - long EMA), its signal line EMA and the histogram between them.
+    """
+    line = ema(source, short_span) - ema(source, long_span)
+    signal = ema(line, signal_span)
+    return MACDLines(line, signal, line - signal)
+
+
+def bollinger(source: Source = "Close", window_size=20, num_std=2) -> Bands:
+    """
+    Rolling SMA with bands num_std rolling standard deviations above and below it, null while filling.
+    """
+    mean = sma(source, window_size)
+    std = rolling_std(source, window_size)
+    return Bands(mean, std, mean + num_std * std, mean - num_std * std)
+
+
+def above(a: Source, b: Source) -> Indicator:
+    return _node(a) > _node(b)
+
+
+def below(a: Source, b: Source) -> Indicator:
+    return _node(a) < _node(b)
+
+
+def crossover(a: Source, b: Source) -> Indicator:
+    """
+    True on the bars where a moves from at or below b to above it.
+    """
+    a, b = _node(a), _node(b)
+    return (a > b) & (a.shift(1) <= b.shift(1))
+
+
+def crossunder(a: Source, b: Source) -> Indicator:
+    return crossover(b, a)
+
+
+def all_of(*conditions: Indicator) -> Indicator:
+    return Indicator("all", conditions)
+
+
+def any_of(*conditions: Indicator) -> Indicator:
+    return Indicator("any", conditions)
+
+
+def position(condition: Indicator) -> Indicator:
+    """
+    1 where the condition holds, else 0. Null conditions (indicators still filling) count as 0.
+    """
+    return Indicator("position", (condition,))
+
+
+def hold(enter: Indicator, exit: Indicator) -> Indicator:
+    """
+    1 from a bar where enter holds until a bar where exit holds, 0 before the first entry.
+    Enter wins when both hold on the same bar.
+    """
+    return Indicator("hold", (enter, exit))
+
+
+def change(source: Source) -> Indicator:
+    """
+    Difference to the previous bar, the first bar is compared to 0.
+    """
+    source = _node(source)
+    return source - source.shift(1).fill_null(0)
+
+
+def compile_layers(columns: dict[str, Indicator]) -> tuple[list[list[pl.Expr]], list[str]]:
+    """
+    Plans the with_columns layers computing the named indicator columns.
+
+    returns:
+        (layers, intermediates): Expression lists to apply in order, the last one adds the
+        named columns, and the names of the intermediate columns to drop afterwards.
+    """
+    return _plan(tuple((name, node.key) for name, node in columns.items()))
+
+
+@lru_cache(maxsize=256)
+def _plan(columns: tuple[tuple[str, tuple], ...]) -> tuple[list[list[pl.Expr]], list[str]]:
+    # works on the node keys, which hold the op, params and argument keys of the whole
+    # graph, so strategies rebuilt with the same parameters reuse their plan
+    uses: Counter = Counter()
+
+    def visit(key: tuple):
+        uses[key] += 1
+        if uses[key] == 1:
+            for arg_key in key[2]:
+                visit(arg_key)
+
+    for _, key in columns:
+        visit(key)
+
+    staged: dict[tuple, str] = {}
+    layers: list[list[pl.Expr]] = []
+    built: dict[tuple, tuple[pl.Expr, int]] = {}
+
+    def build(key: tuple) -> tuple[pl.Expr, int]:
+        # the expression of a node and the first layer where it can be used
+        if key in built:
+            return built[key]
+        op, params, arg_keys = key
+        args = [build(arg_key) for arg_key in arg_keys]
+        level = max((arg_level for _, arg_level in args), default=0)
+        expr = OPS[op](*[arg_expr for arg_expr, _ in args], *params)
+        if op in STATEFUL or (uses[key] > 1 and op not in ("col", "lit")):
+            name = staged[key] = f"__indicator_{len(staged)}"
+            while len(layers) <= level:
+                layers.append([])
+            layers[level].append(expr.alias(name))
+            expr, level = pl.col(name), level + 1
+        built[key] = (expr, level)
+        return built[key]
+
+    final = [build(key)[0].alias(name) for name, key in columns]
+    return layers + [final], list(staged.values())
+
+
+class Strategy:
+    """
+    Named indicator columns plus a positions indicator, compiled into one lazy query.
+
+    parameters:
+        positions (Optional[Indicator]): Position held at each bar's close, e.g. position(...)
+            or hold(...). Without it only the indicator columns are added.
+        **columns (Indicator): Indicator columns to add, by name.
+    """
+
+    def __init__(self, positions: Optional[Indicator] = None, **columns: Indicator):
+        self.positions = positions
+        self.columns = columns
+
+    def layers(self) -> tuple[list[list[pl.Expr]], list[str]]:
+        """
+        compile_layers of the strategy's columns and positions, cast to Int64.
+        """
+        columns = dict(self.columns)
+        if self.positions is not None:
+            columns["positions"] = self.positions
+        layers, intermediates = compile_layers(columns)
+        if self.positions is not None:
+            *layers, final = layers
+            layers = layers + [[*final[:-1], final[-1].cast(pl.Int64)]]
+        return layers, intermediates
+
+    def compile(self, bars: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
+        """
+        The lazy query adding every column of the strategy, and positions, to the bars.
+        """
+        layers, intermediates = self.layers()
+        plan = bars.lazy()
+        for layer in layers:
+            plan = plan.with_columns(layer)
+        return plan.drop(intermediates)
+
+    def evaluate(self, bars: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+        """
+        The bars with every column of the strategy, and positions, added.
+
+        A DataFrame of less than EAGER_MAX_ROWS bars gets the layers eagerly, one
+        with_columns each: on the few thousand bars of the strategy scripts the lazy
+        query's planning costs more than the indicators themselves. Larger frames and
+        LazyFrames are compiled and collected.
+        """
+        if isinstance(bars, pl.LazyFrame) or len(bars) >= EAGER_MAX_ROWS:
+            return self.compile(bars).collect()
+        layers, intermediates = self.layers()
+        for layer in layers:
+            bars = bars.with_columns(layer)
+        return bars.drop(intermediates)
+
+    def run(self, bars: pl.DataFrame | pl.LazyFrame, transaction_cost=0.0005, risk_free_rate=0.0421,
+            trading_days=1461, col_name="Close") -> StrategyResult:
+        """
+        Evaluates the strategy and backtests its positions like the strategy scripts.
+        """
+        if self.positions is None:
+            raise ValueError("Strategy has no positions to backtest")
+        data = self.evaluate(bars)
+        excessret = excess_returns(data[col_name], risk_free_rate, trading_days)
+        result = backtest(data["positions"], excessret, transaction_cost, trading_days)
+        return StrategyResult(
+            data=data,
+            pnl_t=pl.Series("pnl_t", result.pnl[:, 0], nan_to_null=True),
+            total_pnl=float(result.total_pnl[0]),
+            sharpe_ratio=float(result.sharpe_ratio[0]),
+        )
+
+
+def macd_strategy(short_span=12, long_span=26, signal_span=9, col_name="Close") -> Strategy:
+    """
+    macd.py: long while the MACD line is above its signal line.
+    """
+    lines = macd(col_name, short_span, long_span, signal_span)
+    return Strategy(
+        position(above(lines.line, lines.signal)),
+        MACD_line=lines.line,
+        signal_line=lines.signal,
+        histogram=lines.histogram,
+    )
+
+
+def macd_bb_strategy(short_span=6, long_span=41, signal_span=19, window_size=10, num_std=2, col_name="Close") -> Strategy:
+    """
+    macd_bb.py: long while the MACD line is above its signal line and the close is at or above the lower band.
+    """
+    close = price(col_name)
+    lines = macd(close, short_span, long_span, signal_span)
+    bands = bollinger(close, window_size, num_std)
+    positions = position(all_of(above(lines.line, lines.signal), bands.lower <= close))
+    return Strategy(
+        positions,
+        MACD_line=lines.line,
+        signal_line=lines.signal,
+        histogram=lines.histogram,
+        SMA=bands.sma,
+        Upper_Band=bands.upper,
+        Lower_Band=bands.lower,
+        position_change=change(positions),
+    )
+
+
+def bollinger_bands_strategy(window_size=20, num_std=2, col_name="Close") -> Strategy:
+    """
+    bb.py: the SMA, rolling std and bands, without positions.
+    """
+    bands = bollinger(col_name, window_size, num_std)
+    return Strategy(
+        SMA=bands.sma,
+        SMSTD=bands.std,
+        Upper_Band=bands.upper,
+        Lower_Band=bands.lower,
+    )
+
+
+def bollinger_strategy(window_size=20, num_std=2, col_name="Close") -> Strategy:
+    """
+    The bands of bollinger_bands_strategy traded like portfolio.bollinger_positions: long
+    after a close below the lower band until a close above the upper band.
+    """
+    close = price(col_name)
+    bands = bollinger(close, window_size, num_std)
+    return Strategy(
+        hold(below(close, bands.lower), above(close, bands.upper)),
+        SMA=bands.sma,
+        SMSTD=bands.std,
+        Upper_Band=bands.upper,
+        Lower_Band=bands.lower,
+    )
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Rolling mean and standard deviation of many window lengths from one set of prefix sums.
+#
+# With cumulative sums S1 of the prices and S2 of their squares, the sum and sum of
+# squares of any window are two subtractions, so every extra window length costs O(n)
+# instead of another pass of polars' rolling_mean/rolling_std.
+#
+# Plain cumsums of price and price ** 2 lose precision: S2 grows with the length of the
+# series and the square of the price level, and the window's sum of squares is the
+# difference of two of those huge numbers. So the series is cut into blocks of at least
+# the longest window and every block gets its own prefix sums, over the block and the one
+# before it, of the prices minus the block's first price. A window ending in a block
+# never reaches past the block before it, the sums only grow over two blocks of local
+# price moves, and the variance uses the shifted sums
+#     var = (S2 - S1 ** 2 / w) / (w - ddof)
+# which is the same for any shift but stays accurate when the shift is close to the prices.
+# rolling_mean and rolling_mean_std build one PrefixSums per power of two block length,
+# so a window's sums never cover more than about four times its own length and a 5 bar
+# std isn't computed from sums over the blocks a 500 bar window needs.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import NamedTuple
+
+DEFAULT_BLOCK_SIZE: int = 64
+
+
+class RollingMoments(NamedTuple):
+    mean: np.ndarray
+    std: np.ndarray
+
+
+class PrefixSums:
+    """
+    Block anchored prefix sums of a price series, see the top of the module.
+
+    parameters:
+        prices (array like): (n_bars,) price series, no nulls.
+        max_window (int): Longest window that will be asked for.
+        block_size (int, default = DEFAULT_BLOCK_SIZE): Bars per block, raised to
+            max_window when that is longer.
+    """
+
+    def __init__(self, prices, max_window: int, block_size: int = DEFAULT_BLOCK_SIZE):
+        prices = np.asarray(prices, dtype=np.float64)
+        if max_window < 1:
+            raise ValueError("Rolling windows must be at least 1 bar")
+        self.n_bars = len(prices)
+        self.block = block = max(int(max_window), block_size)
+        n_blocks = max(-(-self.n_bars // block), 1)
+
+        # row b holds blocks b - 1 and b, the block before the first one repeats the
+        # first price so it adds nothing to the sums
+        padded = np.zeros((n_blocks + 1) * block)
+        padded[block:block + self.n_bars] = prices
+        padded[:block] = padded[block]
+        anchors = padded[block::block]
+        deviations = sliding_window_view(padded, 2 * block)[::block] - anchors[:, None]
+        self.cum = np.zeros((n_blocks, 2 * block + 1))
+        np.cumsum(deviations, axis=1, out=self.cum[:, 1:])
+        deviations *= deviations
+        self.cum_sq = np.zeros((n_blocks, 2 * block + 1))
+        np.cumsum(deviations, axis=1, out=self.cum_sq[:, 1:])
+        self.anchor = np.repeat(anchors, block)[:self.n_bars]
+
+    def _window_sums(self, cum: np.ndarray, window: int) -> np.ndarray:
+        # bar t of block b is column block + t % block + 1 of its row
+        block = self.block
+        sums = cum[:, block + 1:] - cum[:, block + 1 - window:2 * block + 1 - window]
+        return sums.ravel()[:self.n_bars]
+
+    def _check(self, window: int):
+        if not 1 <= window <= self.block:
+            raise ValueError(f"Window {window} is outside 1..{self.block}, build the PrefixSums with a larger max_window")
+
+    def mean(self, window: int) -> np.ndarray:
+        """
+        Rolling mean over window bars, NaN for the first window - 1 bars.
+        """
+        self._check(window)
+        mean = self.anchor + self._window_sums(self.cum, window) / window
+        mean[:window - 1] = np.nan
+        return mean
+
+    def mean_std(self, window: int, ddof: int = 1) -> RollingMoments:
+        """
+        Rolling mean and standard deviation over window bars, NaN for the first window - 1
+        bars. ddof = 1 like polars' rolling_std.
+        """
+        self._check(window)
+        total = self._window_sums(self.cum, window)
+        total_sq = self._window_sums(self.cum_sq, window)
+        mean = self.anchor + total / window
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # rounding can leave a flat window's variance a hair below 0
+            std = np.sqrt(np.maximum(total_sq - total * total / window, 0.0) / (window - ddof))
+        mean[:window - 1] = np.nan
+        std[:window - 1 if window > ddof else None] = np.nan
+        return RollingMoments(mean, std)
+
+
+def window_groups(windows, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    Splits window lengths by the power of two block length, at least block_size, that
+    fits them. Yields (block length, positions of its windows in windows).
+    """
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    if (windows < 1).any():
+        raise ValueError("Rolling windows must be at least 1 bar")
+    blocks = np.maximum(block_size, 1 << np.ceil(np.log2(np.maximum(windows, 1))).astype(np.int64))
+    for block in np.unique(blocks):
+        yield int(block), np.flatnonzero(blocks == block)
+
+
+def rolling_mean(prices, windows) -> np.ndarray:
+    """
+    Rolling means of the prices for every window length.
+
+    returns:
+        (n_bars, len(windows)) column major float64 matrix, column j equal to polars'
+        rolling_mean(windows[j]) to floating point tolerance, NaN while filling.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    # column major, so every window's column is contiguous to write and to gather
+    mean = np.full((len(prices), len(windows)), np.nan, order="F")
+    for block, columns in window_groups(windows):
+        sums = PrefixSums(prices, block, block)
+        for j in columns:
+            mean[:, j] = sums.mean(int(windows[j]))
+    return mean
+
+
+def rolling_mean_std(prices, windows, ddof: int = 1) -> RollingMoments:
+    """
+    Rolling means and standard deviations of the prices for every window length.
+
+    parameters:
+        prices (array like): (n_bars,) price series, no nulls.
+        windows (int | iterable of int): Window lengths in bars, each >= 1.
+        ddof (int, default = 1): Delta degrees of freedom of the standard deviation.
+
+    returns:
+        RollingMoments of two (n_bars, len(windows)) column major float64 matrices, column j equal to
+        polars' rolling_mean and rolling_std of windows[j] to floating point tolerance,
+        NaN while filling.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    mean = np.full((len(prices), len(windows)), np.nan, order="F")
+    std = np.full((len(prices), len(windows)), np.nan, order="F")
+    for block, columns in window_groups(windows):
+        sums = PrefixSums(prices, block, block)
+        for j in columns:
+            mean[:, j], std[:, j] = sums.mean_std(int(windows[j]), ddof)
+    return RollingMoments(mean, std)
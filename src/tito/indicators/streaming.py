@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Incremental indicators that update in O(1) per bar, for live data.
+# Each one matches the polars batch version on the same series:
+#   EMA            -> pl.col(...).ewm_mean(span=span)
+#   MACD           -> the MACD_line / signal_line / histogram columns in macd.py
+#   RollingStats   -> pl.col(...).rolling_mean(window) / rolling_std(window)
+#   BollingerBands -> the SMA and bands in bb.py and macd_bb.py
+# Nulls are not supported, feed them finite prices only.
+
+import numpy as np
+from math import sqrt
+
+
+class EMA:
+    """
+    Exponentially weighted mean with the same adjust=True weighting as polars' ewm_mean.
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.numerator = 0.0
+        self.denominator = 0.0
+
+    @property
+    def value(self):
+        return self.numerator / self.denominator if self.denominator else None
+
+    def update(self, price) -> float:
+        """
+        Adds one bar and returns the new EMA.
+        """
+        decay = 1 - self.alpha
+        self.numerator = price + decay * self.numerator
+        self.denominator = 1 + decay * self.denominator
+        return self.numerator / self.denominator
+
+    def update_many(self, prices) -> np.ndarray:
+        """
+        Adds a batch of bars in order and returns the EMA after each one.
+        """
+        return np.array([self.update(price) for price in prices], dtype=np.float64)
+
+    def snapshot(self) -> dict:
+        return {"span": self.span, "numerator": self.numerator, "denominator": self.denominator}
+
+    @classmethod
+    def restore(cls, state: dict) -> "EMA":
+        ema = cls(state["span"])
+        ema.numerator = state["numerator"]
+        ema.denominator = state["denominator"]
+        return ema
+
+
+class MACD:
+    """
+    MACD line, signal line and histogram built from three incremental EMAs.
+    """
+
+    def __init__(self, short_span=12, long_span=26, signal_span=9):
+        self.short_ema = EMA(short_span)
+        self.long_ema = EMA(long_span)
+        self.signal_ema = EMA(signal_span)
+
+    def update(self, price) -> tuple[float, float, float]:
+        """
+        Adds one bar and returns (MACD_line, signal_line, histogram).
+        """
+        macd_line = self.short_ema.update(price) - self.long_ema.update(price)
+        signal_line = self.signal_ema.update(macd_line)
+        return macd_line, signal_line, macd_line - signal_line
+
+    def update_many(self, prices) -> np.ndarray:
+        """
+        Adds a batch of bars and returns an (n, 3) array of
+        (MACD_line, signal_line, histogram) rows.
+        """
+        return np.array([self.update(price) for price in prices], dtype=np.float64).reshape(-1, 3)
+
+    def snapshot(self) -> dict:
+        return {
+            "short_ema": self.short_ema.snapshot(),
+            "long_ema": self.long_ema.snapshot(),
+            "signal_ema": self.signal_ema.snapshot(),
+        }
+
+    @classmethod
+    def restore(cls, state: dict) -> "MACD":
+        macd = cls.__new__(cls)
+        macd.short_ema = EMA.restore(state["short_ema"])
+        macd.long_ema = EMA.restore(state["long_ema"])
+        macd.signal_ema = EMA.restore(state["signal_ema"])
+        return macd
+
+
+class RollingStats:
+    """
+    Rolling mean and sample standard deviation over the last window bars.
+
+    Keeps the window in a ring buffer and updates the mean and sum of squared
+    deviations Welford style, adding the new bar and dropping the oldest in one step.
+    Rounding errors of the sliding updates add up over long runs, so every time the
+    ring buffer wraps (once per window bars) mean and m2 are recomputed from it exactly,
+    keeping the cost O(1) per bar amortized.
+    Like polars, mean and std are None until window bars have been seen.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = np.zeros(window, dtype=np.float64)
+        self.count = 0  # bars seen, capped at window
+        self.head = 0  # next slot to overwrite
+        self.mean_ = 0.0
+        self.m2 = 0.0
+
+    @property
+    def mean(self):
+        return self.mean_ if self.count == self.window else None
+
+    @property
+    def std(self):
+        if self.count < self.window or self.window < 2:
+            return None
+        return sqrt(max(self.m2, 0.0) / (self.window - 1))
+
+    def update(self, price) -> tuple:
+        """
+        Adds one bar and returns (mean, std), both None while the window is filling.
+        """
+        if self.count < self.window:
+            self.count += 1
+            delta = price - self.mean_
+            self.mean_ += delta / self.count
+            self.m2 += delta * (price - self.mean_)
+        else:
+            oldest = self.buffer[self.head]
+            old_mean = self.mean_
+            self.mean_ += (price - oldest) / self.window
+            self.m2 += (price - oldest) * (price - self.mean_ + oldest - old_mean)
+        self.buffer[self.head] = price
+        self.head = (self.head + 1) % self.window
+        if self.head == 0 and self.count == self.window:
+            self.resync()
+        return self.mean, self.std
+
+    def resync(self):
+        """
+        Recomputes mean and m2 from the full window in two passes.
+        """
+        self.mean_ = float(self.buffer.mean())
+        self.m2 = float(np.square(self.buffer - self.mean_).sum())
+
+    def update_many(self, prices) -> np.ndarray:
+        """
+        Adds a batch of bars and returns an (n, 2) array of (mean, std) rows, NaN while filling.
+        """
+        out = np.full((len(prices), 2), np.nan)
+        for i, price in enumerate(prices):
+            mean, std = self.update(price)
+            if mean is not None:
+                out[i, 0] = mean
+            if std is not None:
+                out[i, 1] = std
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "window": self.window,
+            "buffer": self.buffer.tolist(),
+            "count": self.count,
+            "head": self.head,
+            "mean": self.mean_,
+            "m2": self.m2,
+        }
+
+    @classmethod
+    def restore(cls, state: dict) -> "RollingStats":
+        stats = cls(state["window"])
+        stats.buffer = np.array(state["buffer"], dtype=np.float64)
+        stats.count = state["count"]
+        stats.head = state["head"]
+        stats.mean_ = state["mean"]
+        stats.m2 = state["m2"]
+        return stats
+
+
+class BollingerBands:
+    """
+    SMA plus and minus num_std rolling standard deviations, as in bb.py.
+    """
+
+    def __init__(self, window=20, num_std=2):
+        self.num_std = num_std
+        self.stats = RollingStats(window)
+
+    def update(self, price) -> tuple:
+        """
+        Adds one bar and returns (SMA, Upper_Band, Lower_Band), None while filling.
+        """
+        mean, std = self.stats.update(price)
+        if mean is None or std is None:
+            return None, None, None
+        return mean, mean + self.num_std * std, mean - self.num_std * std
+
+    def update_many(self, prices) -> np.ndarray:
+        """
+        Adds a batch of bars and returns an (n, 3) array of (SMA, Upper_Band, Lower_Band), NaN while filling.
+        """
+        stats = self.stats.update_many(prices)
+        mean, std = stats[:, 0], stats[:, 1]
+        return np.column_stack([mean, mean + self.num_std * std, mean - self.num_std * std])
+
+    def snapshot(self) -> dict:
+        return {"num_std": self.num_std, "stats": self.stats.snapshot()}
+
+    @classmethod
+    def restore(cls, state: dict) -> "BollingerBands":
+        bands = cls.__new__(cls)
+        bands.num_std = state["num_std"]
+        bands.stats = RollingStats.restore(state["stats"])
+        return bands
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ZeroMQ market data bus: one publisher fans bars out to any number of strategy processes.
+#
+# Every message is three frames:
+#     topic:  b"<symbol>/<interval>/", subscribers filter on it
+#     header: HEADER packed (sequence, sent_ns, flags)
+#     bars:   the raw bytes of a BAR_DTYPE record array, one or more bars
+# The bars are sent straight from the array's memory and received as an array
+# over the ZeroMQ frame (np.frombuffer), no JSON or pickle on either side. Sequences
+# count up from 0 per topic so subscribers can detect dropped messages, a message with
+# the END_OF_STREAM flag tells them a replay is over.
+#
+# The publisher is an XPUB socket, which sees the subscriptions coming in. replay() waits
+# for them before sending, so backtests driven from stored history don't lose the first
+# bars to ZeroMQ's slow joiner problem.
+
+import heapq
+import struct
+import time
+from datetime import datetime, timezone
+from os import PathLike
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+import polars as pl
+import zmq
+
+from tito.data.store import DEFAULT_ROOT, MarketDataStore, TIME_COLUMN
+from tito.live.runtime import Bar, LatencyHistogram
+
+DEFAULT_ENDPOINT: str = "tcp://127.0.0.1:5556"
+# Datetime is microseconds since the epoch in UTC, like the store's Datetime column
+BAR_DTYPE = np.dtype([
+    ("Datetime", "<i8"),
+    ("Open", "<f8"),
+    ("High", "<f8"),
+    ("Low", "<f8"),
+    ("Close", "<f8"),
+    ("Volume", "<f8"),
+])
+HEADER = struct.Struct("<QqI")
+END_OF_STREAM: int = 1
+
+
+def topic(symbol: str, interval: str) -> bytes:
+    # the trailing separator keeps "BTC-USD/1h/" from also matching "BTC-USD/1h30m/"
+    return f"{symbol}/{interval}/".encode()
+
+
+def to_records(bars: pl.DataFrame) -> np.ndarray:
+    """
+    Packs a frame of store bars into a contiguous BAR_DTYPE record array.
+    """
+    records = np.empty(len(bars), dtype=BAR_DTYPE)
+    records["Datetime"] = bars[TIME_COLUMN].dt.epoch("us").to_numpy()
+    for name in BAR_DTYPE.names[1:]:
+        records[name] = bars[name].to_numpy() if name in bars.columns else np.nan
+    return records
+
+
+def to_frame(records: np.ndarray) -> pl.DataFrame:
+    """
+    Unpacks a BAR_DTYPE record array into a frame with the store schema.
+    """
+    return pl.DataFrame({name: records[name] for name in BAR_DTYPE.names}).with_columns(
+        pl.col(TIME_COLUMN).cast(pl.Datetime("us", "UTC"))
+    )
+
+
+class BarBatch(NamedTuple):
+    symbol: str
+    interval: str
+    sequence: int
+    sent_ns: int  # time.time_ns() when published
+    records: np.ndarray  # BAR_DTYPE view of the received frame, not a copy
+    missed: int  # messages of this topic lost since the previous one
+
+    def bars(self) -> Iterator[Bar]:
+        for row in self.records.tolist():
+            yield Bar(self.symbol, datetime.fromtimestamp(row[0] / 1e6, timezone.utc), *row[1:])
+
+
+class BarPublisher:
+    """
+    Publishes bars on the bus.
+
+    parameters:
+        endpoint (str, default = DEFAULT_ENDPOINT): Address to bind.
+        hwm (int, default = 100000): Messages queued per subscriber before ZeroMQ drops them.
+    """
+
+    def __init__(self, endpoint: str = DEFAULT_ENDPOINT, hwm: int = 100_000, context: Optional[zmq.Context] = None):
+        self.context = context or zmq.Context.instance()
+        self.socket = self.context.socket(zmq.XPUB)
+        # pass on every subscription, also repeated ones, so they can be counted
+        self.socket.setsockopt(zmq.XPUB_VERBOSE, 1)
+        self.socket.setsockopt(zmq.SNDHWM, hwm)
+        self.socket.bind(endpoint)
+        self.sequences: dict[bytes, int] = {}
+
+    def wait_for_subscribers(self, subscriptions: int, timeout: float = 10.0):
+        """
+        Blocks until the given number of topic subscriptions arrived.
+        Raises TimeoutError if they don't within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        seen = 0
+        while seen < subscriptions:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.socket.poll(remaining * 1000):
+                raise TimeoutError(f"{seen} of {subscriptions} subscriptions after {timeout} s")
+            if self.socket.recv().startswith(b"\x01"):
+                seen += 1
+
+    def _send(self, key: bytes, records: np.ndarray, flags: int) -> int:
+        sequence = self.sequences.get(key, 0)
+        self.sequences[key] = sequence + 1
+        header = HEADER.pack(sequence, time.time_ns(), flags)
+        self.socket.send_multipart([key, header, records], copy=False)
+        return sequence
+
+    def publish(self, symbol: str, interval: str, bars: pl.DataFrame | np.ndarray) -> int:
+        """
+        Publishes one or more bars as a single message and returns its sequence number.
+
+        parameters:
+            bars (pl.DataFrame | np.ndarray): Store bars or a BAR_DTYPE record array.
+        """
+        records = bars if isinstance(bars, np.ndarray) else to_records(bars)
+        return self._send(topic(symbol, interval), np.ascontiguousarray(records, dtype=BAR_DTYPE), 0)
+
+    def end(self, symbol: str, interval: str) -> int:
+        """
+        Tells the subscribers of a topic that no more bars will follow.
+        """
+        return self._send(topic(symbol, interval), np.empty(0, dtype=BAR_DTYPE), END_OF_STREAM)
+
+    def close(self):
+        self.socket.close(linger=1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BarSubscriber:
+    """
+    Receives the bars of some (symbol, interval) topics from the bus.
+
+    Iterating yields BarBatches until every subscribed topic has ended. The first
+    message seen of a topic is never counted as a gap, so subscribers can join a
+    live bus at any time.
+
+    parameters:
+        topics (list[tuple[str, str]]): (symbol, interval) pairs to receive.
+        endpoint (str, default = DEFAULT_ENDPOINT): Address of the publisher.
+    """
+
+    def __init__(self, topics: list[tuple[str, str]], endpoint: str = DEFAULT_ENDPOINT,
+                 hwm: int = 100_000, context: Optional[zmq.Context] = None):
+        self.context = context or zmq.Context.instance()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.RCVHWM, hwm)
+        self.socket.connect(endpoint)
+        self.topics = {topic(symbol, interval): (symbol, interval) for symbol, interval in topics}
+        for key in self.topics:
+            self.socket.setsockopt(zmq.SUBSCRIBE, key)
+        self.last_sequence: dict[bytes, int] = {}
+        self.ended: set[bytes] = set()
+        self.missed = 0
+
+    def recv(self, timeout: Optional[float] = None) -> Optional[BarBatch]:
+        """
+        Waits up to timeout seconds (forever by default) for the next message.
+        Returns None on timeout or when the message ended its topic.
+        """
+        if timeout is not None and not self.socket.poll(timeout * 1000):
+            return None
+        key, header, payload = self.socket.recv_multipart(copy=False)
+        key = key.bytes
+        sequence, sent_ns, flags = HEADER.unpack(header.buffer)
+
+        previous = self.last_sequence.get(key)
+        missed = 0 if previous is None else sequence - previous - 1
+        self.last_sequence[key] = sequence
+        self.missed += missed
+        if flags & END_OF_STREAM:
+            self.ended.add(key)
+            return None
+
+        symbol, interval = self.topics[key]
+        records = np.frombuffer(payload.buffer, dtype=BAR_DTYPE)
+        return BarBatch(symbol, interval, sequence, sent_ns, records, missed)
+
+    def __iter__(self) -> Iterator[BarBatch]:
+        while len(self.ended) < len(self.topics):
+            batch = self.recv()
+            if batch is not None:
+                yield batch
+
+    def close(self):
+        self.socket.close(linger=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(publisher: BarPublisher, symbols: list[str], interval: str, start=None, end=None,
+           batch_size: int = 1, pace: float = 0.0, root: str | PathLike = DEFAULT_ROOT) -> int:
+    """
+    Publishes stored history of several symbols in time order, then ends their topics.
+
+    parameters:
+        publisher (BarPublisher): Where to publish, wait_for_subscribers first.
+        symbols (list[str]), interval (str), start, end: The stored bars to replay.
+        batch_size (int, default = 1): Bars per message. Batches of different symbols are
+            interleaved by the time of their last bar.
+        pace (float, default = 0.0): Seconds to sleep between messages, 0 for as fast as possible.
+
+    returns:
+        Number of bars published.
+    """
+    store = MarketDataStore(root)
+    streams = []
+    for symbol in symbols:
+        records = to_records(store.load(symbol, interval, start, end))
+        streams.append([
+            (int(block["Datetime"][-1]), symbol, block)
+            for block in (records[i:i + batch_size] for i in range(0, len(records), batch_size))
+        ])
+
+    published = 0
+    for _, symbol, block in heapq.merge(*streams, key=lambda item: item[0]):
+        publisher.publish(symbol, interval, block)
+        published += len(block)
+        if pace:
+            time.sleep(pace)
+    for symbol in symbols:
+        publisher.end(symbol, interval)
+    return published
+
+
+def run_signal(name: str, signal, symbols: list[str], interval: str, endpoint: str = DEFAULT_ENDPOINT) -> dict:
+    """
+    Strategy process body: runs one signal per symbol on the bars from the bus until the
+    topics end. Returns bars seen, messages missed, position changes and the publish to
+    receive latency of the messages.
+    """
+    signals = {symbol: signal() for symbol in symbols}
+    positions = dict.fromkeys(symbols, 0)
+    changes = 0
+    bars = 0
+    latency = LatencyHistogram(f"{name} fan out")
+    with BarSubscriber([(symbol, interval) for symbol in symbols], endpoint) as subscriber:
+        for batch in subscriber:
+            latency.record((time.time_ns() - batch.sent_ns) / 1e9)
+            for bar in batch.bars():
+                target = signals[bar.symbol].update(bar)
+                changes += target != positions[bar.symbol]
+                positions[bar.symbol] = target
+                bars += 1
+        missed = subscriber.missed
+    return {"name": name, "bars": bars, "missed": missed, "changes": changes, "latency": latency.summary()}
+
+
+def _strategy_process(results, name, signal, symbols, interval, endpoint):
+    results.put(run_signal(name, signal, symbols, interval, endpoint))
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    from functools import partial
+    from tito.live.runtime import BollingerSignal, MACDBBSignal, MACDSignal, SMACrossSignal
+
+    # Replays the stored 1 hour history of two symbols to a handful of strategy processes,
+    # each parameter set in its own process, all subscribed to the same feed
+    symbols = ["BTC-USD", "ETH-USD"]
+    interval = "1h"
+    strategies = {
+        "macd 12/26/9": partial(MACDSignal, 12, 26, 9),
+        "macd 6/41/19": partial(MACDSignal, 6, 41, 19),
+        "macd_bb": MACDBBSignal,
+        "sma 10/40": partial(SMACrossSignal, 10, 40),
+        "sma 20/100": partial(SMACrossSignal, 20, 100),
+        "bollinger 20/2": partial(BollingerSignal, 20, 2),
+    }
+    symbols = [symbol for symbol in symbols if MarketDataStore().partitions(symbol, interval)]
+    if not symbols:
+        print(f"No stored {interval} bars, download some first")
+        exit(1)
+
+    results = multiprocessing.Queue()
+    with BarPublisher() as publisher:
+        processes = [
+            multiprocessing.Process(target=_strategy_process, args=(results, name, signal, symbols, interval, DEFAULT_ENDPOINT))
+            for name, signal in strategies.items()
+        ]
+        for process in processes:
+            process.start()
+        publisher.wait_for_subscribers(len(processes) * len(symbols))
+
+        start = time.perf_counter()
+        published = replay(publisher, symbols, interval)
+        reports = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+    print(f"{published} bars of {symbols} to {len(processes)} processes in {elapsed:.2f} s")
+    for report in sorted(reports, key=lambda report: report["name"]):
+        print(f"{report['name']:<16} {report['bars']} bars, {report['missed']} missed, {report['changes']} position changes, "
+              f"fan out p50 {report['latency']['p50_s'] * 1000:.3f} ms, p99 {report['latency']['p99_s'] * 1000:.3f} ms")
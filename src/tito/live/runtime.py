@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Event driven asyncio trading runtime for live and paper trading.
+#
+# A feed task puts each closed bar on a queue together with the time it arrived. The
+# runtime takes bars off the queue, updates the streaming indicators of the signal
+# (MACDSignal, MACDBBSignal or SMACrossSignal, the same positions as macd.py, macd_bb.py
+# and rolling_avg.py, or BollingerSignal), and when the target position differs from
+# the broker's, submits a market order.
+#
+# Two latencies are recorded for every bar in LatencyHistograms:
+#     bar_to_decision:   bar arrival -> target position known (queueing + signal update)
+#     decision_to_order: target known -> order acknowledged by the broker
+# and counted against optional budgets, so a run shows whether every close was acted on in time.
+#
+# SimulatedFeed and SimulatedBroker stand in for the market and Alpaca offline,
+# AlpacaBroker sends the orders to Alpaca's (paper) trading API with alpaca-py.
+
+import asyncio
+import itertools
+import time
+from datetime import datetime
+from typing import AsyncIterator, NamedTuple, Optional, Protocol
+
+import numpy as np
+import polars as pl
+
+from tito.indicators.streaming import MACD, BollingerBands, RollingStats
+
+# Alpaca's error code for "position does not exist"
+POSITION_NOT_FOUND: int = 40410000
+# Queued after the bars of a feed that raised, the consumer stops there
+FEED_FAILED = object()
+
+
+class Bar(NamedTuple):
+    symbol: str
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class Order(NamedTuple):
+    order_id: int
+    symbol: str
+    side: str  # "buy" or "sell"
+    quantity: float
+
+
+class Fill(NamedTuple):
+    order_id: int
+    symbol: str
+    side: str
+    quantity: float
+    price: Optional[float]  # None when the broker only acknowledged the order
+    cost: float
+
+
+class MACDSignal:
+    """
+    Long (1) while the MACD line is above the signal line, else flat (0), like MACDStrategy.
+    """
+
+    def __init__(self, short_span=12, long_span=26, signal_span=9):
+        self.macd = MACD(short_span, long_span, signal_span)
+
+    def update(self, bar: Bar) -> int:
+        macd_line, signal_line, _ = self.macd.update(bar.close)
+        return int(macd_line > signal_line)
+
+
+class MACDBBSignal:
+    """
+    MACD signal that also requires the close to be at or above the lower Bollinger band,
+    like macd_bb.py. Flat while the bands are still filling.
+    """
+
+    def __init__(self, short_span=6, long_span=41, signal_span=19, window_size=10, num_std=2):
+        self.macd = MACD(short_span, long_span, signal_span)
+        self.bands = BollingerBands(window_size, num_std)
+
+    def update(self, bar: Bar) -> int:
+        macd_line, signal_line, _ = self.macd.update(bar.close)
+        _, _, lower_band = self.bands.update(bar.close)
+        return int(macd_line > signal_line and lower_band is not None and lower_band <= bar.close)
+
+
+class SMACrossSignal:
+    """
+    Long while the short SMA is above the long SMA, flat until the long SMA exists, like rolling_avg.py.
+    """
+
+    def __init__(self, short_window=10, long_window=40):
+        self.short = RollingStats(short_window)
+        self.long = RollingStats(long_window)
+
+    def update(self, bar: Bar) -> int:
+        short_sma, _ = self.short.update(bar.close)
+        long_sma, _ = self.long.update(bar.close)
+        return int(long_sma is not None and short_sma > long_sma)
+
+
+class BollingerSignal:
+    """
+    Long after a close below the lower band until a close above the upper band, flat
+    while the bands are still filling: portfolio.bollinger_positions, one bar at a time.
+    bb.py only plots the bands.
+    """
+
+    def __init__(self, window_size=20, num_std=2):
+        self.bands = BollingerBands(window_size, num_std)
+        self.position = 0
+
+    def update(self, bar: Bar) -> int:
+        _, upper_band, lower_band = self.bands.update(bar.close)
+        if lower_band is not None:
+            if bar.close < lower_band:
+                self.position = 1
+            elif bar.close > upper_band:
+                self.position = 0
+        return self.position
+
+
+class BarFeed(Protocol):
+    def stream(self) -> AsyncIterator[Bar]:
+        ...
+
+
+class Broker(Protocol):
+    name: str
+
+    async def submit(self, order: Order) -> Fill:
+        ...
+
+    async def position(self, symbol: str) -> float:
+        ...
+
+
+class SimulatedFeed:
+    """
+    Replays stored bars as a live feed.
+
+    parameters:
+        bars (pl.DataFrame): Bars with Datetime and OHLCV columns, oldest first.
+        symbol (str): Symbol the bars belong to.
+        delay (float, default = 0.0): Seconds between bars, 0 replays as fast as possible.
+    """
+
+    def __init__(self, bars: pl.DataFrame, symbol: str, delay: float = 0.0):
+        self.bars = bars
+        self.symbol = symbol
+        self.delay = delay
+
+    async def stream(self) -> AsyncIterator[Bar]:
+        for row in self.bars.select("Datetime", "Open", "High", "Low", "Close", "Volume").iter_rows():
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            else:
+                # still give the consumer a turn between bars
+                await asyncio.sleep(0)
+            yield Bar(self.symbol, *row)
+
+
+class SimulatedBroker:
+    """
+    Paper broker filling market orders at the last close it has seen, minus costs.
+
+    parameters:
+        cash (float, default = 10000.0): Starting cash.
+        transaction_cost (float, default = 0.0005): Fraction of each fill's notional charged.
+        latency (float, default = 0.0): Seconds before an order is acknowledged, to mimic a round trip.
+    """
+
+    name = "simulated"
+
+    def __init__(self, cash: float = 10000.0, transaction_cost: float = 0.0005, latency: float = 0.0):
+        self.cash = cash
+        self.transaction_cost = transaction_cost
+        self.latency = latency
+        self.positions: dict[str, float] = {}
+        self.last_prices: dict[str, float] = {}
+        self.fills: list[Fill] = []
+
+    def mark(self, bar: Bar):
+        self.last_prices[bar.symbol] = bar.close
+
+    @property
+    def equity(self) -> float:
+        return self.cash + sum(quantity * self.last_prices[symbol] for symbol, quantity in self.positions.items())
+
+    async def submit(self, order: Order) -> Fill:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        price = self.last_prices[order.symbol]
+        signed = order.quantity if order.side == "buy" else -order.quantity
+        cost = abs(signed) * price * self.transaction_cost
+        self.cash -= signed * price + cost
+        self.positions[order.symbol] = self.positions.get(order.symbol, 0.0) + signed
+        fill = Fill(order.order_id, order.symbol, order.side, order.quantity, price, cost)
+        self.fills.append(fill)
+        return fill
+
+    async def position(self, symbol: str) -> float:
+        return self.positions.get(symbol, 0.0)
+
+
+class AlpacaBroker:
+    """
+    Sends market orders to Alpaca with alpaca-py's TradingClient, paper trading by default.
+    The client is blocking, so its calls run in a worker thread.
+
+    parameters:
+        key_id, secret_key (str): API keys.
+        paper (bool, default = True): Use the paper trading account.
+    """
+
+    name = "alpaca"
+
+    def __init__(self, key_id: str, secret_key: str, paper: bool = True):
+        from alpaca.trading.client import TradingClient
+
+        self.client = TradingClient(key_id, secret_key, paper=paper)
+
+    @staticmethod
+    def api_symbol(symbol: str) -> str:
+        return symbol.replace("-", "/") if symbol.endswith("-USD") else symbol
+
+    def mark(self, bar: Bar):
+        pass
+
+    async def submit(self, order: Order) -> Fill:
+        from alpaca.trading.enums import OrderSide, TimeInForce
+        from alpaca.trading.requests import MarketOrderRequest
+
+        request = MarketOrderRequest(
+            symbol=self.api_symbol(order.symbol),
+            qty=order.quantity,
+            side=OrderSide.BUY if order.side == "buy" else OrderSide.SELL,
+            time_in_force=TimeInForce.GTC,
+        )
+        placed = await asyncio.to_thread(self.client.submit_order, order_data=request)
+        price = float(placed.filled_avg_price) if placed.filled_avg_price is not None else None
+        return Fill(order.order_id, order.symbol, order.side, order.quantity, price, 0.0)
+
+    async def position(self, symbol: str) -> float:
+        """
+        Units held, 0 when Alpaca has no open position in the symbol. Any other API or
+        connection error is raised, a failed lookup must not read as flat.
+        """
+        from alpaca.common.exceptions import APIError
+
+        try:
+            held = await asyncio.to_thread(self.client.get_open_position, self.api_symbol(symbol).replace("/", ""))
+        except APIError as error:
+            try:
+                code = error.code
+            except (ValueError, KeyError, TypeError):
+                # the error body wasn't Alpaca's JSON, e.g. a proxy's error page
+                code = None
+            if error.status_code == 404 or code == POSITION_NOT_FOUND:
+                return 0.0
+            raise
+        return float(held.qty)
+
+
+class LatencyHistogram:
+    """
+    Fixed memory latency histogram with log spaced buckets (per_decade per factor of 10)
+    from 1 microsecond to 100 seconds, so it can run for the lifetime of the process.
+    Percentiles are the upper edge of the bucket they fall in, within about 12% with
+    the default 20 buckets per decade.
+
+    parameters:
+        name (str): Shown in reports.
+        budget (Optional[float], default = None): Seconds a single latency may take,
+            recordings above it are counted in over_budget.
+    """
+
+    def __init__(self, name: str, budget: Optional[float] = None, per_decade: int = 20):
+        self.name = name
+        self.budget = budget
+        self.edges = np.logspace(-6, 2, 8 * per_decade + 1)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.over_budget = 0
+
+    def record(self, seconds: float):
+        self.counts[np.searchsorted(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if self.budget is not None and seconds > self.budget:
+            self.over_budget += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Latency in seconds below which q percent of the recordings fall.
+        """
+        if not self.count:
+            return float("nan")
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        return float(min(self.edges[min(bucket, len(self.edges) - 1)], self.max))
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_s": self.total / self.count if self.count else float("nan"),
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max,
+            "budget_s": self.budget,
+            "over_budget": self.over_budget,
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        budget = f", {summary['over_budget']} over the {self.budget * 1000:.3f} ms budget" if self.budget is not None else ""
+        print(f"{self.name}: {summary['count']} samples, p50 {summary['p50_s'] * 1000:.3f} ms, "
+              f"p99 {summary['p99_s'] * 1000:.3f} ms, max {summary['max_s'] * 1000:.3f} ms{budget}")
+
+
+class TradingRuntime:
+    """
+    Runs a signal on a bar feed and trades its target position through a broker.
+
+    parameters:
+        feed (BarFeed): Source of closed bars, e.g. SimulatedFeed.
+        broker (Broker): SimulatedBroker, AlpacaBroker or anything with submit and position.
+        signal (MACDSignal | MACDBBSignal): Object whose update(bar) returns the target position, 0 or 1.
+        quantity (float, default = 1.0): Units held while the target is 1.
+        decision_budget, order_budget (Optional[float], default = None): Latency budgets in
+            seconds for bar_to_decision and decision_to_order.
+        queue_size (int, default = 1024): Bars that may wait for the strategy before the feed blocks.
+    """
+
+    def __init__(self, feed: BarFeed, broker: Broker, signal, quantity: float = 1.0,
+                 decision_budget: Optional[float] = None, order_budget: Optional[float] = None,
+                 queue_size: int = 1024):
+        self.feed = feed
+        self.broker = broker
+        self.signal = signal
+        self.quantity = quantity
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.bar_to_decision = LatencyHistogram("bar_to_decision", decision_budget)
+        self.decision_to_order = LatencyHistogram("decision_to_order", order_budget)
+        self.order_ids = itertools.count(1)
+        self.targets: list[int] = []
+        self.fills: list[Fill] = []
+
+    async def _produce(self):
+        # None in the queue means the feed ended, FEED_FAILED that it raised
+        try:
+            async for bar in self.feed.stream():
+                await self.queue.put((bar, time.perf_counter()))
+        except Exception:
+            await self.queue.put(FEED_FAILED)
+            raise
+        await self.queue.put(None)
+
+    async def _consume(self):
+        while (item := await self.queue.get()) is not None and item is not FEED_FAILED:
+            bar, received = item
+            await self.on_bar(bar, received)
+
+    async def on_bar(self, bar: Bar, received: float):
+        """
+        Handles one closed bar that arrived at perf_counter time received.
+        """
+        if hasattr(self.broker, "mark"):
+            self.broker.mark(bar)
+        target = self.signal.update(bar)
+        decided = time.perf_counter()
+        self.bar_to_decision.record(decided - received)
+        self.targets.append(target)
+
+        change = target * self.quantity - await self.broker.position(bar.symbol)
+        if change:
+            order = Order(next(self.order_ids), bar.symbol, "buy" if change > 0 else "sell", abs(change))
+            self.fills.append(await self.broker.submit(order))
+            self.decision_to_order.record(time.perf_counter() - decided)
+
+    async def run(self):
+        """
+        Trades until the feed ends. If the feed raises, the bars before the error are
+        still traded and then the feed's exception is raised here.
+        """
+        producer = asyncio.create_task(self._produce())
+        try:
+            await self._consume()
+            await producer
+        finally:
+            producer.cancel()
+
+    def report(self) -> dict:
+        return {
+            "bars": len(self.targets),
+            "orders": len(self.fills),
+            "bar_to_decision": self.bar_to_decision.summary(),
+            "decision_to_order": self.decision_to_order.summary(),
+        }
+
+
+if __name__ == "__main__":
+    from tito.data.store import load_bars
+
+    # Paper trade the macd_bb.py strategy over the stored 6 hour bars, replayed a bar
+    # every 5 ms so that bars don't queue up behind the simulated 1 ms order round trip
+    symbol = "BTC-USD"
+    bars = load_bars(symbol, "6h", lookback="6mo")
+    broker = SimulatedBroker(cash=200000.0, latency=0.001)
+    runtime = TradingRuntime(
+        SimulatedFeed(bars, symbol, delay=0.005),
+        broker,
+        MACDBBSignal(),
+        decision_budget=0.001,
+        order_budget=0.005,
+    )
+    asyncio.run(runtime.run())
+    print(f"{len(runtime.targets)} bars, {len(runtime.fills)} orders, final equity {broker.equity:.2f}")
+    runtime.bar_to_decision.print_summary()
+    runtime.decision_to_order.print_summary()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Plotting helpers for long price and indicator series.
+#
+# A chart is at most a couple of thousand pixels wide, so drawing every bar of years of
+# hourly data only costs time. Lines are downsampled with Largest-Triangle-Three-Buckets
+# (lttb), which keeps the points that shape the line (peaks, troughs, breakouts), and the
+# MACD histogram is reduced to the largest and smallest value of each pixel sized bucket
+# and drawn as one LineCollection instead of one bar artist per bar.
+#
+# render_figures draws figures on plain matplotlib Figure objects, no pyplot and no
+# display needed, and saves them as PNG from a process pool, e.g. one chart for each of
+# the top parameter sets of a sweep. show_figures is what the strategy scripts use: it
+# shows all of their charts in one plt.show(), or saves them when running headless.
+
+import multiprocessing as mp
+import os
+import numpy as np
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Optional
+
+import matplotlib
+from matplotlib import dates as mdates, gridspec
+from matplotlib.figure import Figure
+
+DEFAULT_MAX_POINTS: int = 2000
+DEFAULT_PLOT_DIR: Path = Path("plots")
+# matplotlib backends that can't open a window, plt.show() does nothing on them
+NON_INTERACTIVE_BACKENDS: tuple[str, ...] = ("agg", "cairo", "pdf", "pgf", "ps", "svg", "template")
+
+
+def _numeric(x: np.ndarray) -> np.ndarray:
+    # datetimes as int64 ticks, everything else as float
+    return x.view(np.int64).astype(np.float64) if np.issubdtype(x.dtype, np.datetime64) else x.astype(np.float64)
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points of (x, y) that Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept, the rest is split into n_out - 2 equal
+    buckets and each bucket keeps the point spanning the largest triangle with the point
+    kept in the previous bucket and the mean of the next bucket. NaN points are skipped.
+
+    parameters:
+        x (array like): Increasing x values, numbers or datetime64.
+        y (array like): Values to plot.
+        n_out (int): Points to keep, every point is kept when there are no more than that.
+
+    returns:
+        Increasing int64 indices into x and y.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(~np.isnan(y))
+    if len(finite) <= n_out or n_out < 3:
+        return finite
+    xs = _numeric(x[finite])
+    ys = y[finite]
+
+    n = len(ys)
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # mean of every bucket, the one after the last bucket is the last point
+    counts = np.diff(np.append(edges, n))
+    next_x = np.add.reduceat(xs, edges) / counts
+    next_y = np.add.reduceat(ys, edges) / counts
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((xs[a] - next_x[i + 1]) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (next_y[i + 1] - ys[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return finite[kept]
+
+
+def bucket_extremes(x, values, n_buckets: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Splits the values into n_buckets equal buckets and returns the x of each bucket's
+    first point with the bucket's largest and smallest value (NaN counted as 0), so
+    the envelope of bar-like data like a histogram survives downsampling.
+    """
+    x = np.asarray(x)
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    if len(values) <= n_buckets:
+        return x, values, values
+    starts = (np.arange(n_buckets) * (len(values) / n_buckets)).astype(np.int64)
+    return x[starts], np.maximum.reduceat(values, starts), np.minimum.reduceat(values, starts)
+
+
+def plot_line(ax, x, y, max_points: Optional[int] = DEFAULT_MAX_POINTS, **kwargs):
+    """
+    ax.plot of the series, downsampled with lttb to max_points (None keeps every point).
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if max_points is not None:
+        keep = lttb(x, y, max_points)
+        x, y = x[keep], y[keep]
+    return ax.plot(x, y, **kwargs)
+
+
+def plot_histogram(ax, x, values, max_bars: Optional[int] = DEFAULT_MAX_POINTS, alpha=0.5,
+                   positive_color="green", negative_color="red"):
+    """
+    Histogram of values around 0 as a single LineCollection of vertical bars, positive
+    bars in positive_color and negative ones in negative_color. With more than max_bars
+    values each drawn bar is the largest and smallest value of a bucket.
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        # matplotlib's date numbers, a collection converts datetimes one at a time
+        x = mdates.date2num(x)
+    if max_bars is None:
+        max_bars = len(x)
+    positions, highs, lows = bucket_extremes(x, values, max_bars)
+    up = highs > 0
+    down = lows < 0
+    bar_x = np.concatenate([positions[up], positions[down]])
+    tops = np.concatenate([highs[up], lows[down]])
+    colors = [positive_color] * int(up.sum()) + [negative_color] * int(down.sum())
+    # wide enough that neighbouring bars touch at the figure sizes used here
+    width = max(0.5, 1000 / max(len(positions), 1))
+    return ax.vlines(bar_x, 0, tops, colors=colors, alpha=alpha, linewidth=width)
+
+
+def draw_macd(fig: Figure, data: pl.DataFrame, col_name="Close", title_timespan="",
+              max_points: Optional[int] = DEFAULT_MAX_POINTS, suptitle: Optional[str] = None,
+              price: bool = True):
+    """
+    Draws the price on top and the MACD line, signal line and histogram below into fig,
+    like plot_macd_results. data needs Datetime, col_name, MACD_line, signal_line and histogram.
+    With price=False only the MACD panel is drawn.
+    """
+    x = data["Datetime"].to_numpy()
+    if price:
+        gs = gridspec.GridSpec(2, 1, height_ratios=[2, 1], figure=fig)
+        ax1 = fig.add_subplot(gs[0])
+        plot_line(ax1, x, data[col_name].to_numpy(), max_points, label="Bitcoin Price", color="black")
+        ax1.set_title(f"Bitcoin Price ({title_timespan})")
+        ax1.set_ylabel("Price")
+        ax1.grid(True)
+        ax1.legend()
+        ax2 = fig.add_subplot(gs[1], sharex=ax1)
+        ax2.set_title("MACD with Histogram")
+    else:
+        ax2 = fig.add_subplot()
+        ax2.set_title(f"MACD with Histogram - Bitcoin ({title_timespan})")
+
+    plot_line(ax2, x, data["MACD_line"].to_numpy(), max_points, label="MACD Line", color="blue")
+    plot_line(ax2, x, data["signal_line"].to_numpy(), max_points, label="Signal Line", color="red")
+    plot_histogram(ax2, x, data["histogram"].to_numpy(), max_points)
+    ax2.axhline(y=0, color='black', linestyle='-', alpha=0.3)
+    ax2.set_xlabel("Date")
+    ax2.set_ylabel("MACD")
+    ax2.grid(True)
+    ax2.legend()
+
+    if suptitle is not None:
+        fig.suptitle(suptitle)
+    fig.tight_layout()
+    return fig
+
+
+def draw_lines(fig: Figure, data: pl.DataFrame, columns: dict[str, dict], title="", ylabel="",
+               max_points: Optional[int] = DEFAULT_MAX_POINTS):
+    """
+    Draws columns of data against its Datetime column on one axes, each downsampled
+    with lttb. columns maps every column to its plot_line keyword arguments, e.g.
+    {"MACD_line": {"label": "MACD Line", "color": "blue"}}.
+    """
+    x = data["Datetime"].to_numpy()
+    ax = fig.add_subplot()
+    for column, style in columns.items():
+        plot_line(ax, x, data[column].to_numpy(), max_points, **style)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel(ylabel)
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def draw_positions(fig: Figure, data: pl.DataFrame, col_name="Close", title="",
+                   max_points: Optional[int] = DEFAULT_MAX_POINTS):
+    """
+    Draws the price with the bars held long (positions == 1) in green and the flat ones
+    in red. Only the lttb points of the price line are marked, so long series stay readable.
+    """
+    x = data["Datetime"].to_numpy()
+    y = data[col_name].to_numpy()
+    keep = lttb(x, y, max_points) if max_points is not None else np.arange(len(y))
+    held = data["positions"].to_numpy()[keep] == 1
+
+    ax = fig.add_subplot()
+    ax.plot(x[keep], y[keep], color="gray", linewidth=1.5, alpha=0.5)
+    ax.scatter(x[keep][held], y[keep][held], color="green", s=30, label="Buy Signal")
+    ax.scatter(x[keep][~held], y[keep][~held], color="red", s=30, label="Sell Signal")
+    ax.set_title(title)
+    ax.set_ylabel("Price in USD")
+    ax.set_xlabel("Date")
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def draw_bands(fig: Figure, data: pl.DataFrame, col_name="Close", window_size=20, title_timespan="",
+               max_points: Optional[int] = DEFAULT_MAX_POINTS, std: bool = False):
+    """
+    Draws the price with its SMA and Bollinger Bands, like bb.py. data needs Datetime,
+    col_name, SMA, Upper_Band and Lower_Band, and SMSTD for std=True, which adds the rolling
+    standard deviation in a panel below.
+    """
+    x = data["Datetime"].to_numpy()
+    if std:
+        gs = gridspec.GridSpec(2, 1, height_ratios=[3, 1], figure=fig)
+        ax1 = fig.add_subplot(gs[0])
+    else:
+        ax1 = fig.add_subplot()
+
+    upper = data["Upper_Band"].to_numpy()
+    lower = data["Lower_Band"].to_numpy()
+    plot_line(ax1, x, data[col_name].to_numpy(), max_points, label="BTC Price", color="blue", alpha=0.6)
+    plot_line(ax1, x, data["SMA"].to_numpy(), max_points, label=f"SMA-{window_size}", color="red", linewidth=2)
+    plot_line(ax1, x, upper, max_points, label=f"SMA+STD ({window_size})", color="green", linestyle="--")
+    plot_line(ax1, x, lower, max_points, label=f"SMA-STD ({window_size})", color="green", linestyle="--")
+    # fill between the points either band line kept
+    if max_points is None:
+        keep = np.flatnonzero(~np.isnan(upper))
+    else:
+        keep = np.union1d(lttb(x, upper, max_points), lttb(x, lower, max_points))
+    ax1.fill_between(x[keep], upper[keep], lower[keep], color="green", alpha=0.1)
+    ax1.set_title(f"BTC Price with Simple Moving Average and Standard Deviation ({title_timespan})")
+    ax1.set_ylabel("Price (USD)")
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    if std:
+        ax2 = fig.add_subplot(gs[1], sharex=ax1)
+        plot_line(ax2, x, data["SMSTD"].to_numpy(), max_points, label=f"Standard Deviation ({window_size})",
+                  color="purple")
+        ax2.set_xlabel("Date")
+        ax2.set_ylabel("Standard Deviation")
+        ax2.legend()
+        ax2.grid(True, alpha=0.3)
+    else:
+        ax1.set_xlabel("Date")
+    fig.tight_layout()
+    return fig
+
+
+def headless() -> bool:
+    """
+    Whether matplotlib runs on a backend without windows, e.g. Agg on a machine without a display.
+    """
+    return matplotlib.get_backend().lower() in NON_INTERACTIVE_BACKENDS
+
+
+# set in every render worker by _init_worker
+_draw: Optional[Callable] = None
+_shared = None
+
+
+def _init_worker(draw, shared):
+    global _draw, _shared
+    _draw, _shared = draw, shared
+
+
+def _render(path: str, kwargs: dict, figsize, dpi) -> str:
+    fig = Figure(figsize=figsize)
+    _draw(fig, _shared, **kwargs)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def render_figures(draw: Callable, jobs: list[tuple[str, dict]], out_dir: str | PathLike, shared=None,
+                   workers: Optional[int] = None, figsize=(14, 10), dpi=100) -> list[Path]:
+    """
+    Renders figures to PNG files headlessly, in parallel.
+
+    parameters:
+        draw (Callable): Module level function draw(fig, shared, **kwargs) drawing one
+            figure into the matplotlib Figure fig.
+        jobs (list[tuple[str, dict]]): (file name, kwargs for draw) of every figure.
+        out_dir (str | PathLike): Directory for the files, created if missing.
+        shared (default = None): Data every figure uses, e.g. the bars. Sent to each
+            worker once instead of with every job.
+        workers (Optional[int], default = None): Processes, all cores by default. With 1
+            the figures are rendered in this process.
+
+    returns:
+        Paths of the written files, in job order.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    paths = [str(out_dir / name) for name, _ in jobs]
+
+    if workers == 1 or len(jobs) <= 1:
+        _init_worker(draw, shared)
+        return [Path(_render(path, kwargs, figsize, dpi)) for path, (_, kwargs) in zip(paths, jobs)]
+
+    # spawn, since forking a process that already started polars' threads can deadlock
+    context = mp.get_context("spawn")
+    with ProcessPoolExecutor(workers, context, initializer=_init_worker, initargs=(draw, shared)) as pool:
+        futures = [pool.submit(_render, path, kwargs, figsize, dpi) for path, (_, kwargs) in zip(paths, jobs)]
+        return [Path(future.result()) for future in futures]
+
+
+def show_figures(figures: list[tuple[str, Callable, dict]], shared=None, plot_dir: Optional[str | PathLike] = None,
+                 figsize=(14, 10)) -> list[Path]:
+    """
+    Shows figures in a single plt.show(), or saves them as PNG files through
+    render_figures when plot_dir is given or matplotlib is headless.
+
+    parameters:
+        figures (list[tuple[str, Callable, dict]]): (file name, draw, kwargs) of every figure,
+            draw(fig, shared, **kwargs) draws it like the draw function of render_figures.
+        shared (default = None): Passed to every draw call, e.g. the bars.
+        plot_dir (Optional[str | PathLike], default = None): Directory for the files,
+            DEFAULT_PLOT_DIR when headless.
+        figsize (default = (14, 10)): Size of every figure in inches.
+
+    returns:
+        Paths of the written files, empty when the figures were shown.
+    """
+    if plot_dir is None and not headless():
+        from matplotlib import pyplot as plt
+        for _, draw, kwargs in figures:
+            draw(plt.figure(figsize=figsize), shared, **kwargs)
+        plt.show()
+        return []
+
+    # in this process, spawned workers would rerun the script that called this
+    out_dir = plot_dir if plot_dir is not None else DEFAULT_PLOT_DIR
+    return [
+        path
+        for name, draw, kwargs in figures
+        for path in render_figures(draw, [(name, kwargs)], out_dir, shared, workers=1, figsize=figsize)
+    ]
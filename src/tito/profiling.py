@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Low overhead stage timing for strategy fits and sweeps.
+#
+#     from tito.profiling import profiler
+#     profiler.enable()
+#     with profiler.span("fit.indicators", rows=len(data)):
+#         ...
+#     profiler.count("combos")
+#     profiler.print_report()
+#
+# While disabled (the default) span() hands back one shared do-nothing context
+# manager, so the instrumented code pays about one attribute lookup per stage.
+
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+from os import PathLike
+
+import numpy as np
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "rows", "start", "start_memory")
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        if self.profiler.track_allocations:
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        allocated = 0
+        if self.profiler.track_allocations:
+            allocated = max(tracemalloc.get_traced_memory()[0] - self.start_memory, 0)
+        self.profiler._record(self.name, elapsed, self.rows, allocated)
+        return False
+
+
+class Profiler:
+    """
+    Collects named timing spans and counters and aggregates them into a report.
+
+    parameters:
+        enabled (bool, default = False): Whether spans are recorded at all.
+        track_allocations (bool, default = False): Also record the net bytes allocated
+            by Python inside each span with tracemalloc. Much slower, only for digging.
+    """
+
+    def __init__(self, enabled: bool = False, track_allocations: bool = False):
+        self.enabled = False
+        self.track_allocations = False
+        self.reset()
+        if enabled:
+            self.enable(track_allocations)
+
+    def enable(self, track_allocations: bool = False):
+        self.enabled = True
+        self.track_allocations = track_allocations
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.reset()
+
+    def disable(self):
+        if self.track_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+        self.track_allocations = False
+
+    def reset(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.rows: dict[str, int] = defaultdict(int)
+        self.allocated: dict[str, int] = defaultdict(int)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+
+    def span(self, name: str, rows: int = 0):
+        """
+        Context manager timing one run of the named stage, rows is how many rows it processed.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, rows)
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Adds to a counter, e.g. count("combos") once per scored parameter combo.
+        """
+        if self.enabled:
+            self.counters[name] += amount
+
+    def _record(self, name, elapsed, rows, allocated):
+        self.durations[name].append(elapsed)
+        self.rows[name] += rows
+        self.allocated[name] += allocated
+
+    def report(self) -> dict:
+        """
+        Per-stage call counts, totals, mean/p50/p90/p99 durations, rows per second and
+        allocated bytes, plus every counter's total and rate over the wall time since
+        the profiler was enabled or reset.
+        """
+        wall_time = time.perf_counter() - self.started
+        stages = {}
+        for name, durations in self.durations.items():
+            values = np.array(durations)
+            total = float(values.sum())
+            stages[name] = {
+                "calls": len(values),
+                "total_s": total,
+                "mean_s": float(values.mean()),
+                "p50_s": float(np.percentile(values, 50)),
+                "p90_s": float(np.percentile(values, 90)),
+                "p99_s": float(np.percentile(values, 99)),
+                "share": total / wall_time if wall_time > 0 else 0.0,
+                "rows": self.rows[name],
+                "rows_per_s": self.rows[name] / total if total > 0 else 0.0,
+                "allocated_bytes": self.allocated[name],
+            }
+        counters = {
+            name: {"total": total, "per_s": total / wall_time if wall_time > 0 else 0.0}
+            for name, total in self.counters.items()
+        }
+        return {"wall_time_s": wall_time, "stages": stages, "counters": counters}
+
+    def print_report(self):
+        report = self.report()
+        print(f"{'stage':<24} {'calls':>8} {'total s':>10} {'share':>7} {'p50 ms':>9} {'p99 ms':>9} {'rows/s':>12}")
+        print("-" * 85)
+        for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<24} {stage['calls']:>8} {stage['total_s']:>10.3f} {stage['share']:>7.1%} "
+                  f"{stage['p50_s'] * 1000:>9.3f} {stage['p99_s'] * 1000:>9.3f} {stage['rows_per_s']:>12.0f}")
+        for name, counter in report["counters"].items():
+            print(f"{name}: {counter['total']} ({counter['per_s']:.1f}/s)")
+        print(f"wall time: {report['wall_time_s']:.3f} s")
+
+    def write_json(self, path: str | PathLike):
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+
+# Process wide profiler the strategy code is instrumented with, off unless enabled
+profiler = Profiler()
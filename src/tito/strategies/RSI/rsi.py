@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Relative strength index with Wilder smoothing, and an RSI threshold strategy.
+#
+# wilder_rsi computes the RSI of many lookback periods at once. The strategy buys when
+# the RSI drops below oversold and sells when it rises above overbought, holding the
+# position in between. batch_rsi_scores scores a whole (period, oversold, overbought)
+# grid with matrix operations, RSIStrategy is the scikit-learn estimator with the
+# same fit/score interface as MACDStrategy for GridSearchCV and the loop searches.
+
+import numpy as np
+import polars as pl
+import pandas as pd
+import matplotlib.pyplot as plt
+import matplotlib.gridspec as gridspec
+from scipy.signal import lfilter
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+
+from tito.data.store import load_bars
+from tito.data.timeframe import annualization_factor
+from tito.profiling import profiler
+from tito.strategies.backtest import backtest, excess_returns, net_long_returns, score_binary_positions, threshold_positions
+from tito.strategies.param_cube import ParamCube
+
+
+def wilder_rsi(prices, periods) -> np.ndarray:
+    """
+    RSI of the prices for every lookback period.
+
+    Average gain and loss start as the plain mean of the first period changes and are
+    then smoothed with Wilder's recursion avg_t = avg_(t-1) + (x_t - avg_(t-1)) / period,
+    which runs as one linear filter per period over gains and losses together.
+
+    parameters:
+        prices (array like): (n_bars,) price series, no nulls.
+        periods (int | iterable of int): Lookback periods, each >= 1.
+
+    returns:
+        (n_bars, len(periods)) float64 matrix of RSI values in [0, 100], NaN for the
+        first period bars. 50 where the price didn't move over the smoothing window.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.int64))
+    if (periods < 1).any():
+        raise ValueError("RSI periods must be at least 1 bar")
+    change = np.diff(prices)
+    # row 0 gains, row 1 losses, both positive
+    moves = np.stack([np.maximum(change, 0.0), np.maximum(-change, 0.0)])
+
+    rsi = np.full((len(prices), len(periods)), np.nan)
+    for j, period in enumerate(periods):
+        if period > len(change):
+            continue
+        keep = 1 - 1 / period
+        seed = moves[:, :period].mean(axis=1)
+        averages = np.empty((2, len(change) - period + 1))
+        averages[:, 0] = seed
+        averages[:, 1:], _ = lfilter([1 / period], [1.0, -keep], moves[:, period:], axis=1, zi=keep * seed[:, None])
+        total = averages[0] + averages[1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi[period:, j] = np.where(total > 0, 100 * averages[0] / total, 50.0)
+    return rsi
+
+
+def batch_rsi_scores(data, periods, oversold, overbought, transaction_cost=0.0005, risk_free_rate=0.0421,
+                     trading_days=1461, col_name="Close", chunk_size=512) -> pl.DataFrame:
+    """
+    Evaluates every (period, oversold, overbought) combo of the RSI threshold strategy.
+
+    One RSI column per period, then every valid threshold pair of that period becomes a
+    position column and all of them are scored with score_binary_positions. Results
+    match RSIStrategy.fit to floating point tolerance. Pairs with oversold >= overbought
+    are skipped.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        periods, oversold, overbought (iterables of numbers): The parameter grid.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in RSIStrategy.
+        col_name (str, default = "Close"): The price column.
+        chunk_size (int, default = 512): Threshold pairs scored per matrix block.
+
+    returns:
+        pl.DataFrame with columns period, oversold, overbought, sharpe_ratio, total_pnl
+        in nested loop order over periods, oversold and overbought.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    periods = list(periods)
+    pairs = np.array([(low, high) for low in oversold for high in overbought if low < high], dtype=np.float64).reshape(-1, 2)
+    n_bars = len(prices)
+    with profiler.span("batch.rsi", rows=n_bars * len(periods)):
+        returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+        rsi = wilder_rsi(prices, periods)
+
+    sharpe = np.empty((len(periods), len(pairs)))
+    total_pnl = np.empty((len(periods), len(pairs)))
+    for k in range(len(periods)):
+        for start in range(0, len(pairs), chunk_size):
+            block = pairs[start:start + chunk_size]
+            with profiler.span("batch.score", rows=n_bars * len(block)):
+                positions = threshold_positions(rsi[:, k], block[:, 0], block[:, 1])
+                sharpe[k, start:start + chunk_size], total_pnl[k, start:start + chunk_size] = score_binary_positions(
+                    positions, returns, trading_days
+                )
+    profiler.count("combos", sharpe.size)
+
+    return pl.DataFrame({
+        "period": np.repeat(np.array(periods, dtype=np.int64), len(pairs)),
+        "oversold": np.tile(pairs[:, 0], len(periods)),
+        "overbought": np.tile(pairs[:, 1], len(periods)),
+        "sharpe_ratio": sharpe.ravel(),
+        "total_pnl": total_pnl.ravel(),
+    })
+
+
+class RSIStrategy(BaseEstimator, RegressorMixin):
+    """
+    RSI threshold strategy implemented as a scikit-learn compatible estimator,
+    scored by its Sharpe ratio like MACDStrategy.
+    """
+
+    def __init__(self, period=14, oversold=30, overbought=70, transaction_cost=0.0005,
+                 risk_free_rate=0.0421, trading_days=1461):
+        self.period = period
+        self.oversold = oversold
+        self.overbought = overbought
+        self.transaction_cost = transaction_cost
+        self.risk_free_rate = risk_free_rate
+        self.trading_days = trading_days
+
+    def fit(self, X, y=None):
+        """
+        Fits the RSI strategy to price data, X must contain a 'Close' column.
+        """
+        with profiler.span("rsi.convert", rows=len(X)):
+            if isinstance(X, pd.DataFrame):
+                data = pl.from_pandas(X)
+            else:
+                data = X.clone()
+
+        col_name = "Close"
+        n_rows = len(data)
+        with profiler.span("rsi.indicators", rows=n_rows):
+            rsi = wilder_rsi(data[col_name], self.period)[:, 0]
+            data = data.with_columns(pl.Series("RSI", rsi, nan_to_null=True))
+        with profiler.span("rsi.signals", rows=n_rows):
+            positions = threshold_positions(rsi, self.oversold, self.overbought)[:, 0].astype(np.int64)
+
+        # Sharpe is -inf for invalid combinations
+        with profiler.span("rsi.backtest", rows=n_rows):
+            excessret = excess_returns(data[col_name], self.risk_free_rate, self.trading_days)
+            result = backtest(positions, excessret, self.transaction_cost, self.trading_days)
+
+        self.total_pnl_ = float(result.total_pnl[0])
+        self.pnl_t_ = pl.Series("pnl_t", result.pnl[:, 0], nan_to_null=True)
+        self.data_ = data.with_columns(pl.Series("positions", positions))
+        self.sharpe_ratio_ = float(result.sharpe_ratio[0])
+
+        return self
+
+    def predict(self, X):
+        """
+        Not actually used for prediction, just returns the Sharpe ratio.
+        Needed for scikit-learn compatibility.
+        """
+        return np.ones(len(X)) * self.sharpe_ratio_
+
+    def score(self, X, y=None):
+        """
+        Returns the Sharpe ratio as the score.
+        Higher is better.
+        """
+        return self.sharpe_ratio_
+
+
+def rsi_grid_search(data, param_grid, base_model):
+    """
+    Scores every combo of param_grid's period, oversold and overbought lists in one
+    batch_rsi_scores pass. Returns (results, best_params, best_sharpe) like the
+    MACD searches in ema_grid_search, results is a ParamCube.
+    """
+    scores = batch_rsi_scores(
+        data,
+        param_grid['period'],
+        param_grid['oversold'],
+        param_grid['overbought'],
+        transaction_cost=base_model.transaction_cost,
+        risk_free_rate=base_model.risk_free_rate,
+        trading_days=base_model.trading_days
+    )
+    # Pairs with oversold >= overbought stay empty in the cube
+    axes = {name: param_grid[name] for name in ('period', 'oversold', 'overbought')}
+    results = ParamCube.from_frame(scores.rename({"sharpe_ratio": "mean_test_score"}), axes, ["mean_test_score"])
+
+    # First maximum wins
+    best_params, best_sharpe = results.best()
+    print(f"Scored {len(scores)} parameter combinations")
+
+    return results, best_params, best_sharpe
+
+
+def plot_rsi_results(data, oversold, overbought, col_name="Close", title_timespan=""):
+    """
+    Plot the price with the strategy's position and the RSI with its thresholds
+    """
+    plot_df = data.to_pandas() if isinstance(data, pl.DataFrame) else data
+
+    plt.figure(figsize=(14, 10))
+    gs = gridspec.GridSpec(2, 1, height_ratios=[2, 1])
+
+    ax1 = plt.subplot(gs[0])
+    ax1.plot(plot_df["Datetime"], plot_df[col_name], label="Bitcoin Price", color="black")
+    ax1.fill_between(plot_df["Datetime"], plot_df[col_name].min(), plot_df[col_name].max(),
+                     where=plot_df["positions"] == 1, color="green", alpha=0.1, label="Long")
+    ax1.set_title(f"Bitcoin Price ({title_timespan})")
+    ax1.set_ylabel("Price")
+    ax1.grid(True)
+    ax1.legend()
+
+    ax2 = plt.subplot(gs[1], sharex=ax1)
+    ax2.plot(plot_df["Datetime"], plot_df["RSI"], label="RSI", color="blue")
+    ax2.axhline(y=oversold, color="green", linestyle="--", alpha=0.6, label=f"Oversold ({oversold})")
+    ax2.axhline(y=overbought, color="red", linestyle="--", alpha=0.6, label=f"Overbought ({overbought})")
+    ax2.set_title("RSI")
+    ax2.set_xlabel("Date")
+    ax2.set_ylim(0, 100)
+    ax2.grid(True)
+    ax2.legend()
+
+    plt.tight_layout()
+    plt.show()
+
+
+def main(interval: str = "6h", profile: bool = False):
+    # With profile=True the load, search and fit stages are timed and a report is printed
+    if profile:
+        profiler.enable()
+
+    timespan: str = "6mo"
+    with profiler.span("load"):
+        data = load_bars("BTC-USD", interval, lookback=timespan)
+
+    base_rsi_model = RSIStrategy(trading_days=annualization_factor(interval))
+    param_grid = {
+        'period': list(range(2, 41)),
+        'oversold': list(range(10, 50, 2)),
+        'overbought': list(range(50, 92, 2))
+    }
+
+    with profiler.span("search.batch", rows=len(data)):
+        results, best_params, best_sharpe = rsi_grid_search(data, param_grid, base_rsi_model)
+    print("Best parameters:", best_params)
+    print("Best Sharpe ratio:", best_sharpe)
+
+    best_model = clone(base_rsi_model).set_params(**best_params).fit(data)
+    if profile:
+        profiler.print_report()
+    plot_rsi_results(best_model.data_, best_params['oversold'], best_params['overbought'], title_timespan=timespan)
+
+
+if __name__ == "__main__":
+    main()
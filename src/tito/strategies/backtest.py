@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Shared vectorized backtest kernel.
+#
+# All the strategies score positions the same way:
+#     excessret = pct_change(price) - risk_free_rate / trading_days
+#     pnl_per   = positions.shift() * excessret
+#     pnl_t     = pnl_per - abs(pnl_per) * transaction_cost
+#     sharpe    = sqrt(trading_days) * mean(pnl_t[1:]) / std(pnl_t[1:])
+# Here positions can be a (bars x strategies) matrix, so any number of candidate
+# signal columns is scored with a handful of array operations.
+
+import numpy as np
+from math import sqrt
+from typing import NamedTuple
+
+
+class BacktestResult(NamedTuple):
+    pnl: np.ndarray  # (bars, strategies) pnl_t, the first row is NaN like the shifted polars series
+    cum_pnl: np.ndarray  # (bars, strategies) running sum of pnl
+    total_pnl: np.ndarray  # (strategies,)
+    sharpe_ratio: np.ndarray  # (strategies,), -inf where the pnl has no variance
+
+
+def excess_returns(prices, risk_free_rate=0.0421, trading_days=1461) -> np.ndarray:
+    """
+    Per-bar return over the risk free rate, NaN for the first bar like pct_change.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    excessret = np.full(len(prices), np.nan)
+    excessret[1:] = prices[1:] / prices[:-1] - 1 - risk_free_rate / trading_days
+    return excessret
+
+
+def backtest(positions, excessret, transaction_cost=0.0005, trading_days=1461,
+             keep_pnl=True, chunk_size=1024) -> BacktestResult:
+    """
+    Scores every column of a position matrix against one excess return vector.
+
+    parameters:
+        positions (array like): (bars,) or (bars, strategies) positions held at each bar's close.
+        excessret (array like): (bars,) excess returns, see excess_returns.
+        transaction_cost (float, default = 0.0005): Charged on abs(pnl) per bar.
+        trading_days (float, default = 1461): Bars per year, used to annualize the Sharpe ratio.
+        keep_pnl (bool, default = True): Return the pnl and cum_pnl matrices. With False
+            they are None and the columns are scored chunk_size at a time, so scoring
+            thousands of candidates never holds a full (bars, strategies) float matrix.
+        chunk_size (int, default = 1024): Columns per block when keep_pnl is False.
+    """
+    positions = np.asarray(positions)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+    excessret = np.asarray(excessret, dtype=np.float64)
+
+    if not keep_pnl:
+        n_strategies = positions.shape[1]
+        total_pnl = np.empty(n_strategies)
+        sharpe_ratio = np.empty(n_strategies)
+        for start in range(0, n_strategies, chunk_size):
+            block = _pnl(positions[:, start:start + chunk_size], excessret, transaction_cost)
+            total_pnl[start:start + chunk_size] = np.nansum(block, axis=0)
+            sharpe_ratio[start:start + chunk_size] = annualized_sharpe(block, trading_days)
+        return BacktestResult(None, None, total_pnl, sharpe_ratio)
+
+    pnl = np.full(positions.shape, np.nan)
+    pnl[1:] = _pnl(positions, excessret, transaction_cost)
+    cum_pnl = np.nancumsum(pnl, axis=0)
+    cum_pnl[0] = np.nan
+    total_pnl = np.nansum(pnl[1:], axis=0)
+    sharpe_ratio = annualized_sharpe(pnl[1:], trading_days)
+    return BacktestResult(pnl, cum_pnl, total_pnl, sharpe_ratio)
+
+
+def _pnl(positions: np.ndarray, excessret: np.ndarray, transaction_cost: float) -> np.ndarray:
+    """
+    pnl_t for bars 1.., positions.shift() * excessret net of costs.
+    """
+    pnl = positions[:-1] * excessret[1:, None]
+    pnl -= np.abs(pnl) * transaction_cost
+    return pnl
+
+
+def annualized_sharpe(pnl: np.ndarray, trading_days=1461) -> np.ndarray:
+    """
+    Column wise sqrt(trading_days) * mean / std (ddof=1), ignoring NaNs.
+    """
+    counts = np.sum(~np.isnan(pnl), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(pnl, axis=0) if pnl.size else np.full(pnl.shape[1], np.nan)
+        std = np.nanstd(pnl, axis=0, ddof=1) if pnl.size else np.full(pnl.shape[1], np.nan)
+        return np.where((counts > 1) & (std > 0), sqrt(trading_days) * mean / std, -np.inf)
+
+
+def net_long_returns(excessret, transaction_cost=0.0005) -> np.ndarray:
+    """
+    pnl_t of holding one unit: excessret - |excessret| * cost.
+
+    When positions are 0/1, pnl_t = positions.shift() * net_long_returns, which is
+    what lets score_binary_positions use matrix products instead of building pnl.
+    """
+    excessret = np.asarray(excessret, dtype=np.float64)
+    return excessret - np.abs(excessret) * transaction_cost
+
+
+def score_binary_positions(positions: np.ndarray, net_returns: np.ndarray, trading_days=1461):
+    """
+    Fast path of backtest for (bars, strategies) 0/1 positions, bool or float64.
+
+    Only the totals are needed, so the pnl matrix is never built: the sum and sum of
+    squares of every column's pnl are two matrix-vector products.
+    Returns (sharpe_ratio, total_pnl) arrays of length strategies.
+    """
+    held = positions[:-1].astype(np.float64, copy=False)
+    ret = net_returns[1:]
+    count = len(ret)
+    total_pnl = ret @ held
+    # positions are 0/1 so pnl_t ** 2 == positions * returns ** 2
+    sum_sq = (ret * ret) @ held
+    if count < 2:
+        return np.full(held.shape[1], -np.inf), total_pnl
+    mean = total_pnl / count
+    var = np.maximum(sum_sq - total_pnl * mean, 0.0) / (count - 1)
+    std = np.sqrt(var)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, sqrt(trading_days) * mean / std, -np.inf)
+    return sharpe, total_pnl
+
+
+def threshold_positions(values: np.ndarray, oversold, overbought) -> np.ndarray:
+    """
+    0/1 positions of threshold strategies on one indicator, for several threshold pairs
+    at once. The RSI strategy enters below oversold and exits above overbought, the
+    Bollinger Bands one does the same on the close's z-score.
+
+    parameters:
+        values (np.ndarray): (n_bars,) indicator series, the RSI or a z-score.
+        oversold, overbought (array like): Thresholds of each strategy, broadcast together.
+
+    returns:
+        (n_bars, n_strategies) bool matrix: long from the first bar with values < oversold
+        until the first later bar with values > overbought, flat before the first entry.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    oversold, overbought = np.broadcast_arrays(np.atleast_1d(oversold), np.atleast_1d(overbought))
+    n_bars = len(values)
+    # one contiguous row per strategy, returned transposed
+    positions = np.zeros((len(oversold), n_bars), dtype=bool)
+    for j in range(len(oversold)):
+        enter = values < oversold[j]
+        decisions = np.flatnonzero(enter | (values > overbought[j]))
+        if len(decisions):
+            # every entry/exit decision holds until the next one
+            positions[j, decisions[0]:] = np.repeat(enter[decisions], np.diff(decisions, append=n_bars))
+    return positions.T
+
+
+def score_binary_windows(positions: np.ndarray, net_returns: np.ndarray, windows, trading_days=1461):
+    """
+    score_binary_positions restricted to several bar windows at once.
+
+    Each window (start, stop) covers bars [start, stop) and gets the pnl of those bars,
+    the first one earning on the position held at the bar before the window. The pnl
+    and pnl ** 2 of every column are cumulatively summed once, after which each window
+    costs O(1) per column however long it is.
+    Returns (sharpe_ratio, total_pnl) arrays of shape (len(windows), strategies).
+    """
+    pnl = positions[:-1] * net_returns[1:, None]
+    n_strategies = pnl.shape[1]
+    cum = np.zeros((len(pnl) + 1, n_strategies))
+    np.cumsum(pnl, axis=0, out=cum[1:])
+    pnl *= pnl
+    cum_sq = np.zeros((len(pnl) + 1, n_strategies))
+    np.cumsum(pnl, axis=0, out=cum_sq[1:])
+
+    sharpe = np.full((len(windows), n_strategies), -np.inf)
+    total_pnl = np.zeros((len(windows), n_strategies))
+    for w, (start, stop) in enumerate(windows):
+        # pnl row p is the pnl of bar p + 1
+        first, last = max(start, 1) - 1, stop - 1
+        count = last - first
+        if count < 1:
+            continue
+        total = cum[last] - cum[first]
+        total_pnl[w] = total
+        if count < 2:
+            continue
+        mean = total / count
+        std = np.sqrt(np.maximum(cum_sq[last] - cum_sq[first] - total * mean, 0.0) / (count - 1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe[w] = np.where(std > 0, sqrt(trading_days) * mean / std, -np.inf)
+    return sharpe, total_pnl
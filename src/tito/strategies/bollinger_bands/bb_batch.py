@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Vectorized Bollinger Bands grid evaluation on prefix-sum rolling statistics
+
+import polars as pl
+import numpy as np
+
+from tito.indicators.rolling import PrefixSums, window_groups
+from tito.profiling import profiler
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_positions, threshold_positions
+
+
+def batch_bollinger_scores(data, window_sizes, num_stds, transaction_cost=0.0005, risk_free_rate=0.0421,
+                           trading_days=1461, col_name="Close", chunk_size=512) -> pl.DataFrame:
+    """
+    Evaluates every (window_size, num_std) combo of the Bollinger Bands strategy.
+
+    The strategy is bollinger_strategy's: long after a close below the lower band until a
+    close above the upper band. The rolling mean and std of each window come from shared
+    prefix sums, and a close is below the lower band exactly when its z-score
+    (close - SMA) / SMSTD is below -num_std, so every band multiplier of a window is a
+    threshold pair of threshold_positions on one z-score column. Results match
+    backtesting bollinger_strategy(window_size, num_std) to floating point tolerance.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        window_sizes (iterable of int): Band windows, in bars.
+        num_stds (iterable of float): Band widths, in rolling standard deviations, each > 0.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+        col_name (str, default = "Close"): The price column.
+        chunk_size (int, default = 512): Band widths scored per matrix block.
+
+    returns:
+        pl.DataFrame with columns window_size, num_std, sharpe_ratio, total_pnl in nested
+        loop order over window_sizes and num_stds.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    window_sizes = np.asarray(list(window_sizes), dtype=np.int64)
+    num_stds = np.asarray(list(num_stds), dtype=np.float64)
+    returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+
+    n_bars = len(prices)
+    sharpe = np.empty((len(window_sizes), len(num_stds)))
+    total_pnl = np.empty((len(window_sizes), len(num_stds)))
+    for block, rows in window_groups(window_sizes):
+        sums = PrefixSums(prices, block, block)
+        for k in rows:
+            with profiler.span("batch.bands", rows=n_bars):
+                sma, smstd = sums.mean_std(int(window_sizes[k]))
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    zscore = (prices - sma) / smstd
+            for start in range(0, len(num_stds), chunk_size):
+                block_stds = num_stds[start:start + chunk_size]
+                with profiler.span("batch.score", rows=n_bars * len(block_stds)):
+                    positions = threshold_positions(zscore, -block_stds, block_stds)
+                    sharpe[k, start:start + chunk_size], total_pnl[k, start:start + chunk_size] = score_binary_positions(
+                        positions, returns, trading_days
+                    )
+    profiler.count("combos", sharpe.size)
+
+    return pl.DataFrame({
+        "window_size": np.repeat(window_sizes, len(num_stds)),
+        "num_std": np.tile(num_stds, len(window_sizes)),
+        "sharpe_ratio": sharpe.ravel(),
+        "total_pnl": total_pnl.ravel(),
+    })
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Adaptive alternatives to scoring every MACD combo on the full history.
+#
+# successive_halving_macd: score all combos on a short recent slice, keep the top
+#     1/eta, rescore the survivors on an eta times longer slice, and so on until
+#     the last few are scored on the full history.
+# coarse_to_fine_macd: score a strided sub-grid, then repeatedly score the grid
+#     points around the leaders at half the stride until the stride is 1.
+#
+# Both return the batch_macd_scores columns plus the fraction of bars each score was
+# computed on, and a dict counting how many evaluations were needed compared to
+# the exhaustive search.
+
+import numpy as np
+import polars as pl
+from itertools import product
+
+from tito.strategies.ema.macd_batch import macd_pairs, score_macd_combos
+
+
+def _all_combos(short_spans, long_spans, signal_spans) -> np.ndarray:
+    _, pairs, _, _ = macd_pairs(short_spans, long_spans)
+    signal_spans = list(signal_spans)
+    pair_array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return np.column_stack([
+        np.repeat(pair_array, len(signal_spans), axis=0),
+        np.tile(np.array(signal_spans, dtype=np.int64), len(pairs)),
+    ])
+
+
+def _budget_frame(combos, sharpe, total_pnl, budget) -> pl.DataFrame:
+    return pl.DataFrame({
+        "short_span": combos[:, 0],
+        "long_span": combos[:, 1],
+        "signal_span": combos[:, 2],
+        "sharpe_ratio": sharpe,
+        "total_pnl": total_pnl,
+        "budget": np.full(len(combos), budget),
+    })
+
+
+def _search_stats(evaluations, full_fit_equivalents, exhaustive) -> dict:
+    return {
+        "evaluations": int(evaluations),
+        "full_fit_equivalents": float(full_fit_equivalents),
+        "exhaustive_evaluations": int(exhaustive),
+        "saved_fraction": 1 - full_fit_equivalents / exhaustive if exhaustive else 0.0,
+    }
+
+
+def successive_halving_macd(data, short_spans, long_spans, signal_spans, eta=4, min_bars=100,
+                            transaction_cost=0.0005, risk_free_rate=0.0421, trading_days=1461,
+                            col_name="Close"):
+    """
+    Successive halving over the MACD grid.
+
+    Round r scores the surviving combos on the most recent n / eta ** (rounds - 1 - r)
+    bars, the EWMs restarting at the start of the slice like MACDStrategy.fit on
+    that slice would, and keeps the best 1 / eta of them. The last round uses the
+    full history, so its scores equal the exhaustive search's.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        short_spans, long_spans, signal_spans (iterables of int): The parameter grid.
+        eta (int, default = 4): Slice growth and survivor reduction factor per round.
+        min_bars (int, default = 100): Shortest slice, decides the number of rounds.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+
+    returns:
+        (scores, stats): scores has every evaluated combo with the score from the longest
+        slice it reached and that slice's length as a fraction of the history (budget).
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    n_bars = len(prices)
+    candidates = _all_combos(short_spans, long_spans, signal_spans)
+    exhaustive = len(candidates)
+    rounds = max(1, int(np.floor(np.log(max(n_bars / min_bars, 1)) / np.log(eta))) + 1)
+
+    frames = []
+    evaluations = 0
+    full_fit_equivalents = 0.0
+    for r in range(rounds):
+        length = n_bars if r == rounds - 1 else max(n_bars // eta ** (rounds - 1 - r), 2)
+        sharpe, total_pnl = score_macd_combos(
+            prices[-length:], candidates, transaction_cost, risk_free_rate, trading_days
+        )
+        evaluations += len(candidates)
+        full_fit_equivalents += len(candidates) * length / n_bars
+
+        if r < rounds - 1:
+            # stable sort so ties keep grid order, like the exhaustive search's first maximum
+            order = np.argsort(-sharpe, kind="stable")
+            n_keep = max(1, int(np.ceil(len(candidates) / eta)))
+            dropped = order[n_keep:]
+            frames.append(_budget_frame(candidates[dropped], sharpe[dropped], total_pnl[dropped], length / n_bars))
+            candidates = candidates[np.sort(order[:n_keep])]
+        else:
+            frames.append(_budget_frame(candidates, sharpe, total_pnl, 1.0))
+
+    scores = pl.concat(frames).sort(["short_span", "long_span", "signal_span"])
+    return scores, _search_stats(evaluations, full_fit_equivalents, exhaustive)
+
+
+def coarse_to_fine_macd(data, short_spans, long_spans, signal_spans, step=4, top_k=10,
+                        transaction_cost=0.0005, risk_free_rate=0.0421, trading_days=1461,
+                        col_name="Close"):
+    """
+    Coarse-to-fine refinement over the MACD grid, every score on the full history.
+
+    Starts with every step-th value of each parameter axis. Then, while step > 1, halves
+    step and scores the grid points within the old step of each of the top_k combos
+    found so far. Combos are never scored twice.
+
+    returns:
+        (scores, stats) like successive_halving_macd, budget is always 1.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    axes = [sorted(set(short_spans)), sorted(set(long_spans)), sorted(set(signal_spans))]
+    exhaustive = len(_all_combos(short_spans, long_spans, signal_spans))
+    scored: dict[tuple, tuple[float, float]] = {}
+
+    def score(index_combos):
+        combos = {
+            (axes[0][i], axes[1][j], axes[2][k]) for i, j, k in index_combos
+            if axes[0][i] < axes[1][j]
+        }
+        new = sorted(combo for combo in combos if combo not in scored)
+        if new:
+            sharpe, total_pnl = score_macd_combos(prices, new, transaction_cost, risk_free_rate, trading_days)
+            scored.update(zip(new, zip(sharpe, total_pnl)))
+
+    def coarse_indices(axis):
+        # include the last value so the edges of the grid are covered
+        return sorted(set(range(0, len(axis), step)) | {len(axis) - 1})
+
+    score(product(*[coarse_indices(axis) for axis in axes]))
+    positions = [{value: i for i, value in enumerate(axis)} for axis in axes]
+    while step > 1:
+        leaders = sorted(scored, key=lambda combo: scored[combo][0], reverse=True)[:top_k]
+        new_step = max(1, step // 2)
+        neighbourhoods = []
+        for leader in leaders:
+            ranges = [
+                range(max(0, positions[a][leader[a]] - step), min(len(axes[a]), positions[a][leader[a]] + step + 1), new_step)
+                for a in range(3)
+            ]
+            neighbourhoods.extend(product(*ranges))
+        score(neighbourhoods)
+        step = new_step
+
+    combos = np.array(sorted(scored), dtype=np.int64).reshape(-1, 3)
+    values = np.array([scored[tuple(combo)] for combo in combos.tolist()]).reshape(-1, 2)
+    scores = _budget_frame(combos, values[:, 0], values[:, 1], 1.0)
+    return scores, _search_stats(len(scored), len(scored), exhaustive)
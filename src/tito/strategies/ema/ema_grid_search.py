@@ -6,28 +6,49 @@
 import polars as pl
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
-from math import sqrt
-from pathlib import Path
+from functools import partial
 from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
-from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.base import BaseEstimator, RegressorMixin, clone
 import pandas as pd
 
+from tito.strategies.backtest import backtest, excess_returns
+from tito.strategies.ema.macd_batch import batch_macd_scores, score_macd_combos
+from tito.strategies.ema.adaptive_search import coarse_to_fine_macd, successive_halving_macd
+from tito.strategies.ema.parallel_search import parallel_macd_scores
+from tito.strategies.param_cube import ParamCube
+from tito.strategies.result_store import DEFAULT_PATH as DEFAULT_RESULTS_PATH, SweepResultStore
+from tito.strategies.ema.walk_forward import walk_forward_macd
+from tito.data.pyramid import load_pyramid
+from tito.plotting import DEFAULT_MAX_POINTS, draw_macd, render_figures
+from tito.profiling import profiler
+from tito.utils import indicator_cache, series_fingerprint
+
 
 class MACDStrategy(BaseEstimator, RegressorMixin):
     """
     MACD trading strategy implemented as a scikit-learn compatible estimator.
     This enables grid search for parameter optimization.
+    
+    With cache_indicators=True the EWMs are memoized in the process wide
+    tito.utils.indicator_cache. The signal line is an EWM of the MACD line and EWMs
+    are linear, so like batch_macd_scores it is built from per span pieces:
+        signal_line = ewm_sig(E_short) - ewm_sig(E_long)
+    with every price EWM E_span keyed by (dataset fingerprint, column, span) and every
+    ewm_sig(E_span) by (dataset fingerprint, column, span, signal_span). Clones made by
+    GridSearchCV share the cache, so a search only computes each distinct EWM once per
+    dataset/fold. Call size_indicator_cache(param_grid, n_folds) before the search so
+    the cache holds all of them.
     """
     
     def __init__(self, short_span=12, long_span=26, signal_span=9, transaction_cost=0.0005, 
-                 risk_free_rate=0.0421, trading_days=1461):
+                 risk_free_rate=0.0421, trading_days=1461, cache_indicators=False):
         self.short_span = short_span
         self.long_span = long_span
         self.signal_span = signal_span
         self.transaction_cost = transaction_cost
         self.risk_free_rate = risk_free_rate
         self.trading_days = trading_days
+        self.cache_indicators = cache_indicators
         
     def fit(self, X, y=None):
         """
@@ -46,51 +67,74 @@ class MACDStrategy(BaseEstimator, RegressorMixin):
             Returns self
         """
         # Convert pandas to polars if needed
-        if isinstance(X, pd.DataFrame):
-            data = pl.from_pandas(X)
-        else:
-            data = X.clone()
+        with profiler.span("fit.convert", rows=len(X)):
+            if isinstance(X, pd.DataFrame):
+                data = pl.from_pandas(X)
+            else:
+                data = X.clone()
             
         col_name = "Close"
+        n_rows = len(data)
         
         # Calculate MACD components
-        data = data.with_columns((pl.col(col_name).ewm_mean(span=self.short_span)).alias(f"{col_name}_ewm_{self.short_span}"))
-        data = data.with_columns((pl.col(col_name).ewm_mean(span=self.long_span)).alias(f"{col_name}_ewm_{self.long_span}"))
-        data = data.with_columns((pl.col(f"{col_name}_ewm_{self.short_span}") - pl.col(f"{col_name}_ewm_{self.long_span}")).alias("MACD_line"))
-        data = data.with_columns(pl.col("MACD_line").ewm_mean(span=self.signal_span).alias("signal_line"))
+        with profiler.span("fit.indicators", rows=n_rows):
+            if self.cache_indicators:
+                data = self._cached_macd(data, col_name)
+            else:
+                data = data.with_columns((pl.col(col_name).ewm_mean(span=self.short_span)).alias(f"{col_name}_ewm_{self.short_span}"))
+                data = data.with_columns((pl.col(col_name).ewm_mean(span=self.long_span)).alias(f"{col_name}_ewm_{self.long_span}"))
+                data = data.with_columns((pl.col(f"{col_name}_ewm_{self.short_span}") - pl.col(f"{col_name}_ewm_{self.long_span}")).alias("MACD_line"))
+                data = data.with_columns(pl.col("MACD_line").ewm_mean(span=self.signal_span).alias("signal_line"))
 
-        # Calculate histogram values (MACD line - signal line)
-        data = data.with_columns((pl.col("MACD_line") - pl.col("signal_line")).alias("histogram"))
+            # Calculate histogram values (MACD line - signal line)
+            data = data.with_columns((pl.col("MACD_line") - pl.col("signal_line")).alias("histogram"))
 
         # Introduce signals
-        positions = data.select(pl.when(pl.col("MACD_line") > pl.col("signal_line"))
-                                .then(1)
-                                .otherwise(0)
-                                .alias("positions")).to_series()
+        with profiler.span("fit.signals", rows=n_rows):
+            positions = data.select(pl.when(pl.col("MACD_line") > pl.col("signal_line"))
+                                    .then(1)
+                                    .otherwise(0)
+                                    .alias("positions")).to_series()
 
-        dailyret = data.select((pl.col(col_name).pct_change()).alias("dailyret")).to_series()
-        excessret = dailyret - self.risk_free_rate / self.trading_days
-        
-        # Profit and loss
-        pnl_per = positions.shift() * excessret
-        all_transaction_costs = abs(pnl_per) * self.transaction_cost
-        # Profit and loss with transaction costs
-        pnl_t = (pnl_per - all_transaction_costs)
+        # Profit and loss with transaction costs, Sharpe is -inf for invalid combinations
+        with profiler.span("fit.backtest", rows=n_rows):
+            excessret = excess_returns(data[col_name], self.risk_free_rate, self.trading_days)
+            result = backtest(positions, excessret, self.transaction_cost, self.trading_days)
         
         # Store results
-        self.total_pnl_ = pnl_t.sum()
-        self.pnl_t_ = pnl_t
+        self.total_pnl_ = float(result.total_pnl[0])
+        self.pnl_t_ = pl.Series("pnl_t", result.pnl[:, 0], nan_to_null=True)
         self.data_ = data
-        
-        # Calculate Sharpe ratio
-        valid_pnl = pnl_t[1:]  # Skip first NaN entry
-        if len(valid_pnl) > 0 and valid_pnl.std() > 0:
-            self.sharpe_ratio_ = sqrt(self.trading_days) * valid_pnl.mean() / valid_pnl.std()
-        else:
-            self.sharpe_ratio_ = -np.inf  # Penalize invalid combinations
+        self.sharpe_ratio_ = float(result.sharpe_ratio[0])
             
         return self
     
+    def _cached_macd(self, data, col_name):
+        """
+        Same columns as the uncached path, with every EWM looked up in indicator_cache.
+        """
+        prices = data[col_name]
+        fingerprint = series_fingerprint(prices)
+
+        def price_ewm(span):
+            return indicator_cache.get_or_compute(
+                (fingerprint, col_name, span),
+                lambda: prices.ewm_mean(span=span)
+            )
+
+        def signal_ewm(span):
+            return indicator_cache.get_or_compute(
+                (fingerprint, col_name, span, self.signal_span),
+                lambda: price_ewm(span).ewm_mean(span=self.signal_span)
+            )
+
+        data = data.with_columns(
+            price_ewm(self.short_span).alias(f"{col_name}_ewm_{self.short_span}"),
+            price_ewm(self.long_span).alias(f"{col_name}_ewm_{self.long_span}")
+        )
+        data = data.with_columns((pl.col(f"{col_name}_ewm_{self.short_span}") - pl.col(f"{col_name}_ewm_{self.long_span}")).alias("MACD_line"))
+        return data.with_columns((signal_ewm(self.short_span) - signal_ewm(self.long_span)).alias("signal_line"))
+    
     def predict(self, X):
         """
         Not actually used for prediction, just returns the Sharpe ratio.
@@ -106,65 +150,70 @@ class MACDStrategy(BaseEstimator, RegressorMixin):
         return self.sharpe_ratio_
 
 
-def plot_macd_results(data, col_name="Close", title_timespan=""):
+def size_indicator_cache(param_grid, n_datasets=1) -> int:
+    """
+    Resizes indicator_cache to hold every EWM a cache_indicators=True search over
+    param_grid needs: each distinct short or long span's price EWM plus its EWM for
+    every signal span, per dataset (fold). Returns the new maxsize.
+    """
+    spans = set(param_grid["short_span"]) | set(param_grid["long_span"])
+    maxsize = max(n_datasets * len(spans) * (1 + len(set(param_grid["signal_span"]))), 1)
+    indicator_cache.resize(maxsize)
+    return maxsize
+
+
+def plot_macd_results(data, col_name="Close", title_timespan="", max_points=DEFAULT_MAX_POINTS):
     """
-    Plot the price and MACD indicators
+    Plot the price and MACD indicators, downsampled to about max_points points per
+    line (None draws every bar), see tito.plotting.draw_macd
     """
-    # Convert to pandas for plotting
-    plot_df = data.to_pandas() if isinstance(data, pl.DataFrame) else data
+    plot_df = pl.from_pandas(data) if isinstance(data, pd.DataFrame) else data
     
     # Create plot with 2 subplots - price on top, MACD with histogram below
-    plt.figure(figsize=(14, 10))
-    gs = gridspec.GridSpec(2, 1, height_ratios=[2, 1])
-
-    # Price chart
-    ax1 = plt.subplot(gs[0])
-    ax1.plot(plot_df["Datetime"], plot_df[col_name], label="Bitcoin Price", color="black")
-    ax1.set_title(f"Bitcoin Price ({title_timespan})")
-    ax1.set_ylabel("Price")
-    ax1.grid(True)
-    ax1.legend()
-
-    # MACD with histogram
-    ax2 = plt.subplot(gs[1], sharex=ax1)
-    ax2.plot(plot_df["Datetime"], plot_df["MACD_line"], label="MACD Line", color="blue")
-    ax2.plot(plot_df["Datetime"], plot_df["signal_line"], label="Signal Line", color="red")
-
-    # Add histogram bars
-    histogram = plot_df["histogram"]
-    pos_hist = histogram.copy()
-    neg_hist = histogram.copy()
-    pos_hist[pos_hist <= 0] = 0
-    neg_hist[neg_hist > 0] = 0
-
-    # Plot positive and negative histogram values with different colors
-    ax2.bar(plot_df["Datetime"], pos_hist, color="green", alpha=0.5, width=1)
-    ax2.bar(plot_df["Datetime"], neg_hist, color="red", alpha=0.5, width=1)
-
-    # Add horizontal line at y=0
-    ax2.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-
-    ax2.set_title("MACD with Histogram")
-    ax2.set_xlabel("Date")
-    ax2.set_ylabel("MACD")
-    ax2.grid(True)
-    ax2.legend()
-
-    plt.tight_layout()
+    fig = plt.figure(figsize=(14, 10))
+    draw_macd(fig, plot_df, col_name, title_timespan, max_points)
     plt.show()
 
 
+def _draw_macd_combo(fig, shared, rank, short_span, long_span, signal_span, sharpe):
+    # render_figures job: fit one combo on the shared data and draw its MACD chart
+    data, base_model, title_timespan, max_points = shared
+    model = clone(base_model).set_params(short_span=short_span, long_span=long_span, signal_span=signal_span).fit(data)
+    draw_macd(
+        fig, model.data_, title_timespan=title_timespan, max_points=max_points,
+        suptitle=f"#{rank}: short_span={short_span}, long_span={long_span}, signal_span={signal_span}, Sharpe {sharpe:.3f}"
+    )
+
+
+def export_top_k_plots(data, results, base_model, out_dir, k=100, workers=None, title_timespan="",
+                       max_points=DEFAULT_MAX_POINTS):
+    """
+    Renders the MACD chart of each of the k best combos of a ParamCube to
+    out_dir/macd_<rank>.png without a display, in parallel. Returns the file paths.
+    """
+    top = results.top(k)
+    jobs = [
+        (f"macd_{rank:03d}.png", {
+            'rank': rank,
+            'short_span': row['short_span'],
+            'long_span': row['long_span'],
+            'signal_span': row['signal_span'],
+            'sharpe': row[results.default_field]
+        })
+        for rank, row in enumerate(top.iter_rows(named=True), start=1)
+    ]
+    return render_figures(_draw_macd_combo, jobs, out_dir, (data, base_model, title_timespan, max_points), workers)
+
+
 def plot_grid_search_results(grid_search, param_name, score_name='mean_test_score'):
     """
     Plot grid search results for a specific parameter
     """
-    results = pd.DataFrame(grid_search.cv_results_)
-    
-    # Group by the parameter and calculate mean score
-    param_scores = results.groupby(f'param_{param_name}')[score_name].mean()
+    # Mean score of every value of the parameter over the rest of the cube
+    values, scores = grid_search.cv_results_.marginal(param_name, field=score_name)
     
     plt.figure(figsize=(10, 6))
-    plt.plot(param_scores.index, param_scores.values, marker='o')
+    plt.plot(values, scores, marker='o')
     plt.title(f'Grid Search Results: Impact of {param_name} on Sharpe Ratio')
     plt.xlabel(param_name)
     plt.ylabel('Mean Sharpe Ratio')
@@ -172,35 +221,45 @@ def plot_grid_search_results(grid_search, param_name, score_name='mean_test_scor
     plt.show()
 
 
-def main():
-    # Load data
-    timespan: str = "6mo"
-    df_path: Path = Path(f"src/tito/data/btc_data/hourly_6_{timespan}.csv")
-    data = pl.read_csv(df_path)
-    
-    # Configuration
-    transaction_cost = 0.0005
-    risk_free_rate = 0.0421
-    trading_days = 1461  # For 6-hour increments
-    
-    # Define parameter grid
-    param_grid = {
-        'short_span': list(range(3, 50, 1)),     # 5, 10, 15, 20, 25
-        'long_span': list(range(10, 101, 1)),    # 20, 30, 40, 50
-        'signal_span': list(range(2, 30, 1))     # 3, 6, 9, 12, 15
-    }
+def plot_grid_heatmap(results, row_param, col_param, score_name='mean_test_score'):
+    """
+    Heatmap of the mean score of every (row_param, col_param) pair over the other parameters
+    """
+    heatmap = results.reduce(row_param, col_param, field=score_name)
     
-    # Create the model
-    base_macd_model = MACDStrategy(
-        transaction_cost=transaction_cost,
-        risk_free_rate=risk_free_rate,
-        trading_days=trading_days
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(
+        heatmap[score_name],
+        xticklabels=heatmap.axes[col_param],
+        yticklabels=heatmap.axes[row_param],
+        annot=True,
+        cmap='viridis',
+        fmt='.3f'
     )
-    
-    # Manual grid search implementation without validation
+    plt.xlabel(col_param)
+    plt.ylabel(row_param)
+    plt.title(f'Sharpe Ratio: {row_param} vs {col_param}')
+    plt.tight_layout()
+    plt.show()
+
+
+def grid_axes(param_grid):
+    """
+    The ParamCube axes of a MACD param_grid, in the nested loop order of the searches.
+    """
+    return {name: param_grid[name] for name in ('short_span', 'long_span', 'signal_span')}
+
+
+def loop_grid_search(data, param_grid, base_model):
+    """
+    Fits one MACDStrategy per parameter combination and prints each result.
+    Slow, but the reference the faster search modes are checked against.
+    """
     best_params = {}
     best_sharpe = -np.inf
-    results = []
+    results = ParamCube(grid_axes(param_grid))
+    if base_model.cache_indicators:
+        size_indicator_cache(param_grid)
     
     # Print header
     print(f"{'short_span':<10} {'long_span':<10} {'signal_span':<10} {'Sharpe Ratio':<15}")
@@ -215,30 +274,26 @@ def main():
                 
             for signal_span in param_grid['signal_span']:
                 # Create a new model with current parameters
-                model = MACDStrategy(
+                model = clone(base_model).set_params(
                     short_span=short_span,
                     long_span=long_span,
-                    signal_span=signal_span,
-                    transaction_cost=transaction_cost,
-                    risk_free_rate=risk_free_rate,
-                    trading_days=trading_days
+                    signal_span=signal_span
                 )
                 
                 # Fit model on entire dataset
                 model.fit(data)
                 sharpe = model.sharpe_ratio_
+                profiler.count("combos")
                 
                 # Store results
-                result = {
-                    'param_short_span': short_span,
-                    'param_long_span': long_span,
-                    'param_signal_span': signal_span,
-                    'mean_test_score': sharpe  # Using this field for compatibility with plotting functions
-                }
-                results.append(result)
+                results.set(
+                    {'short_span': short_span, 'long_span': long_span, 'signal_span': signal_span},
+                    mean_test_score=sharpe  # Using this field for compatibility with plotting functions
+                )
                 
                 # Print current result
-                print(f"{short_span:<10} {long_span:<10} {signal_span:<10} {sharpe:<15.4f}")
+                with profiler.span("loop.print"):
+                    print(f"{short_span:<10} {long_span:<10} {signal_span:<10} {sharpe:<15.4f}")
                 
                 # Update best params if current is better
                 if sharpe > best_sharpe:
@@ -248,10 +303,216 @@ def main():
                         'long_span': long_span,
                         'signal_span': signal_span
                     }
-                    best_model = model
     
-    # Convert results to DataFrame for easier analysis
-    results_df = pd.DataFrame(results)
+    return results, best_params, best_sharpe
+
+
+def batch_grid_search(data, param_grid, base_model, scorer=batch_macd_scores):
+    """
+    Same results as loop_grid_search, but every combo is scored in one vectorized
+    pass by batch_macd_scores instead of one MACDStrategy.fit per combo.
+    scorer can be swapped for parallel_macd_scores to shard the grid over processes.
+    """
+    scores = scorer(
+        data,
+        param_grid['short_span'],
+        param_grid['long_span'],
+        param_grid['signal_span'],
+        transaction_cost=base_model.transaction_cost,
+        risk_free_rate=base_model.risk_free_rate,
+        trading_days=base_model.trading_days
+    )
+    results = ParamCube.from_frame(
+        scores.rename({"sharpe_ratio": "mean_test_score"}), grid_axes(param_grid), ["mean_test_score"]
+    )
+    
+    # First maximum in loop order wins, same tie breaking as the loop
+    best_params, best_sharpe = results.best()
+    print(f"Scored {len(scores)} parameter combinations")
+    
+    return results, best_params, best_sharpe
+
+
+def resumable_grid_search(data, param_grid, base_model, store, chunk_size=8192, col_name="Close"):
+    """
+    batch_grid_search backed by a SweepResultStore.
+    
+    Combos already stored for this data fingerprint and these cost settings are skipped,
+    the rest are scored chunk_size at a time and each chunk is committed before the next
+    one starts. Rerunning after an interruption, or with a few more spans in param_grid,
+    only scores the combos that are missing. A grid without any valid combo, like every
+    short_span >= long_span, returns an empty cube, no best params and a -inf Sharpe.
+    """
+    costs = {
+        'transaction_cost': base_model.transaction_cost,
+        'risk_free_rate': base_model.risk_free_rate,
+        'trading_days': base_model.trading_days
+    }
+    fingerprint = series_fingerprint(data[col_name])
+    combos = [
+        {'short_span': short_span, 'long_span': long_span, 'signal_span': signal_span}
+        for short_span in param_grid['short_span']
+        for long_span in param_grid['long_span'] if short_span < long_span
+        for signal_span in param_grid['signal_span']
+    ]
+    if not combos:
+        return ParamCube(grid_axes(param_grid)), {}, -np.inf
+    pending = store.pending("MACDStrategy", fingerprint, costs, combos)
+    print(f"{len(combos) - len(pending)} of {len(combos)} combos already stored, scoring {len(pending)}")
+    
+    prices = data[col_name]
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        sharpe, total_pnl = score_macd_combos(
+            prices,
+            [(combo['short_span'], combo['long_span'], combo['signal_span']) for combo in chunk],
+            transaction_cost=base_model.transaction_cost,
+            risk_free_rate=base_model.risk_free_rate,
+            trading_days=base_model.trading_days
+        )
+        store.write("MACDStrategy", fingerprint, costs, chunk, sharpe, total_pnl)
+    
+    # Only report the combos of this grid, the store may hold a bigger one
+    grid = pl.DataFrame(combos)
+    scores = grid.join(store.load("MACDStrategy", fingerprint, costs), on=list(grid.columns), how="left", maintain_order="left")
+    results = ParamCube.from_frame(
+        scores.rename({"sharpe_ratio": "mean_test_score"}), grid_axes(param_grid), ["mean_test_score"]
+    )
+    best_params, best_sharpe = results.best()
+    
+    return results, best_params, best_sharpe
+
+
+def walk_forward_grid_search(data, param_grid, base_model, n_splits=10):
+    """
+    Out-of-sample version of batch_grid_search. Every TimeSeriesSplit fold picks its
+    best params on the training window and is scored on the next window.
+
+    The returned score is that chained result, the mean test Sharpe of the folds'
+    train-chosen params, and the returned params are the ones chosen on the last
+    (newest) training window. The results cube holds each combo's mean test and train
+    Sharpe over the folds like GridSearchCV's mean_test_score, but its argmax picks on
+    the test windows, so it is not an out-of-sample result.
+    """
+    folds, combos = walk_forward_macd(
+        data,
+        param_grid['short_span'],
+        param_grid['long_span'],
+        param_grid['signal_span'],
+        n_splits=n_splits,
+        transaction_cost=base_model.transaction_cost,
+        risk_free_rate=base_model.risk_free_rate,
+        trading_days=base_model.trading_days
+    )
+    print(folds.select("fold", "test_start", "short_span", "long_span", "signal_span", "train_sharpe", "test_sharpe"))
+    print(f"Walk-forward mean out-of-sample Sharpe: {folds['test_sharpe'].mean():.4f}, "
+          f"total out-of-sample pnl: {folds['test_pnl'].sum():.4f}")
+    
+    results = ParamCube.from_frame(combos, grid_axes(param_grid), ["mean_test_score", "mean_train_score"])
+    last_fold = folds.row(-1, named=True)
+    best_params = {name: last_fold[name] for name in ('short_span', 'long_span', 'signal_span')}
+    
+    return results, best_params, float(folds['test_sharpe'].mean())
+
+
+def adaptive_grid_search(data, param_grid, base_model, search=successive_halving_macd):
+    """
+    Like batch_grid_search, but only scores the promising part of the grid with
+    successive_halving_macd or coarse_to_fine_macd. mean_test_score only holds the
+    combos scored on the full history, so the marginal plots and heatmaps never mix in
+    Sharpe ratios of a shorter slice. Combos dropped early keep the score of the last
+    slice they reached in rung_score, with that slice's length as a fraction of the
+    history in budget.
+    """
+    scores, stats = search(
+        data,
+        param_grid['short_span'],
+        param_grid['long_span'],
+        param_grid['signal_span'],
+        transaction_cost=base_model.transaction_cost,
+        risk_free_rate=base_model.risk_free_rate,
+        trading_days=base_model.trading_days
+    )
+    print(f"Scored {stats['evaluations']} combos, {stats['full_fit_equivalents']:.0f} full-history "
+          f"equivalents instead of {stats['exhaustive_evaluations']} "
+          f"({stats['saved_fraction']:.1%} saved)")
+    
+    scores = scores.with_columns(
+        pl.when(pl.col("budget") == 1.0).then(pl.col("sharpe_ratio")).alias("mean_test_score"),
+        pl.col("sharpe_ratio").alias("rung_score")
+    )
+    results = ParamCube.from_frame(scores, grid_axes(param_grid), ["mean_test_score", "rung_score", "budget"])
+    best_params, best_sharpe = results.best()
+    
+    return results, best_params, best_sharpe
+
+
+def main(mode: str = "batch", interval: str = "6h", workers=None, chunk_size=256, n_splits=10,
+         results_path=DEFAULT_RESULTS_PATH, profile: bool = False, profile_path=None, plot_dir=None, top_k=100):
+    # With profile=True the fit and sweep stages are timed and a report is printed
+    # after the search, and written as JSON to profile_path if given
+    # With plot_dir the MACD charts of the top_k combos are written there as PNG files
+    # in parallel instead of showing the charts one by one
+    if profile:
+        profiler.enable()
+    
+    # Load data, interval is any level of the shared bar pyramid (1h, 6h, 12h, 1d)
+    timespan: str = "6mo"
+    with profiler.span("load"):
+        pyramid = load_pyramid("BTC-USD")
+        data = pyramid.level(interval)
+        data = data.filter(pl.col("Datetime") >= pl.col("Datetime").last().dt.offset_by(f"-{timespan}"))
+    
+    # Configuration
+    transaction_cost = 0.0005
+    risk_free_rate = 0.0421
+    trading_days = pyramid.annualization(interval)  # 1461 for 6-hour increments
+    
+    # Define parameter grid
+    param_grid = {
+        'short_span': list(range(3, 50, 1)),     # 5, 10, 15, 20, 25
+        'long_span': list(range(10, 101, 1)),    # 20, 30, 40, 50
+        'signal_span': list(range(2, 30, 1))     # 3, 6, 9, 12, 15
+    }
+    
+    # Create the model
+    base_macd_model = MACDStrategy(
+        transaction_cost=transaction_cost,
+        risk_free_rate=risk_free_rate,
+        trading_days=trading_days
+    )
+    
+    params_label, score_label = "Best parameters:", "Best Sharpe ratio:"
+    with profiler.span(f"search.{mode}", rows=len(data)):
+        match mode:
+            case "loop":
+                results, best_params, best_sharpe = loop_grid_search(data, param_grid, base_macd_model)
+            case "batch":
+                results, best_params, best_sharpe = batch_grid_search(data, param_grid, base_macd_model)
+            case "parallel":
+                scorer = partial(parallel_macd_scores, workers=workers, chunk_size=chunk_size)
+                results, best_params, best_sharpe = batch_grid_search(data, param_grid, base_macd_model, scorer)
+            case "walk_forward":
+                results, best_params, best_sharpe = walk_forward_grid_search(data, param_grid, base_macd_model, n_splits)
+                params_label = "Parameters chosen on the last training window:"
+                score_label = "Walk-forward out-of-sample Sharpe ratio (mean over test folds):"
+            case "resumable":
+                with SweepResultStore(results_path) as store:
+                    results, best_params, best_sharpe = resumable_grid_search(data, param_grid, base_macd_model, store)
+            case "halving":
+                results, best_params, best_sharpe = adaptive_grid_search(data, param_grid, base_macd_model, successive_halving_macd)
+            case "coarse_to_fine":
+                results, best_params, best_sharpe = adaptive_grid_search(data, param_grid, base_macd_model, coarse_to_fine_macd)
+            case _:
+                print(f"Error: grid search mode {mode} not implemented!")
+                exit(1)
+
+    best_model = clone(base_macd_model).set_params(**best_params).fit(data)
+    
+    if profile:
+        profiler.print_report()
+        if profile_path is not None:
+            profiler.write_json(profile_path)
     
     # Create a GridSearchCV-like results structure for compatibility with plotting functions
     class GridSearchResults:
@@ -269,12 +530,18 @@ def main():
     )
     
     # Print best parameters and results
-    print("Best parameters:", grid_search.best_params_)
-    print("Best Sharpe ratio:", grid_search.best_score_)
+    print(params_label, grid_search.best_params_)
+    print(score_label, grid_search.best_score_)
     
     # Get the best model
     best_model = grid_search.best_estimator_
     
+    if plot_dir is not None:
+        with profiler.span("plots"):
+            paths = export_top_k_plots(data, results, base_macd_model, plot_dir, top_k, workers, timespan)
+        print(f"Wrote {len(paths)} charts to {plot_dir}")
+        return
+    
     # Plot parameter impact
     plot_grid_search_results(grid_search, 'short_span')
     plot_grid_search_results(grid_search, 'long_span')
@@ -285,54 +552,13 @@ def main():
           f"long_span={best_model.long_span}, signal_span={best_model.signal_span}")
     plot_macd_results(best_model.data_, title_timespan=timespan)
     
-    # Create a heatmap for parameter combinations
-    results = pd.DataFrame(grid_search.cv_results_)
+    # Heatmaps for parameter combinations, mean Sharpe over the third parameter
+    results = grid_search.cv_results_
     
     # Check if we have enough unique values for a meaningful heatmap
-    if len(np.unique(results['param_short_span'])) > 1 and len(np.unique(results['param_signal_span'])) > 1:
-        # Create pivot table for short_span vs signal_span
-        pivot1 = results.pivot_table(
-            index='param_short_span', 
-            columns='param_signal_span', 
-            values='mean_test_score',
-            aggfunc='mean'
-        )
-        
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(pivot1, annot=True, cmap='viridis', fmt='.3f')
-        plt.title('Sharpe Ratio: short_span vs signal_span')
-        plt.tight_layout()
-        plt.show()
-
-    if len(np.unique(results['param_short_span'])) > 1 and len(np.unique(results['param_long_span'])) > 1:
-        # Create pivot table for short_span vs long_span
-        pivot2 = results.pivot_table(
-            index='param_short_span', 
-            columns='param_long_span', 
-            values='mean_test_score',
-            aggfunc='mean'
-        )
-        
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(pivot2, annot=True, cmap='viridis', fmt='.3f')
-        plt.title('Sharpe Ratio: short_span vs long_span')
-        plt.tight_layout()
-        plt.show()
-        
-    if len(np.unique(results['param_long_span'])) > 1 and len(np.unique(results['param_signal_span'])) > 1:
-        # Create pivot table for long_span vs signal_span
-        pivot3 = results.pivot_table(
-            index='param_long_span', 
-            columns='param_signal_span', 
-            values='mean_test_score',
-            aggfunc='mean'
-        )
-        
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(pivot3, annot=True, cmap='viridis', fmt='.3f')
-        plt.title('Sharpe Ratio: long_span vs signal_span')
-        plt.tight_layout()
-        plt.show()
+    for row_param, col_param in [('short_span', 'signal_span'), ('short_span', 'long_span'), ('long_span', 'signal_span')]:
+        if len(results.axes[row_param]) > 1 and len(results.axes[col_param]) > 1:
+            plot_grid_heatmap(results, row_param, col_param)
 
 
 if __name__ == "__main__":
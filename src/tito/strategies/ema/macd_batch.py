@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Vectorized MACD grid evaluation that shares EWMs across parameter combos
+
+import polars as pl
+import numpy as np
+
+from tito.profiling import profiler
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_positions
+
+
+def ewm_columns(prices, spans) -> np.ndarray:
+    """
+    Computes one EWM of the price series per span.
+
+    Returns an (n_bars, len(spans)) float64 matrix where column j is
+    pl.Series.ewm_mean(span=spans[j]) of the prices.
+    """
+    frame = pl.DataFrame({"x": prices}).cast(pl.Float64)
+    out = frame.select([pl.col("x").ewm_mean(span=span).alias(f"ewm_{i}") for i, span in enumerate(spans)])
+    return out.to_numpy()
+
+
+def ewm_matrix(matrix: np.ndarray, span) -> np.ndarray:
+    """
+    Applies the same EWM (by span) to every column of a 2D matrix.
+    """
+    frame = pl.from_numpy(np.asfortranarray(matrix), orient="row")
+    return frame.select(pl.all().ewm_mean(span=span)).to_numpy()
+
+
+def batch_macd_scores(data, short_spans, long_spans, signal_spans, transaction_cost=0.0005,
+                      risk_free_rate=0.0421, trading_days=1461, col_name="Close", chunk_size=512) -> pl.DataFrame:
+    """
+    Evaluates every valid (short_span, long_span, signal_span) MACD combo at once.
+
+    Each distinct EWM of the price is computed a single time. The signal line is an
+    EWM of the MACD line and EWMs are linear, so
+        histogram = (E_s - ewm_sig(E_s)) - (E_l - ewm_sig(E_l))
+    where E_s is the price EWM with span s. That means one EWM per (span, signal_span)
+    pair is enough to build the histogram of every combo, and positions
+    (MACD_line > signal_line) are just histogram > 0.
+
+    Results match MACDStrategy.fit to floating point tolerance. Combos where
+    short_span >= long_span are skipped like in ema_grid_search.main().
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        short_spans, long_spans, signal_spans (iterables of int): The parameter grid.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+        col_name (str, default = "Close"): The price column.
+        chunk_size (int, default = 512): How many (short, long) pairs to score per
+            matrix block. Bounds peak memory to about n_bars * chunk_size bytes * 9.
+
+    returns:
+        pl.DataFrame with columns short_span, long_span, signal_span, sharpe_ratio, total_pnl
+        in the same order the nested loops in ema_grid_search.main() visit them.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    signal_spans = list(signal_spans)
+    spans, pairs, short_idx, long_idx = macd_pairs(short_spans, long_spans)
+
+    n_bars = len(prices)
+    with profiler.span("batch.ewm", rows=n_bars * len(spans)):
+        returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+        price_ewms = ewm_columns(prices, spans)
+
+    n_pairs = len(pairs)
+    n_signals = len(signal_spans)
+    sharpe = np.empty((n_pairs, n_signals))
+    total_pnl = np.empty((n_pairs, n_signals))
+
+    for k, signal_span in enumerate(signal_spans):
+        # MACD - signal contribution of each price EWM for this signal span
+        with profiler.span("batch.signal_ewm", rows=n_bars * len(spans)):
+            detrended = price_ewms - ewm_matrix(price_ewms, signal_span)
+        for start in range(0, n_pairs, chunk_size):
+            stop = min(start + chunk_size, n_pairs)
+            with profiler.span("batch.score", rows=n_bars * (stop - start)):
+                histogram = detrended[:, short_idx[start:stop]] - detrended[:, long_idx[start:stop]]
+                sharpe[start:stop, k], total_pnl[start:stop, k] = score_binary_positions(histogram > 0, returns, trading_days)
+    profiler.count("combos", n_pairs * n_signals)
+
+    return scores_frame(pairs, signal_spans, sharpe, total_pnl)
+
+
+def macd_pairs(short_spans, long_spans):
+    """
+    Enumerates the valid (short_span, long_span) pairs in grid search order.
+
+    Returns (spans, pairs, short_idx, long_idx) where spans is the sorted list of
+    distinct spans and short_idx/long_idx index each pair's spans into it.
+    """
+    short_spans = list(short_spans)
+    long_spans = list(long_spans)
+    spans = sorted(set(short_spans) | set(long_spans))
+    span_index = {span: i for i, span in enumerate(spans)}
+
+    pairs = [(s, l) for s in short_spans for l in long_spans if s < l]
+    short_idx = np.array([span_index[s] for s, _ in pairs], dtype=np.intp)
+    long_idx = np.array([span_index[l] for _, l in pairs], dtype=np.intp)
+    return spans, pairs, short_idx, long_idx
+
+
+def scores_frame(pairs, signal_spans, sharpe, total_pnl) -> pl.DataFrame:
+    """
+    Flattens (n_pairs, n_signals) score matrices into one row per combo.
+    """
+    n_pairs = len(pairs)
+    n_signals = len(signal_spans)
+    pair_array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return pl.DataFrame({
+        "short_span": np.repeat(pair_array[:, 0], n_signals),
+        "long_span": np.repeat(pair_array[:, 1], n_signals),
+        "signal_span": np.tile(np.array(signal_spans, dtype=np.int64), n_pairs),
+        "sharpe_ratio": sharpe.ravel(),
+        "total_pnl": total_pnl.ravel(),
+    })
+
+
+def score_macd_combos(prices, combos, transaction_cost=0.0005, risk_free_rate=0.0421, trading_days=1461,
+                      chunk_size=512):
+    """
+    Scores an arbitrary list of (short_span, long_span, signal_span) combos, not a full grid.
+
+    Only the EWMs and the (span, signal_span) detrended series the given combos need are
+    computed, so scoring a few survivors of an adaptive search stays cheap.
+
+    parameters:
+        prices (array like): Price series, no nulls.
+        combos (array like): (n_combos, 3) integer array of (short_span, long_span, signal_span).
+
+    returns:
+        (sharpe_ratio, total_pnl) arrays of length n_combos, in the order of combos.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    combos = np.asarray(combos, dtype=np.int64).reshape(-1, 3)
+    n_bars = len(prices)
+    spans = np.unique(combos[:, :2])
+    with profiler.span("batch.ewm", rows=n_bars * len(spans)):
+        returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+        price_ewms = ewm_columns(prices, spans.tolist())
+
+    sharpe = np.empty(len(combos))
+    total_pnl = np.empty(len(combos))
+    for signal_span in np.unique(combos[:, 2]):
+        rows = np.flatnonzero(combos[:, 2] == signal_span)
+        needed = np.unique(combos[rows, :2])
+        columns = np.searchsorted(spans, needed)
+        with profiler.span("batch.signal_ewm", rows=n_bars * len(needed)):
+            detrended = price_ewms[:, columns] - ewm_matrix(price_ewms[:, columns], int(signal_span))
+        short_idx = np.searchsorted(needed, combos[rows, 0])
+        long_idx = np.searchsorted(needed, combos[rows, 1])
+        for start in range(0, len(rows), chunk_size):
+            block = slice(start, start + chunk_size)
+            with profiler.span("batch.score", rows=n_bars * len(rows[block])):
+                histogram = detrended[:, short_idx[block]] - detrended[:, long_idx[block]]
+                sharpe[rows[block]], total_pnl[rows[block]] = score_binary_positions(histogram > 0, returns, trading_days)
+    profiler.count("combos", len(combos))
+    return sharpe, total_pnl
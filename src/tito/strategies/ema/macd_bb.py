@@ -1,27 +1,34 @@
 # An implementation of MACD and Bollinger Bands with polars
 
 import polars as pl
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
-from math import sqrt
-from pathlib import Path
+from tito.data.store import load_bars
+from tito.data.timeframe import annualization_factor
+from tito.indicators.expr import macd_bb_strategy
+from tito.plotting import draw_lines, draw_positions, show_figures
+from tito.profiling import profiler
+from tito.strategies.backtest import backtest, excess_returns
 
 # %%
 
+# Set to True to time the stages below and print a report after the backtest
+profile: bool = False
+if profile:
+    profiler.enable()
+
 # Load data
 timespan: str = "2mo"
-df_path: Path = Path(f"src/tito/data/btc_data/hourly_6_{timespan}.csv")
-#df_path: Path = Path(f"../../data/btc_data/daily_{timespan}.csv")
-data = pl.read_csv(df_path, try_parse_dates=True).with_row_index()
+symbol: str = "BTC-USD"
+interval: str = "6h"
+#interval: str = "1d"
+with profiler.span("load"):
+    data = load_bars(symbol, interval, lookback=timespan)
 col_name: str = "Close"
 short_span = 6
 long_span = 41
 signal_span = 19
 transaction_cost = 0.0005
 risk_free_rate = 0.0421
-#trading_days = 365 # 365 days for daily strategies
-trading_days = 1461 # 1461 for 6 hour increments
-#trading_days = 730.5 # 730.5 for 12 hour increments
+trading_days = annualization_factor(interval) # 1461 for 6 hour increments, 730.5 for 12 hour, 365.25 daily
 window_size=10
 
 # best sharpe so far for hourly:
@@ -29,96 +36,51 @@ window_size=10
 
 # %%
 
-# Calculate MACD components
-data = data.with_columns((pl.col(col_name).ewm_mean(span=short_span)).alias(f"{col_name}_ewm_{short_span}"))
-data = data.with_columns((pl.col(col_name).ewm_mean(span=long_span)).alias(f"{col_name}_ewm_{long_span}"))
-data = data.with_columns((pl.col(f"{col_name}_ewm_{short_span}") - pl.col(f"{col_name}_ewm_{long_span}")).alias("MACD_line"))
-data = data.with_columns(pl.col("MACD_line").ewm_mean(span=signal_span).alias("signal_line"))
-
-# Calculate Bollinger Bands
-sma = data.select(pl.col(col_name).rolling_mean(window_size)).to_series()
-smstd = data.select(pl.col(col_name).rolling_std(window_size)).to_series()
-upper_band = sma + (2 * smstd)  # Upper band = SMA + 2*standard deviation
-lower_band = sma - (2 * smstd)  # Lower band = SMA - 2*standard deviation
-
-# Add Bollinger Bands to the dataframe
-data = data.with_columns([
-    sma.alias("SMA"),
-    upper_band.alias("Upper_Band"),
-    lower_band.alias("Lower_Band")
-])
-
-# Calculate histogram values (MACD line - signal line)
-data = data.with_columns((pl.col("MACD_line") - pl.col("signal_line")).alias("histogram"))
+# MACD, Bollinger Bands and the signals, each EMA and rolling window computed once
+# Buy when MACD_line > signal_line AND the close is at or above the lower band
+with profiler.span("macd_bb.indicators", rows=len(data)):
+    data = macd_bb_strategy(short_span, long_span, signal_span, window_size, col_name=col_name).evaluate(data)
+    positions = data["positions"]
 
-# Time to introduce signals
-# Buy when MACD_line > signal_line AND standard deviation < closing price
-positions = data.select(pl.when((pl.col("MACD_line") > pl.col("signal_line")) & (lower_band <= pl.col(col_name)))
-                            .then(1)
-                            .otherwise(0)
-                            .alias("positions")).to_series()
-
-# Add positions to the dataframe
-data = data.with_columns(positions.alias("positions"))
-
-# Calculate position changes to identify buy/sell signals
-data = data.with_columns(
-    (pl.col("positions") - pl.col("positions").shift(1).fill_null(0)).alias("position_change")
-)
-
-dailyret = data.select((pl.col(col_name).pct_change()).alias("dailyret")).to_series()
-excessret = dailyret - risk_free_rate / trading_days
-# profit and loss
-pnl_per = positions.shift() * excessret
-all_transaction_costs = abs(pnl_per) * transaction_cost
-# profit and loss with transaction costs
-pnl_t = (pnl_per - all_transaction_costs)
-total_pnl = pnl_t.sum()
-sharpe_set = sqrt(trading_days) * pnl_t[1:].mean() / pnl_t[1:].std()
+with profiler.span("macd_bb.backtest", rows=len(data)):
+    excessret = excess_returns(data[col_name], risk_free_rate, trading_days)
+    # profit and loss with transaction costs
+    result = backtest(positions, excessret, transaction_cost, trading_days)
+pnl_t = pl.Series("pnl_t", result.pnl[:, 0], nan_to_null=True)
+total_pnl = result.total_pnl[0]
+sharpe_set = result.sharpe_ratio[0]
 
 print(f"Total pnl: {total_pnl}")
 print(f"Sharpe ratio: {sharpe_set}")
+if profile:
+    profiler.print_report()
 
 # %%
 
-fig, ax = plt.subplots()
-ax.plot(pnl_t.cum_sum())
-ax.set_title("MACD and BB profit and loss cummulative sum")
-ax.set_ylabel("cumulative profit")
-ax.set_xlabel("Hour (Increments of 6)")
-plt.show()
+# Charts, shown together at the end, or saved as PNG files to plot_dir (plots/ when
+# matplotlib is headless). Long series are downsampled to about 2000 points per line.
+plot_dir = None
+data = data.with_columns(pnl_t.cum_sum().alias("cumulative_pnl"))
+figures = [
+    ("macd_bb_pnl.png", draw_lines, {
+        "columns": {"cumulative_pnl": {"label": "Cumulative pnl", "color": "black"}},
+        "title": "MACD and BB profit and loss cumulative sum",
+        "ylabel": "cumulative profit",
+    }),
+    ("macd_bb_lines.png", draw_lines, {
+        "columns": {"MACD_line": {"label": "MACD_line", "color": "blue"},
+                    "signal_line": {"label": "signal_line", "color": "red"}},
+        "title": "MACD_line and signal_line comparision",
+    }),
+    # the price marked green while held (positions == 1) and red while flat
+    ("macd_bb_positions.png", draw_positions, {
+        "col_name": col_name,
+        "title": f"BTC closing price for the last {timespan}",
+    }),
+]
 
 # %%
 
-fig, ax = plt.subplots()
-ax.plot(data["MACD_line"], color="blue")
-ax.plot(data["signal_line"], color="red")
-ax.set_title("MACD_line and signal_line comparision")
-ax.legend(["MACD_line", "signal_line"])
-plt.show()
-
-# %%
-
-# Sort data by index to ensure proper line connection
-sorted_data = data.sort("index")
-
-fig, ax = plt.subplots(figsize=(12, 6))
-
-# Plot all data as a single connected line
-ax.plot(sorted_data["index"], sorted_data[col_name], color="gray", linewidth=1.5, alpha=0.5)
-
-# Plot buy points (positions == 1) in green
-buy_data = data.filter(positions == 1)
-ax.scatter(buy_data["index"], buy_data[col_name], color="green", s=30, label="Buy Signal")
-
-# Plot sell points (positions == 0) in red
-sell_data = data.filter(positions == 0)
-ax.scatter(sell_data["index"], sell_data[col_name], color="red", s=30, label="Sell Signal")
-
-ax.set_title(f"BTC closing price for the last {timespan}")
-ax.set_ylabel("Price in USD")
-ax.set_xlabel("Hour (Increments of 6)")
-ax.legend()
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+paths = show_figures(figures, data, plot_dir, figsize=(12, 6))
+if paths:
+    print(f"Wrote {len(paths)} charts to {paths[0].parent}")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Process pool version of the batch MACD grid search
+
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tito.profiling import profiler
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_positions
+from tito.strategies.ema.macd_batch import ewm_columns, ewm_matrix, macd_pairs, scores_frame
+
+# Per worker state, filled in by _init_worker
+_worker = {}
+
+
+def _init_worker(shm_name, n_bars, spans, transaction_cost, risk_free_rate, trading_days):
+    """
+    Attaches to the shared price array and computes the price EWMs once per worker.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    prices = np.ndarray((n_bars,), dtype=np.float64, buffer=shm.buf)
+    _worker["shm"] = shm  # keep the mapping alive as long as the worker
+    _worker["returns"] = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+    _worker["price_ewms"] = ewm_columns(prices, spans)
+    _worker["trading_days"] = trading_days
+
+
+def _score_task(task):
+    """
+    Scores a run of (short, long) pairs for one signal span, chunk_size pairs per matrix block.
+    """
+    k, signal_span, short_idx, long_idx, start, chunk_size = task
+    # the signal EWM of every price EWM, computed once for all the task's pairs
+    price_ewms = _worker["price_ewms"]
+    detrended = price_ewms - ewm_matrix(price_ewms, signal_span)
+    sharpe = np.empty(len(short_idx))
+    total_pnl = np.empty(len(short_idx))
+    for block in range(0, len(short_idx), chunk_size):
+        end = block + chunk_size
+        histogram = detrended[:, short_idx[block:end]] - detrended[:, long_idx[block:end]]
+        sharpe[block:end], total_pnl[block:end] = score_binary_positions(
+            histogram > 0, _worker["returns"], _worker["trading_days"]
+        )
+    return k, start, sharpe, total_pnl
+
+
+def parallel_macd_scores(data, short_spans, long_spans, signal_spans, transaction_cost=0.0005,
+                         risk_free_rate=0.0421, trading_days=1461, col_name="Close",
+                         workers=None, chunk_size=256):
+    """
+    Same output as macd_batch.batch_macd_scores, with the grid sharded over a process pool.
+
+    The price series is published once through shared memory and every worker
+    attaches to it instead of receiving a pickled copy. The signal EWM of the price
+    EWMs is the expensive part and depends only on the signal span, so a task is one
+    signal span with all its (short, long) pairs. Only when there are fewer signal
+    spans than workers are a span's pairs split into several tasks, one per idle
+    worker. Results stream back in task order through imap, so the merged table is
+    identical on every run.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        short_spans, long_spans, signal_spans (iterables of int): The parameter grid.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+        col_name (str, default = "Close"): The price column.
+        workers (Optional[int], default = None): Number of worker processes, all cores if None.
+        chunk_size (int, default = 256): Number of (short, long) pairs per matrix block
+            inside a task, bounds each worker's memory like in batch_macd_scores.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    signal_spans = list(signal_spans)
+    spans, pairs, short_idx, long_idx = macd_pairs(short_spans, long_spans)
+    n_pairs = len(pairs)
+    sharpe = np.empty((n_pairs, len(signal_spans)))
+    total_pnl = np.empty((n_pairs, len(signal_spans)))
+
+    workers = workers or os.cpu_count() or 1
+    # pairs per task, all of them unless there are idle workers to split them over
+    parts = max(1, -(-workers // max(len(signal_spans), 1)))
+    task_pairs = max(1, -(-n_pairs // parts))
+    tasks = [
+        (k, signal_span, short_idx[start:start + task_pairs], long_idx[start:start + task_pairs], start, chunk_size)
+        for k, signal_span in enumerate(signal_spans)
+        for start in range(0, n_pairs, task_pairs)
+    ]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        # Polars' own thread pool would oversubscribe the cores, one thread per worker instead
+        previous_threads = os.environ.get("POLARS_MAX_THREADS")
+        os.environ["POLARS_MAX_THREADS"] = "1"
+        try:
+            # spawn, since forking a process that already started polars' threads can deadlock
+            pool = mp.get_context("spawn").Pool(
+                processes=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, len(prices), spans, transaction_cost, risk_free_rate, trading_days)
+            )
+        finally:
+            if previous_threads is None:
+                del os.environ["POLARS_MAX_THREADS"]
+            else:
+                os.environ["POLARS_MAX_THREADS"] = previous_threads
+        with pool:
+            for k, start, block_sharpe, block_pnl in pool.imap(_score_task, tasks):
+                stop = start + len(block_sharpe)
+                sharpe[start:stop, k] = block_sharpe
+                total_pnl[start:stop, k] = block_pnl
+                # the spawned workers have their own, disabled profiler
+                profiler.count("combos", len(block_sharpe))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return scores_frame(pairs, signal_spans, sharpe, total_pnl)
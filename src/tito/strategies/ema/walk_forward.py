@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Walk-forward optimization of the MACD grid over TimeSeriesSplit folds.
+#
+# Each fold picks the best (short_span, long_span, signal_span) on its training
+# window and is scored on the following out-of-sample window. EWMs are prefix
+# computations: the EWM of bars [0, t) is just the first t values of the EWM of the
+# whole series. So every EWM is computed once over the full series and each fold
+# reads its slice, with the indicators at the start of fold k + 1 carrying all the
+# state built up through fold k. Ten folds cost about one batch_macd_scores pass.
+
+import numpy as np
+import polars as pl
+from sklearn.model_selection import TimeSeriesSplit
+
+from tito.profiling import profiler
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_windows
+from tito.strategies.ema.macd_batch import ewm_columns, ewm_matrix, macd_pairs, scores_frame
+
+
+def walk_forward_macd(data, short_spans, long_spans, signal_spans, n_splits=10, max_train_size=None,
+                      test_size=None, transaction_cost=0.0005, risk_free_rate=0.0421, trading_days=1461,
+                      col_name="Close", chunk_size=512):
+    """
+    Walk-forward evaluation of every valid MACD combo.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        short_spans, long_spans, signal_spans (iterables of int): The parameter grid.
+        n_splits, max_train_size, test_size: Passed to sklearn's TimeSeriesSplit.
+            With max_train_size the training windows roll instead of expand, the
+            indicators are still warmed up on all the bars before each window.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+        col_name (str, default = "Close"): The price column.
+        chunk_size (int, default = 512): (short, long) pairs scored per matrix block.
+
+    returns:
+        (folds, combos):
+        folds is a pl.DataFrame with one row per fold: the bar windows, the best params
+        on the training window, their train Sharpe and their out-of-sample test Sharpe and pnl.
+        combos is the batch_macd_scores table with mean_train_score and mean_test_score
+        (mean Sharpe over the folds) instead of a single full-sample score.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    signal_spans = list(signal_spans)
+    spans, pairs, short_idx, long_idx = macd_pairs(short_spans, long_spans)
+
+    splitter = TimeSeriesSplit(n_splits=n_splits, max_train_size=max_train_size, test_size=test_size)
+    train_windows, test_windows = [], []
+    for train, test in splitter.split(prices):
+        train_windows.append((int(train[0]), int(train[-1]) + 1))
+        test_windows.append((int(test[0]), int(test[-1]) + 1))
+    windows = train_windows + test_windows
+
+    n_bars = len(prices)
+    with profiler.span("walk_forward.ewm", rows=n_bars * len(spans)):
+        returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+        # one EWM per span over the whole series, shared by every fold
+        price_ewms = ewm_columns(prices, spans)
+
+    n_pairs, n_signals = len(pairs), len(signal_spans)
+    sharpe = np.empty((len(windows), n_pairs, n_signals))
+    total_pnl = np.empty((len(windows), n_pairs, n_signals))
+    for k, signal_span in enumerate(signal_spans):
+        with profiler.span("walk_forward.signal_ewm", rows=n_bars * len(spans)):
+            detrended = price_ewms - ewm_matrix(price_ewms, signal_span)
+        for start in range(0, n_pairs, chunk_size):
+            stop = min(start + chunk_size, n_pairs)
+            with profiler.span("walk_forward.score", rows=n_bars * (stop - start)):
+                histogram = detrended[:, short_idx[start:stop]] - detrended[:, long_idx[start:stop]]
+                sharpe[:, start:stop, k], total_pnl[:, start:stop, k] = score_binary_windows(
+                    histogram > 0, returns, windows, trading_days
+                )
+    profiler.count("combos", n_pairs * n_signals)
+
+    n_folds = len(train_windows)
+    train_sharpe, test_sharpe = sharpe[:n_folds], sharpe[n_folds:]
+    test_pnl = total_pnl[n_folds:]
+
+    rows = []
+    for fold in range(n_folds):
+        # first maximum wins, same tie breaking as the exhaustive search
+        pair, k = np.unravel_index(np.argmax(train_sharpe[fold]), train_sharpe[fold].shape)
+        rows.append({
+            "fold": fold,
+            "train_start": train_windows[fold][0],
+            "train_end": train_windows[fold][1],
+            "test_start": test_windows[fold][0],
+            "test_end": test_windows[fold][1],
+            "short_span": pairs[pair][0],
+            "long_span": pairs[pair][1],
+            "signal_span": signal_spans[k],
+            "train_sharpe": train_sharpe[fold, pair, k],
+            "test_sharpe": test_sharpe[fold, pair, k],
+            "test_pnl": test_pnl[fold, pair, k],
+        })
+    folds = pl.DataFrame(rows)
+
+    combos = scores_frame(pairs, signal_spans, test_sharpe.mean(axis=0), test_pnl.sum(axis=0)).rename(
+        {"sharpe_ratio": "mean_test_score", "total_pnl": "test_pnl"}
+    ).with_columns(pl.Series("mean_train_score", train_sharpe.mean(axis=0).ravel()))
+    return folds, combos
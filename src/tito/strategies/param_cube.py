@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Dense N-dimensional storage of parameter sweep results.
+#
+# A sweep over short_span x long_span x signal_span used to come back as one dict per
+# combo, ~100k dicts for the default MACD grid, and every heatmap was a pandas
+# pivot_table over them. A ParamCube keeps each score as one numpy array with an axis per
+# parameter, 8 bytes per combo, so:
+#     cube.slice(long_span=26)                   O(1) view, no copy
+#     cube.reduce("short_span", "signal_span")   nan-aware mean over the other axes (a heatmap)
+#     cube.marginal("short_span")                the same down to one axis
+#     cube.best(), cube.top(10)                  best combos in loop order, first max wins
+# Combos that weren't scored, like short_span >= long_span, are NaN holes that every
+# reduction skips. to_frame() turns the cube back into the sparse one row per scored
+# combo form, from_frame() builds a cube from it.
+#
+# TopK keeps the best k combos of results that arrive in chunks, so a sweep can track
+# its leaders without holding or sorting everything it has scored.
+
+import heapq
+import warnings
+import numpy as np
+import polars as pl
+from typing import Optional, Sequence
+
+REDUCTIONS = {
+    "mean": np.nanmean,
+    "max": np.nanmax,
+    "min": np.nanmin,
+    "std": np.nanstd,
+}
+
+
+class TopK:
+    """
+    Streaming top-k of (combo, score) pairs, best first. Among equal scores the combo
+    pushed first ranks higher, like the first maximum the grid searches report.
+    NaN scores are ignored.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self.heap: list[tuple] = []  # min-heap of (score, -arrival, combo)
+        self.pushed = 0
+
+    def push(self, combo: tuple, score: float):
+        arrival = self.pushed
+        self.pushed += 1
+        if np.isnan(score) or self.k <= 0:
+            return
+        item = (float(score), -arrival, tuple(combo))
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def push_many(self, combos: np.ndarray, scores: np.ndarray):
+        """
+        Pushes a chunk of (n_combos, n_params) combos with their scores, in order.
+        Only the chunk's own top k, and anything tied with its k-th score, reach the heap.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        combos = np.asarray(combos)
+        candidates = np.flatnonzero(~np.isnan(scores))
+        if len(candidates) > self.k > 0:
+            kth = np.partition(scores[candidates], len(candidates) - self.k)[len(candidates) - self.k]
+            candidates = candidates[scores[candidates] >= kth]
+        start = self.pushed
+        for i in candidates:
+            self.pushed = start + int(i)
+            self.push(combos[i].tolist(), scores[i])
+        self.pushed = start + len(scores)
+
+    def items(self) -> list[tuple[tuple, float]]:
+        return [(combo, score) for score, _, combo in sorted(self.heap, reverse=True)]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class ParamCube:
+    """
+    Scores of a parameter sweep as dense arrays with one axis per parameter.
+
+    parameters:
+        axes (dict[str, Sequence]): Parameter name -> its values in sweep order. The
+            order of the dict is the order of the array axes.
+        fields (Sequence[str], default = ("mean_test_score",)): Names of the score arrays.
+            The first one is the default of every method taking a field.
+        dtype (default = np.float64): Type of the score arrays.
+        top_k (int, default = 0): Track the best top_k combos of the first field with a
+            TopK as they are set, see top_tracker.
+    """
+
+    def __init__(self, axes: dict[str, Sequence], fields: Sequence[str] = ("mean_test_score",),
+                 dtype=np.float64, top_k: int = 0):
+        self.axes = {name: np.asarray(values) for name, values in axes.items()}
+        self.fields = {field: np.full(self.shape, np.nan, dtype=dtype) for field in fields}
+        self.top_tracker = TopK(top_k) if top_k else None
+
+    @classmethod
+    def _view(cls, axes: dict[str, np.ndarray], fields: dict[str, np.ndarray]) -> "ParamCube":
+        cube = cls.__new__(cls)
+        cube.axes = axes
+        cube.fields = fields
+        cube.top_tracker = None
+        return cube
+
+    @classmethod
+    def from_frame(cls, frame: pl.DataFrame, axes: dict[str, Sequence] | Sequence[str],
+                   fields: Sequence[str], dtype=np.float64) -> "ParamCube":
+        """
+        Builds a cube from one row per combo.
+
+        parameters:
+            frame (pl.DataFrame): Parameter columns and score columns.
+            axes (dict[str, Sequence] | Sequence[str]): Axis values, or just the parameter
+                column names to use their sorted unique values.
+            fields (Sequence[str]): Score columns to store.
+        """
+        if not isinstance(axes, dict):
+            axes = {name: np.sort(frame[name].unique().to_numpy()) for name in axes}
+        cube = cls(axes, fields, dtype)
+        cube.set_many(
+            {name: frame[name].to_numpy() for name in cube.names},
+            **{field: frame[field].to_numpy() for field in fields}
+        )
+        return cube
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.axes)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return tuple(len(values) for values in self.axes.values())
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.fields.values())
+
+    @property
+    def default_field(self) -> str:
+        return next(iter(self.fields))
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    def valid(self, field: Optional[str] = None) -> np.ndarray:
+        """
+        Boolean mask of the combos that have a score.
+        """
+        return ~np.isnan(self.fields[field or self.default_field])
+
+    def index(self, name: str, values) -> np.ndarray:
+        """
+        Positions of parameter values on an axis. Raises KeyError for values not on it.
+        """
+        axis = self.axes[name]
+        values = np.asarray(values)
+        order = np.argsort(axis, kind="stable")
+        positions = order[np.clip(np.searchsorted(axis, values, sorter=order), 0, len(axis) - 1)]
+        missing = axis[positions] != values
+        if np.any(missing):
+            raise KeyError(f"{name} values {np.unique(values[missing]).tolist()} are not on the axis")
+        return positions
+
+    def set(self, params: dict, **scores):
+        """
+        Stores the scores of one combo, e.g. cube.set({"short_span": 12, ...}, mean_test_score=1.2).
+        """
+        cell = tuple(int(self.index(name, params[name])) for name in self.names)
+        for field, score in scores.items():
+            self.fields[field][cell] = score
+        if self.top_tracker is not None and self.default_field in scores:
+            self.top_tracker.push(tuple(params[name] for name in self.names), scores[self.default_field])
+
+    def set_many(self, params: dict[str, np.ndarray], **scores: np.ndarray):
+        """
+        Stores the scores of many combos, params holds one array of values per axis.
+        """
+        cells = tuple(self.index(name, params[name]) for name in self.names)
+        for field, values in scores.items():
+            self.fields[field][cells] = values
+        if self.top_tracker is not None and self.default_field in scores:
+            combos = np.column_stack([np.asarray(params[name]) for name in self.names])
+            self.top_tracker.push_many(combos, scores[self.default_field])
+
+    def get(self, field: Optional[str] = None, **params) -> float:
+        cell = tuple(int(self.index(name, params[name])) for name in self.names)
+        return float(self.fields[field or self.default_field][cell])
+
+    def slice(self, **fixed) -> "ParamCube":
+        """
+        The sub-cube with some parameters fixed to one value, a view sharing memory with this cube.
+        """
+        cell = tuple(int(self.index(name, fixed[name])) if name in fixed else slice(None) for name in self.names)
+        axes = {name: values for name, values in self.axes.items() if name not in fixed}
+        return self._view(axes, {field: values[cell] for field, values in self.fields.items()})
+
+    def reduce(self, *keep: str, how: str = "mean", field: Optional[str] = None) -> "ParamCube":
+        """
+        Reduces every axis not in keep with a nan-aware mean, max, min or std (or count of
+        scored combos). The kept axes stay in the order of keep, so reduce("a", "b")
+        gives a (len(a), len(b)) heatmap. Cells without any score are NaN.
+        """
+        field = field or self.default_field
+        values = self.fields[field]
+        dropped = tuple(i for i, name in enumerate(self.names) if name not in keep)
+        remaining = [name for name in self.names if name in keep]
+        if how == "count":
+            reduced = (~np.isnan(values)).sum(axis=dropped).astype(np.float64)
+        else:
+            with warnings.catch_warnings():
+                # all NaN cells, like short_span >= long_span rows, are expected holes
+                warnings.simplefilter("ignore", RuntimeWarning)
+                reduced = REDUCTIONS[how](values, axis=dropped)
+        reduced = np.transpose(reduced, [remaining.index(name) for name in keep])
+        return self._view({name: self.axes[name] for name in keep}, {field: reduced})
+
+    def marginal(self, name: str, how: str = "mean", field: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (axis values, reduced score) of one parameter, see reduce.
+        """
+        reduced = self.reduce(name, how=how, field=field)
+        return self.axes[name], reduced.fields[reduced.default_field]
+
+    def _params(self, flat_index: int) -> dict:
+        cell = np.unravel_index(flat_index, self.shape)
+        return {name: self.axes[name][i].item() for name, i in zip(self.names, cell)}
+
+    def best(self, field: Optional[str] = None) -> tuple[dict, float]:
+        """
+        Params and score of the best combo, the first maximum in axis order, which is the
+        nested loop order of the grid searches.
+        """
+        values = self.fields[field or self.default_field]
+        if not np.any(~np.isnan(values)):
+            raise ValueError("ParamCube has no scores")
+        flat = int(np.nanargmax(values))
+        return self._params(flat), float(values.flat[flat])
+
+    def top(self, k: int = 10, field: Optional[str] = None) -> pl.DataFrame:
+        """
+        The k best combos, best first, ties in axis order.
+        """
+        field = field or self.default_field
+        flat_values = self.fields[field].ravel()
+        scored = np.flatnonzero(~np.isnan(flat_values))
+        if len(scored) > k:
+            kth = np.partition(flat_values[scored], len(scored) - k)[len(scored) - k]
+            scored = scored[flat_values[scored] >= kth]
+        order = scored[np.lexsort((scored, -flat_values[scored]))][:k]
+        cells = np.unravel_index(order, self.shape)
+        return pl.DataFrame(
+            {name: self.axes[name][i] for name, i in zip(self.names, cells)} | {field: flat_values[order]}
+        )
+
+    def to_frame(self, valid_only: bool = True) -> pl.DataFrame:
+        """
+        One row per combo, in axis order, only the scored ones by default.
+        """
+        keep = self.valid().ravel() if valid_only else np.ones(self.size, dtype=bool)
+        cells = np.unravel_index(np.flatnonzero(keep), self.shape)
+        return pl.DataFrame(
+            {name: self.axes[name][i] for name, i in zip(self.names, cells)}
+            | {field: values.ravel()[keep] for field, values in self.fields.items()}
+        )
+
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# On-disk store of parameter sweep results, so sweeps can be resumed and extended.
+#
+# Every row is keyed by strategy name, parameters, dataset fingerprint and cost
+# settings. A sweep asks which of its combos are still pending, scores those in
+# chunks and commits each chunk, so a killed process only loses the chunk in flight
+# and adding a few spans to param_grid only costs the new combos.
+
+import json
+import sqlite3
+import polars as pl
+from os import PathLike
+from pathlib import Path
+
+DEFAULT_PATH: Path = Path("src/tito/data/sweep_results.sqlite")
+
+
+def _key(values: dict) -> str:
+    # canonical json so the same dict always gives the same key
+    return json.dumps(values, sort_keys=True)
+
+
+class SweepResultStore:
+    """
+    SQLite backed table of (strategy, params, data fingerprint, costs) -> scores.
+
+    parameters:
+        path (str | PathLike, default = DEFAULT_PATH): The database file, created if missing.
+    """
+
+    def __init__(self, path: str | PathLike = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                strategy TEXT NOT NULL,
+                params TEXT NOT NULL,
+                data_fingerprint TEXT NOT NULL,
+                costs TEXT NOT NULL,
+                sharpe_ratio REAL,
+                total_pnl REAL,
+                PRIMARY KEY (strategy, data_fingerprint, costs, params)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def completed(self, strategy: str, data_fingerprint: str, costs: dict) -> set[str]:
+        """
+        Param keys already stored for this strategy, dataset and cost settings.
+        """
+        rows = self.connection.execute(
+            "SELECT params FROM results WHERE strategy = ? AND data_fingerprint = ? AND costs = ?",
+            (strategy, data_fingerprint, _key(costs)),
+        )
+        return {params for (params,) in rows}
+
+    def pending(self, strategy: str, data_fingerprint: str, costs: dict, params: list[dict]) -> list[dict]:
+        """
+        The params from the list that have no stored result yet, in their original order.
+        """
+        done = self.completed(strategy, data_fingerprint, costs)
+        return [combo for combo in params if _key(combo) not in done]
+
+    def write(self, strategy: str, data_fingerprint: str, costs: dict, params: list[dict],
+              sharpe_ratio, total_pnl):
+        """
+        Stores one chunk of results in a single transaction, replacing any older rows with the same key.
+        """
+        cost_key = _key(costs)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (strategy, _key(combo), data_fingerprint, cost_key, float(sharpe), float(pnl))
+                    for combo, sharpe, pnl in zip(params, sharpe_ratio, total_pnl)
+                ],
+            )
+
+    def load(self, strategy: str, data_fingerprint: str, costs: dict) -> pl.DataFrame:
+        """
+        All stored results for a strategy, dataset and cost settings, one column per parameter.
+        """
+        rows = self.connection.execute(
+            "SELECT params, sharpe_ratio, total_pnl FROM results "
+            "WHERE strategy = ? AND data_fingerprint = ? AND costs = ?",
+            (strategy, data_fingerprint, _key(costs)),
+        ).fetchall()
+        if not rows:
+            return pl.DataFrame()
+        params = pl.DataFrame([json.loads(row[0]) for row in rows])
+        return params.with_columns(
+            pl.Series("sharpe_ratio", [row[1] for row in rows], dtype=pl.Float64),
+            pl.Series("total_pnl", [row[2] for row in rows], dtype=pl.Float64),
+        )
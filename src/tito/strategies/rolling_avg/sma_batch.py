@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Vectorized SMA crossover grid evaluation on prefix-sum rolling means
+
+import polars as pl
+import numpy as np
+
+from tito.indicators.rolling import rolling_mean
+from tito.profiling import profiler
+from tito.strategies.backtest import excess_returns, net_long_returns, score_binary_positions
+from tito.strategies.ema.macd_batch import macd_pairs
+
+
+def batch_sma_crossover_scores(data, short_windows, long_windows, transaction_cost=0.0005,
+                               risk_free_rate=0.0421, trading_days=1461, col_name="Close",
+                               chunk_size=512) -> pl.DataFrame:
+    """
+    Evaluates every valid (short_window, long_window) SMA crossover combo at once.
+
+    The strategy is long while the short SMA is above the long SMA and flat until the
+    long SMA exists, like SMACrossSignal. Every distinct window's SMA comes from the same
+    prefix sums (rolling_mean), one O(n_bars) pass per window, and the position columns
+    of a chunk of pairs are scored together with score_binary_positions. Pairs with
+    short_window >= long_window are skipped.
+
+    parameters:
+        data (pl.DataFrame | pd.DataFrame): Price data with a col_name column, no nulls.
+        short_windows, long_windows (iterables of int): The parameter grid, in bars.
+        transaction_cost, risk_free_rate, trading_days: Same meaning as in MACDStrategy.
+        col_name (str, default = "Close"): The price column.
+        chunk_size (int, default = 512): How many pairs to score per matrix block. Bounds
+            peak memory to about n_bars * chunk_size bytes * 8.
+
+    returns:
+        pl.DataFrame with columns short_window, long_window, sharpe_ratio, total_pnl in
+        nested loop order over short_windows and long_windows.
+    """
+    prices = np.asarray(data[col_name], dtype=np.float64)
+    windows, pairs, short_idx, long_idx = macd_pairs(short_windows, long_windows)
+
+    n_bars = len(prices)
+    with profiler.span("batch.sma", rows=n_bars * len(windows)):
+        returns = net_long_returns(excess_returns(prices, risk_free_rate, trading_days), transaction_cost)
+        smas = rolling_mean(prices, windows)
+
+    n_pairs = len(pairs)
+    sharpe = np.empty(n_pairs)
+    total_pnl = np.empty(n_pairs)
+    positions = np.empty((n_bars, min(chunk_size, n_pairs)), order="F")
+    for start in range(0, n_pairs, chunk_size):
+        stop = min(start + chunk_size, n_pairs)
+        with profiler.span("batch.score", rows=n_bars * (stop - start)):
+            # column by column into one float buffer, gathering a whole chunk's SMA
+            # columns and casting the comparison would copy the chunk twice more.
+            # NaN while the long SMA fills compares False, so those bars are flat
+            for column, (short, long) in enumerate(zip(short_idx[start:stop], long_idx[start:stop])):
+                np.greater(smas[:, short], smas[:, long], out=positions[:, column])
+            sharpe[start:stop], total_pnl[start:stop] = score_binary_positions(
+                positions[:, :stop - start], returns, trading_days
+            )
+    profiler.count("combos", n_pairs)
+
+    pair_array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return pl.DataFrame({
+        "short_window": pair_array[:, 0],
+        "long_window": pair_array[:, 1],
+        "sharpe_ratio": sharpe,
+        "total_pnl": total_pnl,
+    })
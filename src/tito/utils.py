@@ -1,3 +1,80 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import polars as pl
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def series_fingerprint(series: pl.Series) -> str:
+    """
+    Content hash of a series. Two series with the same dtype and values
+    get the same fingerprint no matter which frame they came from.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{series.dtype}:{len(series)}".encode())
+    digest.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    Bounded LRU cache for computed indicator series.
+
+    Keys are tuples like (dataset fingerprint, column, span). Once maxsize
+    entries are stored, the least recently used one is evicted. Safe to share
+    between threads, so GridSearchCV with a threading backend can use it too.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._store: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, calling compute() to fill it on a miss.
+        """
+        with self._lock:
+            if key in self._store:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return self._store[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._store[key] = value
+            self._store.move_to_end(key)
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+        return value
+
+    def resize(self, maxsize: int):
+        """
+        Changes maxsize, evicting the least recently used entries beyond it.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._store))
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process wide cache shared by every estimator that opts in, including sklearn clones
+indicator_cache = IndicatorCache()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# AsyncBulkDownloader against a StandInBarServer: pagination, retries, failing symbols
+# and incremental refreshes. Run with `PYTHONPATH=src python -m pytest test`.
+
+import asyncio
+from datetime import datetime, timezone
+
+import aiohttp
+import polars as pl
+
+from tito.data.async_downloader import AlpacaBarsProvider, AsyncBulkDownloader, FetchError, StandInBarServer
+from tito.data.store import MarketDataStore
+from tito.data.synthetic import SyntheticBars
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+N_BARS = 500
+END = datetime(2024, 1, 21, 20, tzinfo=timezone.utc)  # one hour after the last bar
+
+
+def bars(seed: int = 0) -> pl.DataFrame:
+    return SyntheticBars(seed=seed, start=START).generate(N_BARS)
+
+
+def refresh(server, store, symbols, start=START, end=END, page_limit=10000, **downloader_args):
+    provider = AlpacaBarsProvider("key", "secret", base_url=server.url, rate=60_000, page_limit=page_limit)
+    downloader = AsyncBulkDownloader(store, provider, backoff=0.01, **downloader_args)
+    return asyncio.run(downloader.refresh_many(symbols, "1h", start=start, end=end)), downloader
+
+
+def run_with_server(test, frames, **server_args):
+    async def serve():
+        async with StandInBarServer(frames, **server_args) as server:
+            # the downloader runs its own event loop, off the server's
+            return await asyncio.to_thread(test, server)
+    return asyncio.run(serve())
+
+
+def test_pages_are_joined(tmp_path):
+    frames = {"AAPL": bars()}
+    store = MarketDataStore(tmp_path)
+
+    def test(server):
+        report, _ = refresh(server, store, ["AAPL"], page_limit=64)
+        assert report.ok
+        assert report.received == {"AAPL": N_BARS}
+        # ceil(500 / 64) pages
+        assert server.requests == report.requests == 8
+        stored = store.load("AAPL", "1h")
+        assert stored["Datetime"].to_list() == frames["AAPL"]["Datetime"].to_list()
+        assert stored["Close"].to_list() == frames["AAPL"]["Close"].to_list()
+
+    run_with_server(test, frames)
+
+
+def test_unavailable_pages_are_retried(tmp_path):
+    frames = {"AAPL": bars(), "MSFT": bars(1)}
+    store = MarketDataStore(tmp_path)
+
+    def test(server):
+        report, _ = refresh(server, store, ["AAPL", "MSFT"], page_limit=64, max_retries=20)
+        assert report.ok
+        assert report.retries > 0
+        assert report.requests == 16 + report.retries
+        for symbol, frame in frames.items():
+            assert store.load(symbol, "1h")["Close"].to_list() == frame["Close"].to_list()
+
+    run_with_server(test, frames, fail_rate=0.3)
+
+
+def test_rate_limited_pages_wait_for_retry_after(tmp_path):
+    frames = {"AAPL": bars()}
+    store = MarketDataStore(tmp_path)
+
+    def test(server):
+        report, _ = refresh(server, store, ["AAPL"], page_limit=128)
+        assert report.ok
+        assert report.received == {"AAPL": N_BARS}
+        # the third of four pages is answered 429 with Retry-After: 1
+        assert report.retries >= 1
+        assert report.elapsed >= 1.0
+
+    run_with_server(test, frames, rate=2)
+
+
+def test_retry_after_is_read_from_429():
+    async def fetch(server):
+        provider = AlpacaBarsProvider("key", "secret", base_url=server.url, rate=60_000)
+        page = provider.request("AAPL", "1h", START, END)
+        async with aiohttp.ClientSession() as session:
+            await provider.fetch_page(session, page)
+            try:
+                await provider.fetch_page(session, page)
+            except FetchError as error:
+                return error
+
+    async def serve():
+        async with StandInBarServer({"AAPL": bars()}, rate=1) as server:
+            return await fetch(server)
+
+    error = asyncio.run(serve())
+    assert isinstance(error, FetchError)
+    assert error.retryable
+    assert error.retry_after == 1.0
+
+
+def test_broken_symbol_is_reported_failed(tmp_path):
+    frames = {"AAPL": bars(), "MSFT": bars(1), "BROKEN": bars(2)}
+    store = MarketDataStore(tmp_path)
+
+    def test(server):
+        report, _ = refresh(server, store, ["AAPL", "BROKEN", "MSFT"], max_retries=2)
+        assert not report.ok
+        assert list(report.failed) == ["BROKEN"]
+        assert "HTTP 500" in report.failed["BROKEN"]
+        assert report.received == {"AAPL": N_BARS, "MSFT": N_BARS}
+        # one request per good symbol, the first try and two retries for the broken one
+        assert report.requests == 5
+        assert report.retries == 2
+
+    run_with_server(test, frames, broken_symbols=("BROKEN",))
+
+
+def test_unknown_symbol_is_not_retried(tmp_path):
+    store = MarketDataStore(tmp_path)
+
+    def test(server):
+        report, _ = refresh(server, store, ["NOPE"])
+        assert "HTTP 400" in report.failed["NOPE"]
+        assert report.requests == 1
+        assert report.retries == 0
+
+    run_with_server(test, {"AAPL": bars()})
+
+
+def test_second_run_only_fetches_missing_range(tmp_path):
+    frames = {"AAPL": bars()}
+    store = MarketDataStore(tmp_path)
+    first_end = datetime(2024, 1, 11, tzinfo=timezone.utc)  # 240 bars in
+
+    def test(server):
+        report, _ = refresh(server, store, ["AAPL"], end=first_end)
+        assert report.received == {"AAPL": 240}
+
+        report, downloader = refresh(server, store, ["AAPL"], start=None)
+        # the newest stored bar is refetched in case it was still forming
+        assert report.received == {"AAPL": N_BARS - 240 + 1}
+        assert report.requests == 1
+        last = downloader.fetch_log("AAPL", "1h")[-1]
+        assert datetime.fromisoformat(last["start"]) == datetime(2024, 1, 10, 23, tzinfo=timezone.utc)
+        assert datetime.fromisoformat(last["end"]) == END
+
+        stored = store.load("AAPL", "1h")
+        assert stored["Datetime"].to_list() == frames["AAPL"]["Datetime"].to_list()
+
+        # nothing new: only the newest bar again
+        report, _ = refresh(server, store, ["AAPL"], start=None)
+        assert report.received == {"AAPL": 1}
+        assert len(store.load("AAPL", "1h")) == N_BARS
+
+    run_with_server(test, frames)
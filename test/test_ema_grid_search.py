@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# MACDStrategy with cache_indicators=True against the uncached fit, the size of the
+# indicator cache a grid needs and what the walk-forward search reports. Run with `PYTHONPATH=src python -m pytest test`.
+
+import numpy as np
+import polars as pl
+import pytest
+
+from tito.data.synthetic import SyntheticBars
+from tito.strategies.ema.ema_grid_search import MACDStrategy, size_indicator_cache, walk_forward_grid_search
+from tito.strategies.ema.walk_forward import walk_forward_macd
+from tito.utils import indicator_cache
+
+GRID = {"short_span": [5, 8, 12], "long_span": [20, 26], "signal_span": [6, 9]}
+
+
+@pytest.fixture(scope="module")
+def bars() -> pl.DataFrame:
+    return SyntheticBars(interval="6h", seed=7).generate(1500)
+
+
+@pytest.fixture
+def cache():
+    maxsize = indicator_cache.maxsize
+    indicator_cache.clear()
+    yield indicator_cache
+    indicator_cache.clear()
+    indicator_cache.resize(maxsize)
+
+
+def combos():
+    for short_span in GRID["short_span"]:
+        for long_span in GRID["long_span"]:
+            for signal_span in GRID["signal_span"]:
+                yield short_span, long_span, signal_span
+
+
+def test_cached_fit_matches_uncached(bars, cache):
+    for params in combos():
+        cached = MACDStrategy(*params, cache_indicators=True).fit(bars)
+        plain = MACDStrategy(*params).fit(bars)
+        for column in ("MACD_line", "signal_line", "histogram"):
+            np.testing.assert_allclose(cached.data_[column].to_numpy(), plain.data_[column].to_numpy(),
+                                       rtol=1e-9, atol=1e-9)
+        assert cached.sharpe_ratio_ == pytest.approx(plain.sharpe_ratio_, rel=1e-9)
+
+
+def test_signal_ewms_are_shared_between_combos(bars, cache):
+    maxsize = size_indicator_cache(GRID)
+    # 5 distinct spans, each with its price EWM and one EWM per signal span
+    assert maxsize == 5 * (1 + 2)
+
+    for params in combos():
+        MACDStrategy(*params, cache_indicators=True).fit(bars)
+    info = cache.info()
+    assert info.misses == info.currsize == maxsize
+    # every combo looks up two price EWMs and two signal EWMs, and each of the 10 signal
+    # EWMs looks up its price EWM once when it is computed
+    assert info.hits + info.misses == 4 * len(list(combos())) + 10
+
+
+def test_walk_forward_reports_the_chained_folds(bars):
+    _, best_params, best_score = walk_forward_grid_search(bars, GRID, MACDStrategy(), n_splits=4)
+    folds, _ = walk_forward_macd(bars, GRID["short_span"], GRID["long_span"], GRID["signal_span"], n_splits=4)
+    last = folds.row(-1, named=True)
+    assert best_params == {name: last[name] for name in ("short_span", "long_span", "signal_span")}
+    assert best_score == pytest.approx(folds["test_sharpe"].mean())
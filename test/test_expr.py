@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Indicator expression strategies against the eager polars code they replaced.
+# Run with `PYTHONPATH=src python -m pytest test`.
+
+import polars as pl
+import pytest
+
+from tito.data.synthetic import SyntheticBars
+from tito.indicators.expr import bollinger_bands_strategy, bollinger_strategy, macd_bb_strategy, macd_strategy
+from tito.strategies.portfolio import bollinger_positions, macd_positions
+
+
+@pytest.fixture(scope="module")
+def bars() -> pl.DataFrame:
+    return SyntheticBars(interval="6h", seed=5).generate(3000).select("Datetime", "Close")
+
+
+def test_eager_and_lazy_evaluation_agree(bars):
+    strategy = macd_bb_strategy()
+    assert strategy.evaluate(bars).equals(strategy.compile(bars).collect())
+    assert strategy.evaluate(bars.lazy()).equals(strategy.evaluate(bars))
+
+
+def test_macd_positions(bars):
+    data = macd_strategy(12, 26, 9).evaluate(bars)
+    assert data["positions"].dtype == pl.Int64
+    assert data["positions"].to_list() == bars.select(macd_positions(12, 26, 9)).to_series().to_list()
+
+
+def test_bollinger_bands_have_no_positions(bars):
+    data = bollinger_bands_strategy(20).evaluate(bars)
+    assert data.columns == ["Datetime", "Close", "SMA", "SMSTD", "Upper_Band", "Lower_Band"]
+    sma = bars["Close"].rolling_mean(20)
+    smstd = bars["Close"].rolling_std(20)
+    assert data["SMA"].equals(sma.alias("SMA"))
+    assert data["Upper_Band"].equals((sma + 2 * smstd).alias("Upper_Band"))
+
+
+def test_bollinger_strategy_trades_like_portfolio(bars):
+    data = bollinger_strategy(20, 2).evaluate(bars)
+    assert data["positions"].to_list() == bars.select(bollinger_positions(20, 2.0)).to_series().to_list()
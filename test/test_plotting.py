@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# The strategy scripts' charts: downsampled lines and headless saving.
+# Run with `PYTHONPATH=src python -m pytest test`.
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import polars as pl
+import pytest
+from matplotlib.figure import Figure
+
+from tito.data.synthetic import SyntheticBars
+from tito.indicators.expr import bollinger_bands_strategy, macd_strategy
+from tito.plotting import draw_bands, draw_macd, headless, show_figures
+
+N_BARS = 50_000
+MAX_POINTS = 500
+
+
+@pytest.fixture(scope="module")
+def bars() -> pl.DataFrame:
+    return SyntheticBars(interval="1h", seed=2).generate(N_BARS).select("Datetime", "Close")
+
+
+def test_band_lines_are_downsampled(bars):
+    data = bollinger_bands_strategy(20).evaluate(bars)
+    fig = draw_bands(Figure(), data, max_points=MAX_POINTS, std=True)
+    lines = [line for ax in fig.axes for line in ax.get_lines()]
+    assert len(lines) == 5
+    assert all(len(line.get_xdata()) <= MAX_POINTS for line in lines)
+
+
+def test_charts_are_saved_when_headless(bars, tmp_path):
+    assert headless()
+    data = macd_strategy(12, 26, 9).evaluate(bars)
+    figures = [
+        ("macd.png", draw_macd, {"max_points": MAX_POINTS}),
+        ("macd_histogram.png", draw_macd, {"max_points": MAX_POINTS, "price": False}),
+    ]
+    paths = show_figures(figures, data, tmp_path, figsize=(6, 4))
+    assert paths == [tmp_path / "macd.png", tmp_path / "macd_histogram.png"]
+    assert all(path.stat().st_size > 0 for path in paths)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# TradingRuntime driven by SimulatedFeed and SimulatedBroker, checked against the batch
+# strategies. Run with `PYTHONPATH=src python -m pytest test`.
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import polars as pl
+import pytest
+
+from tito.data.synthetic import SyntheticBars
+from tito.live.runtime import (AlpacaBroker, MACDSignal, SimulatedBroker, SimulatedFeed, TradingRuntime,
+                               POSITION_NOT_FOUND)
+from tito.strategies.ema.ema_grid_search import MACDStrategy
+
+SYMBOL = "BTC-USD"
+
+
+@pytest.fixture(scope="module")
+def bars() -> pl.DataFrame:
+    return SyntheticBars(interval="6h", seed=3).generate(2000)
+
+
+def run(bars, signal, quantity=1.0, **broker_args):
+    broker = SimulatedBroker(cash=1e6, **broker_args)
+    runtime = TradingRuntime(SimulatedFeed(bars, SYMBOL), broker, signal, quantity=quantity)
+    asyncio.run(runtime.run())
+    return runtime, broker
+
+
+def test_targets_match_macd_strategy(bars):
+    runtime, _ = run(bars, MACDSignal(12, 26, 9))
+    model = MACDStrategy(12, 26, 9).fit(bars)
+    positions = model.data_.select((pl.col("MACD_line") > pl.col("signal_line")).cast(pl.Int64)).to_series()
+    assert runtime.targets == positions.to_list()
+
+
+def test_an_order_per_target_change(bars):
+    runtime, broker = run(bars, MACDSignal(12, 26, 9), quantity=2.0)
+    targets = np.array(runtime.targets)
+    changes = int(np.count_nonzero(np.diff(targets, prepend=0)))
+    assert changes > 0
+    assert len(runtime.fills) == len(broker.fills) == changes
+    assert [fill.side for fill in runtime.fills] == ["buy", "sell"] * (changes // 2) + ["buy"] * (changes % 2)
+    assert all(fill.quantity == 2.0 for fill in runtime.fills)
+    assert broker.positions[SYMBOL] == 2.0 * targets[-1]
+
+    # fills happen at the close of the bar that changed the target
+    closes = bars["Close"].to_numpy()
+    changed = np.flatnonzero(np.diff(targets, prepend=0))
+    assert [fill.price for fill in runtime.fills] == closes[changed].tolist()
+
+
+def test_latency_histograms_count_every_bar_and_order(bars):
+    runtime, _ = run(bars, MACDSignal(12, 26, 9))
+    assert runtime.bar_to_decision.count == len(bars)
+    assert runtime.decision_to_order.count == len(runtime.fills)
+    assert runtime.bar_to_decision.counts.sum() == len(bars)
+    assert runtime.decision_to_order.counts.sum() == len(runtime.fills)
+    report = runtime.report()
+    assert report["bars"] == len(bars)
+    assert report["orders"] == len(runtime.fills)
+
+
+def test_feed_errors_propagate_after_the_bars_before_them(bars):
+    class FailingFeed(SimulatedFeed):
+        async def stream(self):
+            async for bar in super().stream():
+                if len(self.streamed) == 100:
+                    raise ConnectionError("feed lost")
+                self.streamed.append(bar)
+                yield bar
+
+    feed = FailingFeed(bars, SYMBOL)
+    feed.streamed = []
+    runtime = TradingRuntime(feed, SimulatedBroker(cash=1e6), MACDSignal(12, 26, 9))
+    with pytest.raises(ConnectionError, match="feed lost"):
+        asyncio.run(runtime.run())
+    assert len(runtime.targets) == 100
+
+
+def test_alpaca_position_only_treats_missing_positions_as_flat():
+    exceptions = pytest.importorskip("alpaca.common.exceptions")
+
+    def http_error(status):
+        return SimpleNamespace(response=SimpleNamespace(status_code=status))
+
+    def broker_raising(error):
+        def get_open_position(symbol):
+            raise error
+        broker = AlpacaBroker.__new__(AlpacaBroker)
+        broker.client = SimpleNamespace(get_open_position=get_open_position)
+        return broker
+
+    missing = exceptions.APIError(f'{{"code": {POSITION_NOT_FOUND}, "message": "position does not exist"}}',
+                                  http_error(404))
+    assert asyncio.run(broker_raising(missing).position(SYMBOL)) == 0.0
+
+    for error in (exceptions.APIError('{"code": 40110000, "message": "request is not authorized"}', http_error(401)),
+                  exceptions.APIError("<html>bad gateway</html>", http_error(502)),
+                  ConnectionError("reset")):
+        with pytest.raises(type(error)):
+            asyncio.run(broker_raising(error).position(SYMBOL))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# load_bars and load_pyramid on an empty store, seeded from the bundled csv files.
+# Run from the repository root with `PYTHONPATH=src python -m pytest test`.
+
+import polars as pl
+
+from tito.data.pyramid import load_pyramid
+from tito.data.store import BUNDLED_CSV_DIR, MarketDataStore, load_bars, normalize_bars
+from tito.data.timeframe import resample_bars
+
+SYMBOL = "BTC-USD"
+
+
+def hourly() -> pl.DataFrame:
+    return normalize_bars(pl.read_csv(BUNDLED_CSV_DIR / "hourly_6mo.csv", try_parse_dates=True))
+
+
+def test_pyramid_is_built_from_an_empty_root(tmp_path):
+    pyramid = load_pyramid(SYMBOL, root=tmp_path)
+    assert pyramid.level("1h").equals(hourly())
+    assert pyramid.level("6h").equals(resample_bars(hourly(), "6h")["6h"])
+    # only the base level is stored
+    assert MarketDataStore(tmp_path).intervals(SYMBOL) == ["1h"]
+
+
+def test_derived_intervals_come_from_the_pyramid(tmp_path):
+    bars = load_bars(SYMBOL, "6h", root=tmp_path)
+    assert bars.equals(load_pyramid(SYMBOL, root=tmp_path).level("6h"))
+    assert MarketDataStore(tmp_path).intervals(SYMBOL) == ["1h"]
+
+    # real 6h bars, not every 6th hourly bar
+    pruned = normalize_bars(pl.read_csv(BUNDLED_CSV_DIR / "hourly_6_6mo.csv", try_parse_dates=True))
+    assert not bars.select("High").equals(pruned.select("High"))
+    assert (bars["High"] >= bars["Close"]).all()
+
+
+def test_derived_intervals_select_like_the_store(tmp_path):
+    bars = load_bars(SYMBOL, "12h", columns=["Close"], lookback="1mo", root=tmp_path)
+    full = load_pyramid(SYMBOL, root=tmp_path).level("12h")
+    expected = full.filter(pl.col("Datetime") >= pl.col("Datetime").max().dt.offset_by("-1mo")).select("Datetime", "Close")
+    assert bars.equals(expected)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Incremental indicators against two-pass references over long series.
+# Run with `PYTHONPATH=src python -m pytest test`.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tito.indicators.streaming import RollingStats
+
+WINDOW = 20
+
+
+def test_rolling_stats_do_not_drift_on_long_series():
+    rng = np.random.default_rng(0)
+    n = 200_000
+    # a high price level with small moves and large jumps between regimes, where
+    # sliding add/remove updates lose m2 to cancellation
+    prices = 1e6 + np.cumsum(rng.normal(0, 1, n)) + np.repeat(rng.normal(0, 1e5, n // 5000), 5000)
+
+    out = RollingStats(WINDOW).update_many(prices)
+    windows = sliding_window_view(prices, WINDOW)
+
+    assert np.isnan(out[:WINDOW - 1]).all()
+    np.testing.assert_allclose(out[WINDOW - 1:, 0], windows.mean(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(out[WINDOW - 1:, 1], windows.std(axis=1, ddof=1), rtol=1e-6)
+
+
+def test_rolling_stats_restore_continues_the_series():
+    prices = np.random.default_rng(1).normal(100, 5, 1000)
+    stats = RollingStats(WINDOW)
+    stats.update_many(prices[:517])
+    restored = RollingStats.restore(stats.snapshot())
+    np.testing.assert_array_equal(restored.update_many(prices[517:]), stats.update_many(prices[517:]))